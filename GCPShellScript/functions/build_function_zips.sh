@@ -0,0 +1,22 @@
+# Build the zip archive of every Google Cloud Function: the handler as main.py, the other modules of the
+# function, requirements.txt and the shared common package.
+functions_dir=$(cd "$(dirname "$0")/../../GoogleFunctions" && pwd)
+output_dir=${1:-$functions_dir/build}
+
+mkdir -p "$output_dir"
+output_dir=$(cd "$output_dir" && pwd)
+
+for function_dir in "$functions_dir"/*Function; do
+    function_name=$(basename "$function_dir")
+    staging_dir=$(mktemp -d)
+
+    cp "$function_dir"/*.py "$function_dir"/requirements.txt "$staging_dir"/
+    mv "$staging_dir/google_function_handler.py" "$staging_dir/main.py"
+    cp -r "$functions_dir/common" "$staging_dir"/
+    find "$staging_dir" -name "__pycache__" -type d -prune -exec rm -rf {} +
+
+    rm -f "$output_dir/$function_name.zip"
+    (cd "$staging_dir" && zip -qr "$output_dir/$function_name.zip" .)
+    rm -rf "$staging_dir"
+    echo "Built $output_dir/$function_name.zip"
+done
@@ -0,0 +1,93 @@
+"""
+Write the discovery documents bundled with the functions in GoogleFunctions/common/discovery_documents.
+
+The documents are taken from the google-api-python-client release pinned in the requirements.txt of the functions,
+which must be the one installed in the environment running this script, and are trimmed to the resources the
+functions call and the schemas these resources use. A trimmed document is much faster to parse when a function
+instance builds its first client, the full compute document alone being several MB.
+
+Run this script again after upgrading google-api-python-client or when a function calls a new resource.
+
+Usage: python GCPShellScript/functions/update_discovery_documents.py
+"""
+import json
+import os
+import sys
+
+from googleapiclient import discovery_cache
+
+# Top level resources called by the functions, per API
+API_RESOURCES = {
+    ("cloudresourcemanager", "v3"): ["projects"],
+    ("compute", "v1"): ["firewalls", "globalOperations", "instances", "networks", "regionOperations", "subnetworks",
+                        "zoneOperations"],
+    ("container", "v1"): ["projects"],
+    ("iam", "v1"): ["projects"],
+    ("pubsub", "v1"): ["projects"],
+    ("secretmanager", "v1"): ["projects"],
+    ("sqladmin", "v1"): ["instances", "operations"],
+    ("storage", "v1"): ["buckets", "objects"],
+}
+
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "GoogleFunctions",
+                          "common", "discovery_documents")
+
+
+def iter_refs(node):
+    """
+    Yield the schema names referenced by the node of a discovery document
+    """
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == "$ref" and isinstance(value, str):
+                yield value
+            else:
+                yield from iter_refs(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from iter_refs(value)
+
+
+def trim_document(document, resources):
+    """
+    Return the discovery document with only the given top level resources and the schemas they reference
+    :param document: Discovery document
+    :param resources: Names of the top level resources to keep
+    """
+    missing = [resource for resource in resources if resource not in document.get("resources", {})]
+    if missing:
+        raise Exception(f"Resources {', '.join(missing)} not found in the {document['name']} document")
+
+    trimmed = dict(document)
+    trimmed["resources"] = {resource: document["resources"][resource] for resource in resources}
+    trimmed.pop("methods", None)
+
+    schemas = document.get("schemas", {})
+    used = set()
+    pending = list(iter_refs(trimmed["resources"]))
+    while pending:
+        name = pending.pop()
+        if name in used or name not in schemas:
+            continue
+        used.add(name)
+        pending.extend(iter_refs(schemas[name]))
+    trimmed["schemas"] = {name: schema for name, schema in schemas.items() if name in used}
+    return trimmed
+
+
+def main():
+    documents_dir = os.path.join(os.path.dirname(discovery_cache.__file__), "documents")
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    for (api, version), resources in sorted(API_RESOURCES.items()):
+        with open(os.path.join(documents_dir, f"{api}.{version}.json")) as source:
+            document = json.load(source)
+        trimmed = trim_document(document, resources)
+        output_path = os.path.join(OUTPUT_DIR, f"{api}.{version}.json")
+        with open(output_path, "w") as output:
+            json.dump(trimmed, output, separators=(",", ":"), sort_keys=True)
+        print(f"Wrote {os.path.normpath(output_path)}: {len(trimmed['schemas'])} of {len(document['schemas'])} "
+              f"schemas, revision {document.get('revision')}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
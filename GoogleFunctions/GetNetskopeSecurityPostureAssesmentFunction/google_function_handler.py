@@ -3,8 +3,16 @@ import requests
 import os
 import logging
 import base64
-from google.cloud import pubsub_v1
-from googleapiclient import discovery
+import random
+import threading
+import time
+from collections import Counter, deque
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from common import envelope, clients, remediations
+from violation_parser import parse_violations
+from violation_snapshot import open_violation_snapshot
 
 # Set up  logger
 LOG_LEVEL = os.getenv('LOGLEVEL', 'DEBUG')
@@ -17,7 +25,47 @@ API_TOKEN_NAME = "NetskopeAPIToken"
 
 PROJECT_ID = os.getenv("GCP_PROJECT")
 
+# Base URL of the Netskope API, https://<tenant FQDN> by default. Set it to point the function at a local stand-in
+# such as benchmarks/fake_apis.py
+NETSKOPE_API_BASE_URL = os.getenv('NETSKOPE_API_BASE_URL', '')
+
 CHUNK_SIZE = 100
+# Adaptive paging grows or shrinks the page size between MIN_PAGE_SIZE and MAX_PAGE_SIZE, aiming at pages which take
+# PAGE_TARGET_SECONDS and are smaller than PAGE_MAX_BYTES
+ADAPTIVE_PAGING = os.getenv('ADAPTIVE_PAGING', 'false').lower() == 'true'
+MIN_PAGE_SIZE = int(os.getenv('MIN_PAGE_SIZE', '25'))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '1000'))
+PAGE_TARGET_SECONDS = float(os.getenv('PAGE_TARGET_SECONDS', '3'))
+PAGE_MAX_BYTES = int(os.getenv('PAGE_MAX_BYTES', str(4 * 1024 * 1024)))
+# Retries of a page on 429, 5xx and connection errors, with jittered exponential backoff
+MAX_PAGE_RETRIES = int(os.getenv('MAX_PAGE_RETRIES', '5'))
+RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', '1'))
+RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', '60'))
+# Number of pages requested ahead of the one being processed
+PREFETCH_CONCURRENCY = max(int(os.getenv('PREFETCH_CONCURRENCY', '4')), 1)
+# Number of rules of a multi-rule payload fetched in parallel
+RULE_CONCURRENCY = max(int(os.getenv('RULE_CONCURRENCY', '4')), 1)
+# Cap on the Netskope API requests in flight across all the rules of an invocation
+MAX_CONCURRENT_REQUESTS = max(int(os.getenv('MAX_CONCURRENT_REQUESTS', '8')), 1)
+# Stream the response body and keep only the used fields of the violations
+STREAM_PARSE = os.getenv('STREAM_PARSE', 'false').lower() == 'true'
+STREAM_PARSE_CHUNK_SIZE = 64 * 1024
+# Seconds for which the Netskope secrets are reused by a warm instance
+SECRET_CACHE_TTL = int(os.getenv('SECRET_CACHE_TTL', '300'))
+# Publish the violations page by page (or every PUBLISH_BATCH_SIZE violations) instead of once at the end
+STREAM_PUBLISH = os.getenv('STREAM_PUBLISH', 'false').lower() == 'true'
+PUBLISH_BATCH_SIZE = int(os.getenv('PUBLISH_BATCH_SIZE', '0'))
+# Split the violations in messages of one project, published with the project as ordering key, or in fixed-size
+# batches, so that the remediation of a rule is spread over several function instances
+PUBLISH_SHARDING = os.getenv('PUBLISH_SHARDING', 'none').lower()
+SHARD_BATCH_SIZE = max(int(os.getenv('SHARD_BATCH_SIZE', '50')), 1)
+# Format of the published messages, see common/envelope.py. Version 1 without compression is understood by
+# remediation functions of every release
+ENVELOPE_VERSION = int(os.getenv('ENVELOPE_VERSION', '1'))
+ENVELOPE_COMPRESSION = os.getenv('ENVELOPE_COMPRESSION', 'none').lower()
+PUBLISHER_MAX_MESSAGES = int(os.getenv('PUBLISHER_MAX_MESSAGES', '100'))
+PUBLISHER_MAX_BYTES = int(os.getenv('PUBLISHER_MAX_BYTES', str(9 * 1024 * 1024)))
+PUBLISHER_MAX_LATENCY = float(os.getenv('PUBLISHER_MAX_LATENCY', '0.05'))
 GCP_REGION = os.getenv('FUNCTION_REGION', 'us-east-1')
 GCP_REGIONS = {
     "asia-east1": ["ASIA", "Changhua County, Taiwan"],
@@ -51,6 +99,142 @@ GCP_REGIONS = {
     "us-west4": ["US", "Las Vegas, Nevada, North America"]
 }
 
+# Router mode: a single fetch run publishes the violations of every region on its "<rule_short_name>-<region>" topic
+ROUTER_MODE = os.getenv('ROUTER_MODE', 'false').lower() == 'true'
+ROUTER_REGIONS = [region.strip() for region in os.getenv('ROUTER_REGIONS', ','.join(GCP_REGIONS)).split(',')
+                  if region.strip()]
+# Region which receives the violations of global resources and the ones without region
+ROUTER_GLOBAL_REGION = os.getenv('ROUTER_GLOBAL_REGION', GCP_REGION)
+# Topic of the remediation dispatcher function: when set, the violations of every rule are published on this topic
+# (on "<DISPATCHER_TOPIC>-<region>" in router mode) and the rule_short_name message attribute routes them to the rule
+DISPATCHER_TOPIC = os.getenv('DISPATCHER_TOPIC', '')
+# Rules whose violations are published together when they are fetched by the same run, in the messages of the first
+# of them, every violation with its rule_short_name. The remediation of the first rule then merges the changes of the
+# rules of a resource, for example CIS-1-0-0-6-1,CIS-1-0-0-6-2 for the Cloud SQL instances. The rules are matched by
+# rule ID, so that the region suffixed rule short names of the per-region deployments are coalesced too
+COALESCED_RULES = [rule_short_name.strip() for rule_short_name in os.getenv('COALESCED_RULES', '').split(',')
+                   if rule_short_name.strip()]
+
+
+def build_region_alias_index(gcp_regions):
+    """
+    Normalise the region aliases of GCP_REGIONS, given either as a string or a list, into sets
+    :param gcp_regions: Aliases of the GCP regions
+    """
+    return {region: frozenset([aliases] if isinstance(aliases, str) else aliases)
+            for region, aliases in gcp_regions.items()}
+
+
+def build_region_route_index(region_aliases, regions):
+    """
+    Map every Netskope region alias to the first of the given regions having that alias
+    :param region_aliases: Normalised aliases of the GCP regions
+    :param regions: Regions in order of preference
+    """
+    routes = {}
+    for region in regions:
+        for alias in region_aliases.get(region, ()):
+            routes.setdefault(alias, region)
+    return routes
+
+
+GCP_REGION_ALIASES = build_region_alias_index(GCP_REGIONS)
+REGION_ROUTES = build_region_route_index(GCP_REGION_ALIASES, ROUTER_REGIONS if ROUTER_MODE else [GCP_REGION])
+
+# HTTP session shared by all Netskope API calls of a warm instance
+_http_session = None
+_http_session_lock = threading.Lock()
+_request_semaphore = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+# Pub/Sub publisher client shared by the rule groups published concurrently
+_publisher_client = None
+_publisher_client_lock = threading.Lock()
+
+# Netskope secrets cached by a warm instance as {secret_name: (value, expiry time)}
+_secret_cache = {}
+_secret_cache_lock = threading.Lock()
+_secret_executor = ThreadPoolExecutor(max_workers=2)
+
+
+class NetskopeAuthenticationError(Exception):
+    """
+    Raised when the Netskope API rejects the token with 401 or 403
+    """
+
+    def __init__(self, message, skip=0):
+        super().__init__(message)
+        # Offset of the rejected page, from which the fetch resumes
+        self.skip = skip
+
+
+class NetskopeRetryableError(Exception):
+    """
+    Raised when the Netskope API call failed with a 429, a 5xx or a connection error
+    """
+
+    def __init__(self, message, status_code=None, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdaptivePager:
+    """
+    Page size and pacing of the Netskope API calls of a rule.
+
+    With adaptive paging the page size is doubled while pages come back fast and small, and halved when a page is
+    slow, too large or throttled. After a 429 every request of the rule waits until the Retry-After delay is over.
+    """
+
+    def __init__(self, page_size=CHUNK_SIZE, adaptive=ADAPTIVE_PAGING):
+        self.page_size = page_size
+        self.adaptive = adaptive
+        self.resume_at = 0
+        self.lock = threading.Lock()
+
+    def next_page_size(self):
+        with self.lock:
+            return self.page_size
+
+    def wait_for_turn(self):
+        """
+        Sleep until the throttling delay of the rule is over
+        """
+        delay = self.resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def record_page(self, limit, seconds, payload_bytes):
+        """
+        Adapt the page size to a successful call
+        :param limit: Page size of the call
+        :param seconds: Duration of the call
+        :param payload_bytes: Size of the response body
+        """
+        if not self.adaptive:
+            return
+        with self.lock:
+            if seconds > PAGE_TARGET_SECONDS or payload_bytes > PAGE_MAX_BYTES:
+                self.page_size = max(min(self.page_size, limit) // 2, MIN_PAGE_SIZE)
+            elif seconds < PAGE_TARGET_SECONDS / 2 and payload_bytes < PAGE_MAX_BYTES / 2 and limit >= self.page_size:
+                self.page_size = min(self.page_size * 2, MAX_PAGE_SIZE)
+
+    def record_throttled(self, delay):
+        """
+        Shrink the page size and pause the calls of the rule after a 429
+        :param delay: Seconds to wait before the next call
+        """
+        with self.lock:
+            if self.adaptive:
+                self.page_size = max(self.page_size // 2, MIN_PAGE_SIZE)
+            self.resume_at = max(self.resume_at, time.monotonic() + delay)
+
+
+def get_secret_manager_service():
+    """
+    Return the secret manager client of the function instance
+    """
+    return clients.get_client("secretmanager", "v1")
+
 
 def get_secret_value(secret_name):
     """
@@ -58,7 +242,7 @@ def get_secret_value(secret_name):
     :param secret_name: Name of the secret parameter
     """
     try:
-        service = discovery.build("secretmanager", "v1")
+        service = get_secret_manager_service()
         versions = service.projects().secrets().versions()
 
         response = versions.access(name=f"projects/{PROJECT_ID}/secrets/{secret_name}/versions/latest").execute()
@@ -69,68 +253,486 @@ def get_secret_value(secret_name):
                         f" Reason: {error}") from error
 
 
+def get_secret_values(*secret_names):
+    """
+    Return the values of the given secrets. Values cached for less than SECRET_CACHE_TTL seconds are reused,
+    the other secrets are retrieved from the secret manager concurrently.
+    :param secret_names: Names of the secret parameters
+    """
+    now = time.monotonic()
+    with _secret_cache_lock:
+        values = {name: _secret_cache[name][0] for name in secret_names
+                  if name in _secret_cache and _secret_cache[name][1] > now}
+
+    missing_secret_names = [name for name in secret_names if name not in values]
+    if missing_secret_names:
+        logger.debug(f"Retrieving secrets {missing_secret_names} from secret manager")
+        fetched_values = dict(zip(missing_secret_names,
+                                  _secret_executor.map(get_secret_value, missing_secret_names)))
+        expiry_time = time.monotonic() + SECRET_CACHE_TTL
+        with _secret_cache_lock:
+            for name, value in fetched_values.items():
+                _secret_cache[name] = (value, expiry_time)
+        values.update(fetched_values)
+
+    return [values[name] for name in secret_names]
+
+
+def invalidate_secrets():
+    """
+    Drop the cached secrets so that the next call retrieves them from the secret manager
+    """
+    with _secret_cache_lock:
+        _secret_cache.clear()
+
+
 def google_cloud_function_handler(event, context):
     """
     Retrieve the violations from Netskope CSPM and publish the violations in the pub/sub
     """
     try:
-        token = get_secret_value(API_TOKEN_NAME)
-        tenant_fqdn = get_secret_value(TENANT_FQDN_NAME)
-
-        event_dict = event['attributes']
-        rule_name = event_dict['rule_name']
-        rule_short_name = event_dict['rule_short_name']
-
-        violations_to_publish = []
-        page_number = 0
-        alert_count = 0
-
-        violations = get_rule_violations(rule_name, token, tenant_fqdn, str(CHUNK_SIZE), str(page_number * CHUNK_SIZE))
-
-        # Iterate through violations and add them in list if matches the current region
-        while len(violations):
-            for violation in violations:
-                violation_info = f"account {violation['account_id']} account name"\
-                                 f" {violation['account_name']} resource_id {violation['resource_id']} resource_name"\
-                                 f" {violation['resource_name']} rule_name {violation['rule_name']}"
-
-                logger.debug(f"Got violation: {violation_info}")
-
-                region = GCP_REGIONS.get(GCP_REGION)
-                check_region_list = type(region) is list and violation["region_name"] in region
-                check_region_str = type(region) is str and violation["region_name"] == region
-
-                if check_region_list or check_region_str or violation["region_name"] == "global"\
-                        or violation["region_name"] == "":
-                    logger.info(f"Got violation from this region for the {violation_info}")
-                    violations_to_publish.append({"account_id": violation["account_id"],
-                                                  "resource_id": violation["resource_id"],
-                                                  "region_name": violation["region_name"]})
-                    alert_count += 1
-                    logger.debug("Violation is from this region")
-                else:
-                    logger.debug("Violation is from another region")
+        token, tenant_fqdn = get_secret_values(API_TOKEN_NAME, TENANT_FQDN_NAME)
 
-            page_number += 1
+        rules = get_rules_from_event(event)
+        rule_groups = group_coalesced_rules(rules)
 
-            violations = get_rule_violations(rule_name, token, tenant_fqdn,
-                                             str(CHUNK_SIZE), str(page_number * CHUNK_SIZE))
+        if len(rule_groups) == 1:
+            publish_rules_violations(rule_groups[0], token, tenant_fqdn)
+        else:
+            logger.info(f"Got {len(rules)} rules to fetch the violations for")
+            failed_rules = []
+            with ThreadPoolExecutor(max_workers=min(RULE_CONCURRENCY, len(rule_groups))) as executor:
+                futures = {executor.submit(publish_rules_violations, rule_group, token, tenant_fqdn):
+                           ", ".join(rule_name for rule_name, _ in rule_group) for rule_group in rule_groups}
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as error:
+                        logger.error(f"Error occurred while getting violations for the rule {futures[future]}."
+                                     f" Reason: {error}")
+                        failed_rules.append(futures[future])
 
-        logger.info(f"Got {alert_count} total violations for the rule {rule_name}")
-
-        if alert_count:
-            # Publish messages on pubsub
-            publisher = pubsub_v1.PublisherClient()
-            topic_path = publisher.topic_path(PROJECT_ID, rule_short_name)
-            violations_json = json.dumps({"violations": violations_to_publish}).encode('utf-8')
-            response = publisher.publish(topic_path, data=violations_json)
-            response.result()
+            if failed_rules:
+                raise Exception(f"Failed to get violations for the rules: {', '.join(failed_rules)}")
 
     except Exception as error:
         raise Exception(f"Error occurred while getting Netskope CSPM results. Reason: {error}") from error
 
 
-def get_rule_violations(rule_name, token, tenant_fqdn, limit, skip):
+def get_rules_from_event(event):
+    """
+    Return the list of (rule_name, rule_short_name) pairs to fetch the violations for.
+    The pairs are taken from the "rules" message attribute or the "rules" key of the JSON message data, either as
+    [rule_name, rule_short_name] lists or as objects with rule_name and rule_short_name keys. Messages without them
+    use the rule_name and rule_short_name attributes.
+
+    :param event: Pub/Sub event which triggered the function
+    """
+    event_dict = event.get('attributes') or {}
+    rules = event_dict.get('rules')
+
+    if rules:
+        rules = json.loads(rules)
+    elif event.get('data'):
+        try:
+            rules = json.loads(base64.b64decode(event['data']).decode('utf-8')).get('rules')
+        except (ValueError, AttributeError):
+            rules = None
+
+    if not rules:
+        return [(event_dict['rule_name'], event_dict['rule_short_name'])]
+
+    return [(rule['rule_name'], rule['rule_short_name']) if isinstance(rule, dict) else (rule[0], rule[1])
+            for rule in rules]
+
+
+def get_coalesced_rule_id(rule_short_name):
+    """
+    Return the rule ID of the rule short name, for example CIS-1-0-0-6-1 for CIS-1-0-0-6-1-us-east1, None for the
+    rules without remediation
+    :param rule_short_name: Rule short name or topic ID of the rule
+    """
+    try:
+        return remediations.get_rule_id(rule_short_name)
+    except Exception:
+        return None
+
+
+def group_coalesced_rules(rules):
+    """
+    Return the rules as the groups of rules published together: the rules of COALESCED_RULES fetched by this run
+    form one group, every other rule is a group of its own. The rule short names are matched by rule ID.
+    :param rules: List of (rule_name, rule_short_name) pairs
+    """
+    coalesced_rule_ids = [get_coalesced_rule_id(rule_short_name) for rule_short_name in COALESCED_RULES]
+    # {rule ID: first rule fetched with that rule ID}
+    coalesced = {}
+    for rule in rules:
+        rule_id = get_coalesced_rule_id(rule[1])
+        if rule_id is not None and rule_id in coalesced_rule_ids:
+            coalesced.setdefault(rule_id, rule)
+    if len(coalesced) < 2:
+        return [[rule] for rule in rules]
+    coalesced = sorted(coalesced.values(), key=lambda rule: coalesced_rule_ids.index(get_coalesced_rule_id(rule[1])))
+    return [coalesced] + [[rule] for rule in rules if rule not in coalesced]
+
+
+def publish_rules_violations(rules, token, tenant_fqdn):
+    """
+    Retrieve the violations of the rules and publish the violations of this region on the pub/sub topic of the first
+    rule, every violation with its rule_short_name when there are several rules. In router mode the violations of
+    every region are published on the "<rule_short_name>-<region>" topics.
+
+    :param rules: List of (rule_name, rule_short_name) pairs, see group_coalesced_rules
+    :param token: Token for Authentication
+    :param tenant_fqdn: Tenant host name
+    """
+    publishers = {}
+    snapshots = []
+    alert_count = 0
+    topic_rule_short_name = rules[0][1]
+    for rule_name, rule_short_name in rules:
+        snapshot = open_violation_snapshot(rule_name, get_snapshot_scope(tenant_fqdn))
+        counts = Counter()
+        add_rule_violations(rule_name, rule_short_name, token, tenant_fqdn, publishers, snapshot, counts,
+                            topic_rule_short_name if len(rules) > 1 else None)
+
+        logger.info(f"Got {counts['alerts']} total violations for the rule {rule_name}")
+        if snapshot:
+            logger.info(f"Skipped {counts['unchanged']} violations already published within the re-check interval"
+                        f" for the rule {rule_name}")
+            snapshots.append(snapshot)
+        alert_count += counts['alerts']
+
+    # Publish the remaining violations and wait for all the messages to be published
+    rule_names = ", ".join(rule_name for rule_name, _ in rules)
+    for topic, publisher in publishers.items():
+        publisher.flush()
+        logger.info(f"Published violations in {publisher.message_count} messages on topic {topic}"
+                    f" for the rule {rule_names}")
+
+    # Record the published violations only once they are delivered
+    for snapshot in snapshots:
+        snapshot.save()
+    return alert_count
+
+
+def add_rule_violations(rule_name, rule_short_name, token, tenant_fqdn, publishers, snapshot, counts,
+                        topic_rule_short_name=None):
+    """
+    Retrieve the violations of the rule and add the ones of the handled regions to their publishers. If Netskope
+    rejects the cached credentials, the secrets are retrieved again from the secret manager and the fetch resumes
+    once from the rejected page, so that the pages already published in streaming mode are not published again.
+
+    :param rule_name: Name of the rule to retrieve the alerts for
+    :param rule_short_name: Pub/Sub topic of the rule's remediation function
+    :param token: Token for Authentication
+    :param tenant_fqdn: Tenant host name
+    :param publishers: ViolationPublisher by topic, the publishers of new topics are added to it
+    :param snapshot: ViolationSnapshot of the rule, None when disabled
+    :param counts: Counter of the "alerts" added and of the "unchanged" ones skipped
+    :param topic_rule_short_name: Rule short name of the messages when the violations of several rules are
+     published together, None to publish the violations in the messages of the rule
+    """
+    try:
+        add_rule_violation_pages(rule_name, rule_short_name, token, tenant_fqdn, publishers, snapshot, counts,
+                                 topic_rule_short_name)
+    except NetskopeAuthenticationError as error:
+        logger.warning(f"Netskope API rejected the credentials for the rule {rule_name}."
+                       f" Resuming from skip {error.skip} with the secrets from secret manager")
+        token, tenant_fqdn = get_secret_values(API_TOKEN_NAME, TENANT_FQDN_NAME)
+        add_rule_violation_pages(rule_name, rule_short_name, token, tenant_fqdn, publishers, snapshot, counts,
+                                 topic_rule_short_name, skip=error.skip)
+
+
+def add_rule_violation_pages(rule_name, rule_short_name, token, tenant_fqdn, publishers, snapshot, counts,
+                             topic_rule_short_name=None, skip=0):
+    """
+    Add the violations of the pages of the rule from the skip offset to the publishers, see add_rule_violations
+    """
+    # Iterate through violations and add them in list if matches the current region
+    for violations in iter_rule_violation_pages(rule_name, token, tenant_fqdn, skip=skip):
+        for violation in violations:
+            violation_info = f"account {violation['account_id']} account name"\
+                             f" {violation['account_name']} resource_id {violation['resource_id']} resource_name"\
+                             f" {violation['resource_name']} rule_name {violation['rule_name']}"
+
+            logger.debug(f"Got violation: {violation_info}")
+
+            region = get_violation_target_region(violation["region_name"])
+            if region and snapshot and not snapshot.is_due(violation["account_id"], violation["resource_id"]):
+                logger.debug(f"Violation was already published recently for the {violation_info}")
+                counts['unchanged'] += 1
+            elif region:
+                logger.info(f"Got violation from region {region} for the {violation_info}")
+                topic = get_violation_topic(topic_rule_short_name or rule_short_name, region)
+                if topic not in publishers:
+                    publishers[topic] = ViolationPublisher(topic, topic_rule_short_name or rule_short_name)
+                violation_details = {"account_id": violation["account_id"],
+                                     "resource_id": violation["resource_id"],
+                                     "region_name": violation["region_name"]}
+                if topic_rule_short_name:
+                    violation_details[envelope.RULE_SHORT_NAME_ATTRIBUTE] = rule_short_name
+                publishers[topic].add(violation_details)
+                counts['alerts'] += 1
+            else:
+                logger.debug("Violation is from another region")
+
+        for publisher in publishers.values():
+            publisher.end_page()
+
+
+def get_snapshot_scope(tenant_fqdn):
+    """
+    Return the scope of the violation snapshots of the function: the tenant and the regions whose violations it
+    publishes, so that the functions of other regions or tenants sharing the snapshot bucket keep their own snapshots
+    :param tenant_fqdn: Tenant host name
+    """
+    if ROUTER_MODE:
+        return f"{tenant_fqdn}/router/{','.join(sorted(ROUTER_REGIONS))}"
+    return f"{tenant_fqdn}/{GCP_REGION}"
+
+
+def get_violation_target_region(region_name):
+    """
+    Return the region whose remediation function handles the violation, None if no handled region matches.
+    Global resources and the ones without region go to the current region, or ROUTER_GLOBAL_REGION in router mode.
+    :param region_name: Region name of the violation reported by Netskope
+    """
+    if region_name in ("global", ""):
+        return ROUTER_GLOBAL_REGION if ROUTER_MODE else GCP_REGION
+    return REGION_ROUTES.get(region_name)
+
+
+def get_violation_topic(rule_short_name, region):
+    """
+    Return the topic on which the violations of the rule in the region are published
+    :param rule_short_name: Pub/Sub topic of the rule's remediation function
+    :param region: Region whose remediation function handles the violation
+    """
+    topic = DISPATCHER_TOPIC or rule_short_name
+    return f"{topic}-{region}" if ROUTER_MODE else topic
+
+
+def get_publisher_client():
+    """
+    Return the pub/sub publisher client of the warm instance. The pub/sub library is imported on the first
+    published violation, a run without violations does not load it.
+    """
+    global _publisher_client
+    with _publisher_client_lock:
+        if _publisher_client is None:
+            from google.cloud import pubsub_v1
+            batch_settings = pubsub_v1.types.BatchSettings(max_messages=PUBLISHER_MAX_MESSAGES,
+                                                           max_bytes=PUBLISHER_MAX_BYTES,
+                                                           max_latency=PUBLISHER_MAX_LATENCY)
+            publisher_options = pubsub_v1.types.PublisherOptions(
+                enable_message_ordering=PUBLISH_SHARDING == "project")
+            _publisher_client = pubsub_v1.PublisherClient(batch_settings=batch_settings,
+                                                          publisher_options=publisher_options)
+        return _publisher_client
+
+
+class ViolationPublisher:
+    """
+    Publish the violations of a rule on its pub/sub topic.
+
+    In streaming mode the collected violations are published page by page, or as soon as PUBLISH_BATCH_SIZE of
+    them are pending, so the remediation function can start while the fetch is still running. Otherwise all the
+    violations are published as a single message by flush.
+
+    With "project" sharding every message holds the violations of a single project (at most SHARD_BATCH_SIZE) and
+    is published with the project ID as ordering key: different projects are remediated in parallel while the
+    messages of a project are delivered one after the other. With "batch" sharding the violations are published in
+    messages of SHARD_BATCH_SIZE violations. Shards are published as soon as they are full.
+    """
+
+    def __init__(self, topic, rule_short_name=None, stream=STREAM_PUBLISH, batch_size=PUBLISH_BATCH_SIZE,
+                 sharding=PUBLISH_SHARDING, shard_size=SHARD_BATCH_SIZE):
+        if sharding not in ("none", "project", "batch"):
+            raise Exception(f"Unsupported publish sharding {sharding}")
+
+        self.publisher = get_publisher_client()
+        self.topic_path = self.publisher.topic_path(PROJECT_ID, topic)
+        # The rule of the messages, which routes them in the remediation dispatcher function
+        self.rule_short_name = rule_short_name or topic
+        self.stream = stream
+        self.sharding = sharding
+        if sharding != "none":
+            self.message_size = shard_size
+        else:
+            self.message_size = batch_size if stream else 0
+        # Pending violations by ordering key, None when messages are not ordered
+        self.pending = {}
+        self.futures = []
+        self.message_count = 0
+
+    def add(self, violation):
+        """
+        Add a violation to be published
+        :param violation: Violation details to publish
+        """
+        ordering_key = violation["account_id"] if self.sharding == "project" else None
+        pending = self.pending.setdefault(ordering_key, [])
+        pending.append(violation)
+        if self.message_size and len(pending) >= self.message_size:
+            self.publish_shard(ordering_key)
+
+    def end_page(self):
+        """
+        Publish the pending violations at the end of a page in streaming mode without message size
+        """
+        if self.stream and not self.message_size:
+            self.publish_pending()
+
+    def publish_shard(self, ordering_key):
+        """
+        Publish the pending violations of the ordering key as one message without waiting for the result
+        :param ordering_key: Ordering key of the message, None for no ordering
+        """
+        violations = self.pending.pop(ordering_key, None)
+        if not violations:
+            return
+
+        data, attributes = envelope.encode_violations(violations, ENVELOPE_VERSION, ENVELOPE_COMPRESSION)
+        attributes[envelope.RULE_SHORT_NAME_ATTRIBUTE] = self.rule_short_name
+        self.futures.append(self.publisher.publish(self.topic_path, data=data, ordering_key=ordering_key or "",
+                                                   **attributes))
+        self.message_count += 1
+
+        # Surface publish errors early and release the futures which are already resolved
+        for future in [future for future in self.futures if future.done()]:
+            future.result()
+            self.futures.remove(future)
+
+    def publish_pending(self):
+        """
+        Publish all the pending violations without waiting for the result
+        """
+        for ordering_key in list(self.pending):
+            self.publish_shard(ordering_key)
+
+    def flush(self):
+        """
+        Publish the pending violations and wait for all the published messages
+        """
+        self.publish_pending()
+        for future in self.futures:
+            future.result()
+        self.futures = []
+
+
+def get_http_session():
+    """
+    Return the pooled HTTP session used for the Netskope API calls.
+    The session keeps the TLS connections alive across pages and warm invocations.
+    """
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENT_REQUESTS)
+            session.mount("https://", adapter)
+            # Plain HTTP is only used with NETSKOPE_API_BASE_URL, by the local fake API of the benchmarks
+            session.mount("http://", adapter)
+            session.headers.update({"Accept-Encoding": "gzip, deflate"})
+            _http_session = session
+        return _http_session
+
+
+def iter_rule_violation_pages(rule_name, token, tenant_fqdn, pager=None, concurrency=PREFETCH_CONCURRENCY, skip=0):
+    """
+    Yield the pages of violations for the given rule in order, keeping up to `concurrency` requests in flight.
+    Iteration stops at the first empty page; pages requested beyond it are discarded.
+
+    :param rule_name: Name of the rule to retrieve the alerts for
+    :param token: Token for Authentication
+    :param tenant_fqdn: Tenant host name
+    :param pager: AdaptivePager giving the page size of the next request
+    :param concurrency: No of pages to fetch ahead
+    :param skip: No of alerts to skip before the first page
+    """
+    pager = pager or AdaptivePager()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    pending = deque()
+    next_skip = skip
+    try:
+        while True:
+            while len(pending) < concurrency:
+                page_size = pager.next_page_size()
+                pending.append(executor.submit(get_rule_violations_with_retry, rule_name, token, tenant_fqdn,
+                                               str(page_size), str(next_skip), pager))
+                next_skip += page_size
+
+            violations = pending.popleft().result()
+            if not violations:
+                break
+            yield violations
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def get_rule_violations_with_retry(rule_name, token, tenant_fqdn, limit, skip, pager):
+    """
+    Retrieve the alerts from Netskope for the given parameters, retrying the same skip offset on 429, 5xx and
+    connection errors. The Retry-After header is honoured, otherwise the delay is a jittered exponential backoff.
+
+    :param rule_name: Name of the rule to retrieve the alerts for
+    :param token: Token for Authentication
+    :param tenant_fqdn: Tenant host name
+    :param limit: No of alerts to retrieve
+    :param skip: No of alerts to skip
+    :param pager: AdaptivePager of the rule
+    """
+    for retry in range(MAX_PAGE_RETRIES + 1):
+        pager.wait_for_turn()
+        try:
+            return get_rule_violations(rule_name, token, tenant_fqdn, limit, skip, pager)
+        except NetskopeRetryableError as error:
+            if retry == MAX_PAGE_RETRIES:
+                raise Exception(f"Error occurred while calling Netskope API for skip {skip}."
+                                f" Reason: Max retries exceeded. Error: {error}") from error
+
+            delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** retry))
+            if error.retry_after is not None:
+                delay += error.retry_after
+            if error.status_code == 429:
+                pager.record_throttled(delay)
+
+            logger.warning(f"Netskope API call for {rule_name} with skip {skip} failed. Reason: {error}."
+                           f" Retrying {retry + 1}/{MAX_PAGE_RETRIES} in {delay:.1f} seconds")
+            time.sleep(delay)
+
+
+def get_retry_after_seconds(response):
+    """
+    Return the delay requested by the Retry-After header of the response in seconds, None if absent
+    :param response: Response of the Netskope API
+    """
+    retry_after = response.headers.get("Retry-After")
+    if not retry_after:
+        return None
+    try:
+        return max(float(retry_after), 0)
+    except ValueError:
+        try:
+            return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0)
+        except (TypeError, ValueError):
+            return None
+
+
+def iter_counted_chunks(chunks, counter):
+    """
+    Yield the chunks, adding their size to counter["bytes"]
+    """
+    for chunk in chunks:
+        counter["bytes"] += len(chunk)
+        yield chunk
+
+
+def get_rule_violations(rule_name, token, tenant_fqdn, limit, skip, pager=None):
     """
     Retrieve the alerts from Netskope for the given parameters
 
@@ -139,18 +741,44 @@ def get_rule_violations(rule_name, token, tenant_fqdn, limit, skip):
     :param tenant_fqdn: Tenant host name
     :param limit: No of alerts to retrieve
     :param skip: No of alerts to skip
+    :param pager: AdaptivePager recording the latency and size of the page
     """
     try:
-        get_url = f"https://{tenant_fqdn}/api/v1/security_assessment"
+        base_url = NETSKOPE_API_BASE_URL.rstrip('/') or f"https://{tenant_fqdn}"
+        get_url = f"{base_url}/api/v1/security_assessment"
         payload = {'token': token, 'cloud_provider': 'googlecloud', 'status': 'Failed', 'muted': 'No',
                    'rule_name': rule_name,
                    'limit': limit, 'skip': skip}
 
-        logger.info(f"Calling Netskope API for {rule_name}")
+        logger.info(f"Calling Netskope API for {rule_name} with skip {skip}")
 
-        response = requests.get(get_url, params=payload)
-        response.raise_for_status()
+        with _request_semaphore:
+            start_time = time.monotonic()
+            with get_http_session().get(get_url, params=payload, stream=STREAM_PARSE) as response:
+                if response.status_code in (401, 403):
+                    invalidate_secrets()
+                    raise NetskopeAuthenticationError(f"Netskope API returned {response.status_code}"
+                                                      f" for {rule_name}", int(skip))
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise NetskopeRetryableError(f"Netskope API returned {response.status_code}",
+                                                 response.status_code, get_retry_after_seconds(response))
+                response.raise_for_status()
+
+                if STREAM_PARSE:
+                    counter = {"bytes": 0}
+                    violations = parse_violations(iter_counted_chunks(
+                        response.iter_content(chunk_size=STREAM_PARSE_CHUNK_SIZE), counter))
+                    payload_bytes = counter["bytes"]
+                else:
+                    violations = response.json()["data"]
+                    payload_bytes = len(response.content)
 
-        return response.json()["data"]
+        if pager:
+            pager.record_page(int(limit), time.monotonic() - start_time, payload_bytes)
+        return violations
+    except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as error:
+        raise NetskopeRetryableError(str(error)) from error
+    except (NetskopeAuthenticationError, NetskopeRetryableError):
+        raise
     except Exception as error:
         raise Exception(f"Error occurred while calling Netskope API. Reason: {error}") from error
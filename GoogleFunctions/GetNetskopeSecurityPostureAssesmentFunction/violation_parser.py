@@ -0,0 +1,154 @@
+import codecs
+import json
+
+# Fields of a Netskope violation used by the fetcher
+VIOLATION_FIELDS = ("account_id", "account_name", "resource_id", "resource_name", "rule_name", "region_name")
+
+JSON_WHITESPACE = " \t\n\r"
+# Characters which may continue a JSON number
+JSON_NUMBER_CHARACTERS = frozenset("0123456789.eE+-")
+
+
+class ViolationRecord:
+    """
+    Compact violation holding only the fields used by the fetcher.
+    Supports violation["field"] access so it can be used in place of the API response dict.
+    """
+    __slots__ = VIOLATION_FIELDS
+
+    def __init__(self, account_id, account_name, resource_id, resource_name, rule_name, region_name):
+        self.account_id = account_id
+        self.account_name = account_name
+        self.resource_id = resource_id
+        self.resource_name = resource_name
+        self.rule_name = rule_name
+        self.region_name = region_name
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __repr__(self):
+        return f"ViolationRecord({', '.join(f'{field}={getattr(self, field)!r}' for field in VIOLATION_FIELDS)})"
+
+    @classmethod
+    def from_dict(cls, violation):
+        """
+        Project a violation of the API response on the used fields
+        :param violation: Violation dict of the API response
+        """
+        return cls(*(violation.get(field) for field in VIOLATION_FIELDS))
+
+
+class StreamingArrayParser:
+    """
+    Incrementally parse a JSON object received in chunks and yield the items of one of its top level arrays.
+    Only one item is decoded at a time, so the memory used does not grow with the size of the array.
+    """
+
+    def __init__(self, chunks, key="data"):
+        self.chunks = iter(chunks)
+        self.key = key
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+
+    def read_chunk(self):
+        """
+        Append the next chunk to the buffer, dropping the part of the buffer which is already parsed
+        """
+        if self.position:
+            self.buffer = self.buffer[self.position:]
+            self.position = 0
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.eof = True
+            self.buffer += self.text_decoder.decode(b"", final=True)
+        else:
+            self.buffer += self.text_decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+
+    def peek(self):
+        """
+        Skip the whitespaces and return the next character, empty string at the end of the stream
+        """
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in JSON_WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer) or self.eof:
+                return self.buffer[self.position:self.position + 1]
+            self.read_chunk()
+
+    def expect(self, character):
+        if self.peek() != character:
+            raise ValueError(f"Expected {character!r} at offset {self.position} of the JSON response")
+        self.position += 1
+
+    def next_item(self, end):
+        """
+        Skip the comma after an item and return True if another item follows, False at the end of the container
+        :param end: Closing character of the container, ] or }
+        """
+        if self.peek() == end:
+            return False
+        self.expect(",")
+        return True
+
+    def number_continues(self, end):
+        """
+        Return True if only number characters follow the number ending at end up to the end of the buffer, the number
+        may then continue in the next chunk, for example 1. or 1e
+        :param end: Position after the decoded number
+        """
+        while end < len(self.buffer):
+            if self.buffer[end] not in JSON_NUMBER_CHARACTERS:
+                return False
+            end += 1
+        return True
+
+    def decode_value(self):
+        """
+        Decode the JSON value starting at the current position, reading more chunks until it is complete
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self.read_chunk()
+                continue
+            number = isinstance(value, (int, float)) and not isinstance(value, bool)
+            if number and not self.eof and self.number_continues(end):
+                # A number at the end of the buffer may continue in the next chunk
+                self.read_chunk()
+                continue
+            self.position = end
+            return value
+
+    def __iter__(self):
+        self.expect("{")
+        more = self.peek() != "}"
+        while more:
+            key = self.decode_value()
+            self.expect(":")
+            if key != self.key:
+                self.decode_value()
+            else:
+                self.expect("[")
+                more = self.peek() != "]"
+                while more:
+                    yield self.decode_value()
+                    more = self.next_item("]")
+                return
+            more = self.next_item("}")
+        raise KeyError(self.key)
+
+
+def parse_violations(chunks):
+    """
+    Return the violations of a Netskope API response streamed in chunks as ViolationRecord objects
+    :param chunks: Chunks of the response body
+    """
+    return [ViolationRecord.from_dict(violation) for violation in StreamingArrayParser(chunks)]
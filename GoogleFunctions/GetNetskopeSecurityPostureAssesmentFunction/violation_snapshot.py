@@ -0,0 +1,198 @@
+import abc
+import hashlib
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from googleapiclient.errors import HttpError
+from common import clients
+
+logger = logging.getLogger("get-alert-function")
+
+# Snapshot backend: none, sqlite or gcs
+SNAPSHOT_BACKEND = os.getenv('SNAPSHOT_BACKEND', 'none').lower()
+SNAPSHOT_SQLITE_PATH = os.getenv('SNAPSHOT_SQLITE_PATH', '/tmp/violation_snapshot.db')
+SNAPSHOT_BUCKET = os.getenv('SNAPSHOT_BUCKET')
+SNAPSHOT_PREFIX = os.getenv('SNAPSHOT_PREFIX', 'violation-snapshots/')
+# Seconds after which a violation which is still failing is published again
+RECHECK_INTERVAL_SECONDS = int(os.getenv('RECHECK_INTERVAL_SECONDS', '86400'))
+
+
+def get_snapshot_key(rule_name, scope):
+    """
+    Return the key of the snapshot of a rule in a store
+    :param rule_name: Name of the rule
+    :param scope: Tenant and regions of the fetch function, see get_snapshot_scope of the function
+    """
+    return f"{scope}|{rule_name}"
+
+
+class ViolationSnapshotStore(abc.ABC):
+    """
+    Persist the time at which each violation of a rule was last published.
+    Subclasses implement load and save for a storage backend.
+    """
+
+    @abc.abstractmethod
+    def load(self, key):
+        """
+        Return the snapshot as {(account_id, resource_id): published time}
+        :param key: Key of the snapshot, see get_snapshot_key
+        """
+
+    @abc.abstractmethod
+    def save(self, key, entries):
+        """
+        Replace the snapshot
+        :param key: Key of the snapshot, see get_snapshot_key
+        :param entries: Snapshot as {(account_id, resource_id): published time}
+        """
+
+
+class SQLiteSnapshotStore(ViolationSnapshotStore):
+    """
+    Snapshot store backed by a local SQLite database
+    """
+
+    def __init__(self, path=SNAPSHOT_SQLITE_PATH):
+        self.path = path
+        with closing(self.connect()) as connection, connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS violation_snapshots (snapshot_key TEXT NOT NULL,"
+                               " account_id TEXT NOT NULL, resource_id TEXT NOT NULL, published_at REAL NOT NULL,"
+                               " PRIMARY KEY (snapshot_key, account_id, resource_id))")
+
+    def connect(self):
+        # A connection per call, as the rules of an invocation are processed on different threads. sqlite3 connections
+        # only commit or roll back as context managers, the callers close them with contextlib.closing
+        return sqlite3.connect(self.path, timeout=30)
+
+    def load(self, key):
+        with closing(self.connect()) as connection, connection:
+            rows = connection.execute("SELECT account_id, resource_id, published_at FROM violation_snapshots"
+                                      " WHERE snapshot_key = ?", (key,))
+            return {(account_id, resource_id): published_at for account_id, resource_id, published_at in rows}
+
+    def save(self, key, entries):
+        with closing(self.connect()) as connection, connection:
+            connection.execute("DELETE FROM violation_snapshots WHERE snapshot_key = ?", (key,))
+            connection.executemany("INSERT INTO violation_snapshots VALUES (?, ?, ?, ?)",
+                                   ((key, account_id, resource_id, published_at)
+                                    for (account_id, resource_id), published_at in entries.items()))
+
+
+class GCSSnapshotStore(ViolationSnapshotStore):
+    """
+    Snapshot store keeping one JSON object per snapshot key in a Cloud Storage bucket
+    """
+
+    def __init__(self, bucket=SNAPSHOT_BUCKET, prefix=SNAPSHOT_PREFIX):
+        if not bucket:
+            raise Exception("SNAPSHOT_BUCKET is required for the gcs snapshot backend")
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def get_service(self):
+        return clients.get_client("storage", "v1")
+
+    def object_name(self, key):
+        return f"{self.prefix}{hashlib.sha1(key.encode('utf-8')).hexdigest()}.json"
+
+    def load(self, key):
+        try:
+            data = self.get_service().objects().get_media(bucket=self.bucket,
+                                                          object=self.object_name(key)).execute()
+        except HttpError as http_error:
+            if http_error.resp.status == 404:
+                return {}
+            raise
+        return {(account_id, resource_id): published_at
+                for account_id, resource_id, published_at in json.loads(data).get("violations", [])}
+
+    def save(self, key, entries):
+        # Imported here as the HTTP module of googleapiclient is only needed by the gcs backend
+        from googleapiclient.http import MediaIoBaseUpload
+        data = json.dumps({"key": key,
+                           "violations": [[account_id, resource_id, published_at]
+                                          for (account_id, resource_id), published_at in entries.items()]})
+        media = MediaIoBaseUpload(io.BytesIO(data.encode('utf-8')), mimetype="application/json")
+        self.get_service().objects().insert(bucket=self.bucket, name=self.object_name(key),
+                                            media_body=media).execute()
+
+
+class ViolationSnapshot:
+    """
+    Snapshot of a rule for one fetch run. Tells which violations are due for publishing and records the
+    violations seen in this run, so that the violations which are no longer reported are dropped on save.
+    The snapshot of a rule is kept per scope, the fetch functions of other tenants or regions sharing the store
+    have their own.
+    """
+
+    def __init__(self, store, rule_name, scope, recheck_interval=RECHECK_INTERVAL_SECONDS):
+        self.store = store
+        self.rule_name = rule_name
+        self.key = get_snapshot_key(rule_name, scope)
+        self.recheck_interval = recheck_interval
+        self.now = time.time()
+        self.previous_entries = store.load(self.key)
+        self.entries = {}
+
+    def is_due(self, account_id, resource_id):
+        """
+        Return True if the violation is new or was last published more than recheck_interval seconds ago
+        :param account_id: Project ID of the violation
+        :param resource_id: Resource ID of the violation
+        """
+        key = (account_id, resource_id)
+        if key in self.entries:
+            # Already handled in this run
+            return False
+        published_at = self.previous_entries.get(key)
+        if published_at is None or self.now - published_at >= self.recheck_interval:
+            self.entries[key] = self.now
+            return True
+        self.entries[key] = published_at
+        return False
+
+    def save(self):
+        """
+        Persist the violations seen in this run
+        """
+        self.store.save(self.key, self.entries)
+
+
+_snapshot_store = None
+_snapshot_store_lock = threading.Lock()
+
+
+def get_snapshot_store():
+    """
+    Return the snapshot store configured with SNAPSHOT_BACKEND, None if snapshots are disabled
+    """
+    global _snapshot_store
+    with _snapshot_store_lock:
+        if _snapshot_store is None:
+            if SNAPSHOT_BACKEND == "sqlite":
+                _snapshot_store = SQLiteSnapshotStore()
+            elif SNAPSHOT_BACKEND == "gcs":
+                _snapshot_store = GCSSnapshotStore()
+            elif SNAPSHOT_BACKEND != "none":
+                raise Exception(f"Unsupported snapshot backend {SNAPSHOT_BACKEND}")
+        return _snapshot_store
+
+
+def open_violation_snapshot(rule_name, scope):
+    """
+    Load the snapshot of the rule, None if snapshots are disabled
+    :param rule_name: Name of the rule
+    :param scope: Tenant and regions of the fetch function, see get_snapshot_key
+    """
+    store = get_snapshot_store()
+    if store is None:
+        return None
+    snapshot = ViolationSnapshot(store, rule_name, scope)
+    logger.info(f"Loaded snapshot of {len(snapshot.previous_entries)} violations for the rule {rule_name}")
+    return snapshot
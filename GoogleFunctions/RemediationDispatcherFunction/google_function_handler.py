@@ -0,0 +1,25 @@
+import logging
+import os
+from common import envelope, remediations
+
+# Set up  logger
+LOG_LEVEL = os.getenv('LOGLEVEL', 'INFO')
+logger = logging.getLogger("remediation-dispatcher-function")
+logger.setLevel(logging.getLevelName(LOG_LEVEL))
+logging.getLogger('googleapiclient.discovery_cache').setLevel(logging.ERROR)
+
+
+def google_cloud_function_handler(event, context):
+    """
+    Google Cloud function remediating the violations of every rule. Each message is handed to the remediation module
+    of the rule given by its rule_short_name attribute, see common/remediations. The rules remediated by a warm
+    instance share its Google API clients, HTTP transports and executors.
+    """
+    rule_short_name = envelope.get_rule_short_name(event)
+    try:
+        module = remediations.get_rule_module(rule_short_name)
+    except Exception as error:
+        raise Exception(f"Error occurred while dispatching the message. Reason: {error}") from error
+
+    logger.info(f"Dispatching the message of the rule {rule_short_name} to {module.__name__}")
+    module.google_cloud_function_handler(event, context)
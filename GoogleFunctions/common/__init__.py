@@ -0,0 +1,4 @@
+"""
+Modules shared by the Netskope auto-remediation Google Cloud Functions.
+The directory is packaged next to main.py in the zip archive of every function.
+"""
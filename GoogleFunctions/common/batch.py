@@ -0,0 +1,70 @@
+"""
+Batched read phase of the remediation functions.
+
+Before the violations of a message are remediated, the state of their resources is fetched with HTTP batch requests
+of up to BATCH_SIZE calls, instead of one get per violation. A resource which could not be read in a batch is left
+out of the result, and the remediation then reads it on its own as before.
+
+Remediations which change many resources at once, such as the subnets of a VPC network, submit their updates with
+batch_execute: the calls of a batch are run concurrently by the API, and the error of every call is returned to the
+remediation.
+"""
+import logging
+import os
+
+logger = logging.getLogger("batch-read")
+
+# Maximum number of calls per HTTP batch request, 100 is the limit of the Google APIs
+BATCH_SIZE = int(os.getenv('BATCH_SIZE', '100'))
+
+
+def batch_execute(service, requests, batch_size=BATCH_SIZE, log=logger):
+    """
+    Execute the requests in HTTP batches and return ({key: response}, {key: exception}).
+    When a whole batch fails, its error is returned for each of its calls.
+    :param service: Google API client of the requests
+    :param requests: Requests to execute as {key: HttpRequest}
+    :param batch_size: Maximum number of calls per HTTP batch request
+    :param log: Logger of the function
+    """
+    responses = {}
+    errors = {}
+    keys = list(requests)
+    for start in range(0, len(keys), max(batch_size, 1)):
+        batch_keys = keys[start:start + batch_size]
+
+        def callback(request_id, response, exception):
+            key = batch_keys[int(request_id)]
+            if exception is not None:
+                errors[key] = exception
+            else:
+                responses[key] = response
+
+        batch = service.new_batch_http_request(callback=callback)
+        for index, key in enumerate(batch_keys):
+            batch.add(requests[key], request_id=str(index))
+        try:
+            batch.execute()
+        except Exception as error:
+            log.warning(f"HTTP batch of {len(batch_keys)} calls failed. Reason: {error}")
+            for key in batch_keys:
+                if key not in responses:
+                    errors.setdefault(key, error)
+    return responses, errors
+
+
+def batch_read(service, requests, batch_size=BATCH_SIZE, log=logger):
+    """
+    Execute the read requests in HTTP batches and return the responses as {key: response}.
+    Failed calls and batches are logged and left out of the result.
+    :param service: Google API client of the requests
+    :param requests: Requests to execute as {key: HttpRequest}
+    :param batch_size: Maximum number of calls per HTTP batch request
+    :param log: Logger of the function
+    """
+    responses, errors = batch_execute(service, requests, batch_size, log=log)
+    for key, error in errors.items():
+        log.debug(f"Batched read of {key} failed, it is read again by its remediation. Reason: {error}")
+    log.info(f"Read {len(responses)} of {len(requests)} resources in {-(-len(requests) // max(batch_size, 1))} "
+             f"batches")
+    return responses
@@ -0,0 +1,148 @@
+"""
+Registry of the Google API clients of a function instance.
+
+A client is built once per (api, version, credentials) and reused by all the violations of a message and by the
+following warm invocations. httplib2 connections are not thread safe, hence the requests of a shared client are
+executed over an HTTP connection of the calling thread.
+
+The clients are built from the discovery documents of common/discovery_documents, pinned to the
+google-api-python-client release of the functions and trimmed to the resources they call, see
+GCPShellScript/functions/update_discovery_documents.py. The Google API libraries are imported on the first client,
+so that importing a function does not pay for them before it handles a message.
+
+When GOOGLE_API_ROOT_URL is set, for example to the local stand-in of benchmarks/fake_apis.py, the requests of every
+API are sent to "<GOOGLE_API_ROOT_URL>/<api>/" with anonymous credentials instead of the Google APIs.
+"""
+import json
+import os
+import threading
+
+SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+DISCOVERY_DOCUMENTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "discovery_documents")
+GOOGLE_API_ROOT_URL = os.getenv('GOOGLE_API_ROOT_URL', '')
+
+_clients = {}
+_clients_lock = threading.Lock()
+_default_credentials = None
+_thread_transports = threading.local()
+
+
+def get_default_credentials():
+    """
+    Return the application default credentials of the function, loaded once per instance
+    """
+    global _default_credentials
+    with _clients_lock:
+        if _default_credentials is None:
+            if GOOGLE_API_ROOT_URL:
+                from google.auth.credentials import AnonymousCredentials
+                _default_credentials = AnonymousCredentials()
+            else:
+                import google.auth
+                _default_credentials, _ = google.auth.default(scopes=SCOPES)
+        return _default_credentials
+
+
+def get_thread_http(credentials):
+    """
+    Return the authorized HTTP connection of the calling thread for the credentials
+    :param credentials: Google credentials
+    """
+    transports = getattr(_thread_transports, "transports", None)
+    if transports is None:
+        transports = _thread_transports.transports = {}
+    http = transports.get(id(credentials))
+    if http is None:
+        import google_auth_httplib2
+        import httplib2
+        http = transports[id(credentials)] = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http())
+    return http
+
+
+def get_client(api, version, credentials=None):
+    """
+    Return the client of the Google API, built on first use
+    :param api: Name of the API, for example compute
+    :param version: Version of the API, for example v1
+    :param credentials: Google credentials, the application default credentials if not given
+    """
+    credentials = credentials or get_default_credentials()
+    key = (api, version, id(credentials))
+
+    entry = _clients.get(key)
+    if entry is None:
+        with _clients_lock:
+            entry = _clients.get(key)
+            if entry is None:
+                client = build_client(api, version, credentials)
+                # The credentials are kept with the client so that their id is not reused while it is cached
+                entry = _clients[key] = (client, credentials)
+    return entry[0]
+
+
+def get_discovery_document(api, version):
+    """
+    Return the bundled discovery document of the API as a string, None if it is not bundled
+    :param api: Name of the API, for example compute
+    :param version: Version of the API, for example v1
+    """
+    try:
+        with open(os.path.join(DISCOVERY_DOCUMENTS_DIR, f"{api}.{version}.json")) as document:
+            return document.read()
+    except FileNotFoundError:
+        return None
+
+
+def build_client(api, version, credentials):
+    """
+    Build the client of the Google API from its bundled discovery document, or from the documents of
+    google-api-python-client for the APIs which are not bundled. The requests of the client are executed over the
+    HTTP connection of the calling thread.
+    """
+    from googleapiclient import discovery, discovery_cache
+    from googleapiclient.http import HttpRequest
+
+    def build_request(http, *args, **kwargs):
+        return HttpRequest(get_thread_http(credentials), *args, **kwargs)
+
+    document = get_discovery_document(api, version) or discovery_cache.get_static_doc(api, version)
+    if document is None:
+        raise Exception(f"No discovery document found for the API {api} {version}")
+    if GOOGLE_API_ROOT_URL:
+        # The batch requests are sent to the root URL, hence it is replaced rather than the endpoint of the client
+        document = json.loads(document)
+        document["rootUrl"] = document["mtlsRootUrl"] = f"{GOOGLE_API_ROOT_URL.rstrip('/')}/{api}/"
+    return discovery.build_from_document(document, credentials=credentials, requestBuilder=build_request)
+
+
+def clear_clients():
+    """
+    Drop the cached clients, for example after the credentials of the function changed
+    """
+    with _clients_lock:
+        _clients.clear()
+
+
+def get_error_details(error):
+    """
+    Return the first error of a Google API error response, as {"reason": ..., "message": ...}, empty if the error
+    is not an API error with a JSON body
+    :param error: Exception of an API call, usually a googleapiclient HttpError
+    """
+    response, content = getattr(error, "resp", None), getattr(error, "content", None)
+    if response is None or not content or not response.get('content-type', '').startswith('application/json'):
+        return {}
+    try:
+        body = json.loads(content)
+    except ValueError:
+        return {}
+    errors = (body.get('error') or {}).get('errors') or [{}]
+    return errors[0]
+
+
+def get_error_reason(error):
+    """
+    Return the reason of a Google API error, for example resourceNotReady, None if the error has none
+    :param error: Exception of an API call
+    """
+    return get_error_details(error).get("reason")
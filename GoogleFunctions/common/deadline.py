@@ -0,0 +1,148 @@
+"""
+Time budget of a remediation invocation.
+
+A function is stopped by Cloud Functions when it reaches its timeout, FUNCTION_TIMEOUT_SEC seconds (300 if not set).
+To not lose the work of a big message, the executors stop starting violations DEADLINE_MARGIN seconds before the
+timeout, and the violations left are re-published on the topic which triggered the function as a continuation
+message with the same attributes. The backlog of a rule is then drained over several invocations, each one making
+progress, instead of restarting from the first violation of the message after every timeout.
+
+The violations deferred by the executor because their resource was busy are published on DEFERRED_RETRY_TOPIC the
+same way, see executor.RetryLater. Pub/Sub delivers them at once, the retry_attempt attribute counts the times the
+violations of a message were deferred to the topic: past DEFERRED_RETRIES, they fail the invocation instead and their
+message is retried with the backoff of the retry policy of the subscription.
+
+The violations left and deferred are published whether or not other violations of the invocation failed, the
+handler raises for the failed violations only after publishing them. A violation which always fails does not stop the
+rest of the message from being remediated, whether or not the function is retried on failure.
+"""
+import base64
+import logging
+import os
+import time
+
+from common import clients, envelope, executor
+
+logger = logging.getLogger("remediation-deadline")
+
+# Timeout of the function, set by the python3.7 runtime. Set it with the timeout of the function on newer runtimes
+FUNCTION_TIMEOUT = float(os.getenv('FUNCTION_TIMEOUT_SEC', '300'))
+# Seconds before the timeout after which no violation is started, 0 to remediate every violation of the message
+DEADLINE_MARGIN = float(os.getenv('DEADLINE_MARGIN', '60'))
+
+# Number of times the violations of the message were re-published
+CONTINUATION_ATTRIBUTE = "continuation"
+# Number of times the violations of the message were deferred to DEFERRED_RETRY_TOPIC
+RETRY_ATTEMPT_ATTRIBUTE = "retry_attempt"
+
+
+class TimeBudget:
+    """
+    Time left to an invocation before the margin of its deadline
+    """
+
+    def __init__(self, topic, timeout=FUNCTION_TIMEOUT, margin=DEADLINE_MARGIN):
+        """
+        :param topic: Topic on which the violations left are re-published, projects/<project>/topics/<topic>
+        :param timeout: Timeout of the function in seconds, counted from now
+        :param margin: Seconds before the timeout after which no violation is started
+        """
+        self.topic = topic
+        self.deadline = time.monotonic() + timeout - margin
+
+    def remaining(self):
+        return self.deadline - time.monotonic()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+
+def get_trigger_topic(context):
+    """
+    Return the topic which triggered the function, None if the event context does not give it
+    :param context: Event context of the function
+    """
+    resource = getattr(context, "resource", None)
+    if isinstance(resource, dict):
+        resource = resource.get("name")
+    if isinstance(resource, str) and "/topics/" in resource:
+        return resource
+    return None
+
+
+def start_budget(context):
+    """
+    Return the TimeBudget of the invocation, to be called first by the handler. None when the margin is 0 or the
+    trigger topic is unknown, every violation of the message is then remediated.
+    :param context: Event context of the function
+    """
+    topic = get_trigger_topic(context)
+    if DEADLINE_MARGIN <= 0 or topic is None:
+        return None
+    return TimeBudget(topic)
+
+
+def get_retry_topic():
+    """
+    Return the path of DEFERRED_RETRY_TOPIC, a topic ID being taken in the project of the function
+    """
+    topic = executor.DEFERRED_RETRY_TOPIC
+    return topic if "/" in topic else f"projects/{os.getenv('GCP_PROJECT')}/topics/{topic}"
+
+
+def publish_violations(topic, event, violations, **extra_attributes):
+    """
+    Publish the violations as one message with the attributes and the encoding of the event
+    :param topic: Topic path, projects/<project>/topics/<topic>
+    :param event: Pub/Sub event which triggered the function
+    :param violations: Violations to publish
+    :param extra_attributes: Attributes added to the ones of the event
+    """
+    attributes = dict(event.get('attributes') or {})
+    version = int(attributes.get(envelope.ENVELOPE_VERSION_ATTRIBUTE, '1'))
+    compression = attributes.pop(envelope.CONTENT_ENCODING_ATTRIBUTE, 'none')
+    data, encoding_attributes = envelope.encode_violations(violations, version, compression)
+    attributes.update(encoding_attributes, **extra_attributes)
+
+    try:
+        service = clients.get_client("pubsub", "v1")
+        body = {"messages": [{"data": base64.b64encode(data).decode("ascii"), "attributes": attributes}]}
+        service.projects().topics().publish(topic=topic, body=body).execute(num_retries=3)
+    except Exception as error:
+        raise Exception(f"Error occurred while publishing {len(violations)} violations on {topic}. "
+                        f"Reason: {error}") from error
+
+
+def publish_leftover(budget, event, summary, log=logger):
+    """
+    Re-publish the violations left by the executor before the deadline on the trigger topic as a continuation
+    message, and the violations it deferred on DEFERRED_RETRY_TOPIC. To be called before summary.raise_for_failures.
+    The deferred violations of a message deferred DEFERRED_RETRIES times already are added to the failures of the
+    summary instead.
+    :param budget: TimeBudget of the invocation, None if there is none
+    :param event: Pub/Sub event which triggered the function
+    :param summary: RemediationSummary of the invocation
+    :param log: Logger of the function
+    """
+    attributes = event.get('attributes') or {}
+    retry_attempt = int(attributes.get(RETRY_ATTEMPT_ATTRIBUTE, '0')) + 1
+    if summary.deferred and retry_attempt > executor.DEFERRED_RETRIES:
+        error = executor.RetryLater(f"The resource is still busy after {executor.DEFERRED_RETRIES} retries on "
+                                    f"{executor.DEFERRED_RETRY_TOPIC}")
+        log.error(f"Not deferring the {len(summary.deferred)} violations with a busy resource again, the message was "
+                  f"deferred {executor.DEFERRED_RETRIES} times")
+        for violation in summary.deferred:
+            summary.add(executor.RemediationOutcome(violation, violation.get("account_id"), error=error))
+        summary.deferred = []
+
+    if budget is not None and summary.leftover:
+        continuation = str(int(attributes.get(CONTINUATION_ATTRIBUTE, '0')) + 1)
+        publish_violations(budget.topic, event, summary.leftover, **{CONTINUATION_ATTRIBUTE: continuation})
+        log.info(f"Re-published the {len(summary.leftover)} violations left before the deadline on {budget.topic}, "
+                 f"continuation {continuation}")
+
+    if summary.deferred:
+        topic = get_retry_topic()
+        publish_violations(topic, event, summary.deferred, **{RETRY_ATTEMPT_ATTRIBUTE: str(retry_attempt)})
+        log.info(f"Published the {len(summary.deferred)} deferred violations on {topic}, retry attempt "
+                 f"{retry_attempt}/{executor.DEFERRED_RETRIES}")
@@ -0,0 +1,123 @@
+"""
+Pub/Sub message format of the violations published by the fetcher to the remediation functions.
+
+Version 1 is the plain JSON {"violations": [{"account_id": ..., "resource_id": ..., "region_name": ...}]}.
+Version 2 stores the violations column by column, {"version": 2, "count": n, "columns": {"account_id": [...], ...}},
+which repeats the field names once per message instead of once per violation.
+Either version can be compressed with gzip or zstd, given by the content_encoding message attribute.
+The rule_short_name message attribute names the rule of the violations, it routes the messages of the dispatcher.
+When the violations of several rules share a message (COALESCED_RULES of the fetcher), every violation has its
+rule_short_name field.
+"""
+import base64
+import gzip
+import json
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ENVELOPE_VERSION_ATTRIBUTE = "envelope_version"
+CONTENT_ENCODING_ATTRIBUTE = "content_encoding"
+RULE_SHORT_NAME_ATTRIBUTE = "rule_short_name"
+
+SUPPORTED_VERSIONS = (1, 2)
+SUPPORTED_COMPRESSIONS = ("none", "gzip", "zstd")
+
+
+def compress(data, compression):
+    """
+    Compress the data with the given compression
+    :param data: Bytes to compress
+    :param compression: none, gzip or zstd
+    """
+    if compression in (None, "", "none"):
+        return data
+    if compression == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    if compression == "zstd":
+        if zstandard is None:
+            raise Exception("zstd compression requires the zstandard package in requirements.txt")
+        return zstandard.ZstdCompressor().compress(data)
+    raise Exception(f"Unsupported compression {compression}")
+
+
+def decompress(data, compression):
+    """
+    Decompress the data compressed with the given compression
+    :param data: Compressed bytes
+    :param compression: none, gzip or zstd
+    """
+    if compression in (None, "", "none"):
+        return data
+    if compression == "gzip":
+        return gzip.decompress(data)
+    if compression == "zstd":
+        if zstandard is None:
+            raise Exception("zstd compressed message received but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    raise Exception(f"Unsupported content encoding {compression}")
+
+
+def encode_violations(violations, version=1, compression="none"):
+    """
+    Encode the violations as Pub/Sub message data and return it with the message attributes describing it
+    :param violations: List of violation dicts
+    :param version: Envelope version, 1 (rows) or 2 (columns)
+    :param compression: none, gzip or zstd
+    """
+    if version not in SUPPORTED_VERSIONS:
+        raise Exception(f"Unsupported envelope version {version}")
+
+    if version == 1:
+        body = {"violations": violations}
+    else:
+        fields = []
+        for violation in violations:
+            for field in violation:
+                if field not in fields:
+                    fields.append(field)
+        body = {"version": 2, "count": len(violations),
+                "columns": {field: [violation.get(field) for violation in violations] for field in fields}}
+
+    data = compress(json.dumps(body, separators=(",", ":")).encode("utf-8"), compression)
+    attributes = {ENVELOPE_VERSION_ATTRIBUTE: str(version)}
+    if compression not in (None, "", "none"):
+        attributes[CONTENT_ENCODING_ATTRIBUTE] = compression
+    return data, attributes
+
+
+def decode_message(data, attributes=None):
+    """
+    Return the list of violation dicts of the message data
+    :param data: Message data bytes
+    :param attributes: Message attributes
+    """
+    attributes = attributes or {}
+    body = json.loads(decompress(data, attributes.get(CONTENT_ENCODING_ATTRIBUTE)).decode("utf-8"))
+
+    if "columns" in body:
+        columns = body["columns"]
+        fields = list(columns)
+        # Fields which are null in the columns were absent from the violation
+        return [{field: value for field, value in zip(fields, values) if value is not None}
+                for values in zip(*(columns[field] for field in fields))]
+    return body.get("violations") or []
+
+
+def decode_violations(event):
+    """
+    Return the list of violation dicts of the Pub/Sub event which triggered the function.
+    Accepts the plain JSON messages as well as the versioned and compressed ones.
+    :param event: Pub/Sub event
+    """
+    return decode_message(base64.b64decode(event['data']), event.get('attributes'))
+
+
+def get_rule_short_name(event):
+    """
+    Return the rule short name of the Pub/Sub event, None for the messages published without it
+    :param event: Pub/Sub event
+    """
+    return (event.get('attributes') or {}).get(RULE_SHORT_NAME_ATTRIBUTE)
@@ -0,0 +1,256 @@
+"""
+Concurrent remediation of the violations of a Pub/Sub message.
+
+The violations are remediated on a thread pool of REMEDIATION_CONCURRENCY workers, with at most
+PROJECT_CONCURRENCY violations of the same project in progress at a time. Rules updating the IAM policy of a
+project group their violations in one policy transaction per project instead, see iam_policy.
+Given the TimeBudget of the invocation, no violation is started once it expired, see deadline.
+
+A remediation raises RetryLater when the resource of the violation is busy, for example with another operation in
+progress. Instead of sleeping on the worker, the violation is deferred with a jittered exponential backoff and the
+worker goes on with the next violation: the deferred violation is started again by the executor once its backoff
+elapsed, or published on DEFERRED_RETRY_TOPIC with the time before which it is not retried when that topic is set.
+The retry count and that time are kept in the retry_count and not_before fields of the violation, so that they
+survive a continuation message.
+"""
+import heapq
+import itertools
+import logging
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger("remediation-executor")
+
+# Maximum number of violations remediated at the same time
+REMEDIATION_CONCURRENCY = int(os.getenv('REMEDIATION_CONCURRENCY', '8'))
+# Maximum number of violations of the same project remediated at the same time, the function default if not set
+PROJECT_CONCURRENCY = os.getenv('PROJECT_CONCURRENCY')
+
+DEFAULT_PROJECT_CONCURRENCY = 4
+
+# Retries of a violation whose resource is busy, and the backoff between them in seconds
+DEFERRED_RETRIES = int(os.getenv('DEFERRED_RETRIES', '5'))
+DEFERRED_RETRY_DELAY = float(os.getenv('DEFERRED_RETRY_DELAY', '10'))
+DEFERRED_RETRY_MAX_DELAY = float(os.getenv('DEFERRED_RETRY_MAX_DELAY', '120'))
+# Topic on which the deferred violations are published instead of being retried by the invocation, a topic ID of the
+# project of the function or projects/<project>/topics/<topic>
+DEFERRED_RETRY_TOPIC = os.getenv('DEFERRED_RETRY_TOPIC', '')
+
+RETRY_COUNT_FIELD = "retry_count"
+NOT_BEFORE_FIELD = "not_before"
+
+
+class RetryLater(Exception):
+    """
+    Raised by a remediation when the resource of the violation is busy, the violation is retried after a backoff
+    """
+
+
+class RemediationOutcome:
+    """
+    Outcome of the remediation of one violation
+    """
+    __slots__ = ("violation", "project_id", "result", "error", "seconds")
+
+    def __init__(self, violation, project_id, result=None, error=None, seconds=0.0):
+        self.violation = violation
+        self.project_id = project_id
+        self.result = result
+        self.error = error
+        self.seconds = seconds
+
+    @property
+    def failed(self):
+        return self.error is not None
+
+
+class RemediationSummary:
+    """
+    Outcomes of the remediation of the violations of a message
+    """
+
+    def __init__(self):
+        self.outcomes = []
+        # Violations not started before the deadline, re-published by deadline.publish_leftover
+        self.leftover = []
+        # Violations deferred to DEFERRED_RETRY_TOPIC, published by deadline.publish_leftover
+        self.deferred = []
+        self.start = time.monotonic()
+        self.seconds = 0.0
+
+    def add(self, outcome):
+        self.outcomes.append(outcome)
+
+    @property
+    def failures(self):
+        return [outcome for outcome in self.outcomes if outcome.failed]
+
+    def log(self, log=logger):
+        """
+        Log the number of processed and failed violations
+        :param log: Logger of the function
+        """
+        log.info(f"Processed {len(self.outcomes)} violations in {self.seconds:.1f} seconds, "
+                 f"{len(self.failures)} failed")
+        if self.leftover:
+            log.warning(f"Left {len(self.leftover)} violations to a continuation message, the deadline of the "
+                        f"function was reached")
+        if self.deferred:
+            log.warning(f"Deferred {len(self.deferred)} violations with a busy resource to {DEFERRED_RETRY_TOPIC}")
+
+    def raise_for_failures(self):
+        """
+        Raise an exception if the remediation of a violation failed, so that the message can be retried
+        """
+        failures = self.failures
+        if failures:
+            raise Exception(f"Remediation failed for {len(failures)} of {len(self.outcomes)} violations. "
+                            f"First error: {failures[0].error}")
+
+
+def get_project_concurrency(default):
+    """
+    Return the per-project concurrency, PROJECT_CONCURRENCY if set else the default of the function
+    :param default: Per-project concurrency of the function
+    """
+    return max(int(PROJECT_CONCURRENCY or default), 1)
+
+
+def defer(violation):
+    """
+    Return a copy of the violation to retry after a jittered exponential backoff, None once it was retried
+    DEFERRED_RETRIES times
+    :param violation: Violation whose remediation raised RetryLater
+    """
+    retry_count = int(violation.get(RETRY_COUNT_FIELD, 0))
+    if retry_count >= DEFERRED_RETRIES:
+        return None
+    delay = min(DEFERRED_RETRY_MAX_DELAY, DEFERRED_RETRY_DELAY * 2 ** retry_count)
+    not_before = time.time() + random.uniform(delay / 2, delay)
+    return dict(violation, **{RETRY_COUNT_FIELD: retry_count + 1, NOT_BEFORE_FIELD: round(not_before, 3)})
+
+
+def remediate_violations(violations, remediate, project_of=None, max_workers=None,
+                         project_concurrency=DEFAULT_PROJECT_CONCURRENCY, budget=None, log=logger):
+    """
+    Remediate the violations concurrently and return the RemediationSummary of their outcomes.
+    An exception raised by remediate is recorded as the failure of the violation and does not stop the others.
+    :param violations: Violations of the message
+    :param remediate: Function remediating one violation
+    :param project_of: Function returning the project of a violation, account_id by default
+    :param max_workers: Maximum number of violations remediated at the same time, REMEDIATION_CONCURRENCY by default
+    :param project_concurrency: Default maximum number of violations of a project remediated at the same time
+    :param budget: TimeBudget of the invocation, the violations not started when it expires are left in
+     summary.leftover, as well as the deferred violations not due before it. At least one violation is started, so
+     that every invocation makes progress.
+    :param log: Logger of the function
+    """
+    project_of = project_of or (lambda violation: violation.get("account_id"))
+    max_workers = max(max_workers or REMEDIATION_CONCURRENCY, 1)
+    project_concurrency = get_project_concurrency(project_concurrency)
+
+    # Violations waiting for a free slot of their project, in message order
+    queues = {}
+    running = {}
+    ready = deque()
+    # Deferred violations waiting for their backoff, as a heap of (due time, sequence, violation, project)
+    delayed = []
+    sequence = itertools.count()
+
+    def enqueue(violation, project_id):
+        queue = queues.setdefault(project_id, deque())
+        running.setdefault(project_id, 0)
+        if not queue and running[project_id] < project_concurrency:
+            ready.append(project_id)
+        queue.append(violation)
+
+    def schedule(violation, project_id):
+        due = time.monotonic() + max(float(violation[NOT_BEFORE_FIELD]) - time.time(), 0)
+        heapq.heappush(delayed, (due, next(sequence), violation, project_id))
+
+    for violation in violations:
+        if float(violation.get(NOT_BEFORE_FIELD) or 0) > time.time():
+            schedule(violation, project_of(violation))
+        else:
+            enqueue(violation, project_of(violation))
+
+    def run(violation, project_id):
+        start = time.monotonic()
+        try:
+            return project_id, RemediationOutcome(violation, project_id, result=remediate(violation),
+                                                  seconds=time.monotonic() - start), None
+        except RetryLater as error:
+            retry = defer(violation)
+            if retry is not None:
+                log.warning(f"Deferred the violation {violation.get('resource_id')} of the project {project_id}, "
+                            f"retry {retry[RETRY_COUNT_FIELD]}/{DEFERRED_RETRIES}. Reason: {error}")
+                return project_id, None, retry
+            log.error(f"Remediation of the violation {violation.get('resource_id')} of the project {project_id} "
+                      f"failed after {DEFERRED_RETRIES} deferred retries. Reason: {error}")
+            return project_id, RemediationOutcome(violation, project_id, error=error,
+                                                  seconds=time.monotonic() - start), None
+        except Exception as error:
+            log.exception(f"Error occurred while remediating the violation {violation.get('resource_id')} of the "
+                          f"project {project_id}. Reason: {error}")
+            return project_id, RemediationOutcome(violation, project_id, error=error,
+                                                  seconds=time.monotonic() - start), None
+
+    def leave_all():
+        for queue in queues.values():
+            summary.leftover.extend(queue)
+            queue.clear()
+        ready.clear()
+        summary.leftover.extend(violation for _, _, violation, _ in sorted(delayed))
+        delayed.clear()
+
+    summary = RemediationSummary()
+    in_flight = set()
+    started = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while ready or in_flight or delayed:
+            now = time.monotonic()
+            while delayed and delayed[0][0] <= now:
+                _, _, violation, project_id = heapq.heappop(delayed)
+                enqueue(violation, project_id)
+
+            # Once the budget expired, the violations not started yet are left to a continuation message
+            if budget is not None and started and budget.expired() and (any(queues.values()) or delayed):
+                leave_all()
+
+            # Start violations round robin over the projects until every worker or project slot is taken
+            while ready and len(in_flight) < max_workers:
+                project_id = ready.popleft()
+                in_flight.add(executor.submit(run, queues[project_id].popleft(), project_id))
+                running[project_id] += 1
+                started += 1
+                if queues[project_id] and running[project_id] < project_concurrency:
+                    ready.append(project_id)
+
+            if not in_flight:
+                if delayed and not ready:
+                    # Only deferred violations are left, wait for the first one unless it is due after the deadline
+                    if budget is not None and delayed[0][0] >= budget.deadline:
+                        leave_all()
+                    else:
+                        time.sleep(max(delayed[0][0] - time.monotonic(), 0))
+                continue
+
+            timeout = max(delayed[0][0] - now, 0) if delayed else None
+            done, in_flight = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                project_id, outcome, retry = future.result()
+                running[project_id] -= 1
+                if retry is None:
+                    summary.add(outcome)
+                elif DEFERRED_RETRY_TOPIC:
+                    summary.deferred.append(retry)
+                else:
+                    schedule(retry, project_id)
+                if queues[project_id] and running[project_id] == project_concurrency - 1:
+                    ready.append(project_id)
+
+    summary.seconds = time.monotonic() - summary.start
+    return summary
@@ -0,0 +1,284 @@
+"""
+Read-modify-write transactions on the IAM policy of a resource.
+
+The violations of a message which edit the IAM policy of the same project are grouped in one transaction. The
+transaction reads the policy once, applies every edit to it and writes it once with the etag of the policy it read.
+If the policy was changed in between, setIamPolicy fails with a conflict and the transaction reads the policy again
+and re-applies the edits, so that concurrent writers never overwrite each other's changes. A write throttled or
+failed by the API is retried the same way, with backoff, instead of failing every violation of the resource.
+
+The edits work on an IamPolicy, which indexes the role bindings by role and by member so that looking up or removing
+the members of a role does not rescan the whole policy for every violation.
+"""
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from googleapiclient.errors import HttpError
+from common import executor
+
+logger = logging.getLogger("iam-policy-transaction")
+
+# Policy version 3 is required to read and write back the conditional role bindings unchanged
+POLICY_VERSION = 3
+MAX_COMMIT_ATTEMPTS = 5
+CONFLICT_STATUS_CODES = (409, 412)
+# Statuses of throttled and transiently failed calls. The reads are retried by the client with exponential backoff,
+# the writes by the transaction which reads the policy and its etag again first.
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+READ_RETRIES = 3
+# Outcome of a transaction not committed before the deadline of the invocation
+DEFERRED = object()
+
+
+class IamPolicy:
+    """
+    IAM policy with its role bindings indexed by role and by member.
+    The bindings are changed through the model and serialised back to the API shape with to_policy.
+    """
+
+    def __init__(self, policy):
+        """
+        :param policy: IAM policy as returned by getIamPolicy
+        """
+        self.policy = policy
+        self.bindings = policy.get("bindings", [])
+        # {role: [binding]}, a role has several bindings when they have different conditions
+        self.role_bindings = {}
+        # {id(binding): set of members} and {member: set of roles}
+        self.binding_members = {}
+        self.member_roles = {}
+        for binding in self.bindings:
+            self.role_bindings.setdefault(binding.get("role"), []).append(binding)
+            members = binding.setdefault("members", [])
+            self.binding_members[id(binding)] = set(members)
+            for member in members:
+                self.member_roles.setdefault(member, set()).add(binding.get("role"))
+
+    def has_role(self, role):
+        return role in self.role_bindings
+
+    def get_members(self, role):
+        """
+        Return the set of members of the role, over all the bindings of the role
+        :param role: Role, for example roles/owner
+        """
+        members = set()
+        for binding in self.role_bindings.get(role, ()):
+            members |= self.binding_members[id(binding)]
+        return members
+
+    def has_member(self, role, member):
+        return any(member in self.binding_members[id(binding)] for binding in self.role_bindings.get(role, ()))
+
+    def get_roles(self, member):
+        """
+        Return the set of roles granted to the member
+        :param member: Member, for example user:jane@example.com
+        """
+        return set(self.member_roles.get(member, ()))
+
+    def remove_members(self, role, predicate):
+        """
+        Remove the members of the role matching the predicate and return the list of removed members
+        :param role: Role, for example roles/owner
+        :param predicate: Function returning True for the members to remove
+        """
+        removed = []
+        for binding in self.role_bindings.get(role, ()):
+            members = self.binding_members[id(binding)]
+            matching = [member for member in binding["members"] if predicate(member)]
+            if not matching:
+                continue
+            members.difference_update(matching)
+            binding["members"] = [member for member in binding["members"] if member in members]
+            for member in matching:
+                roles = self.member_roles.get(member)
+                if roles is not None and not any(member in self.binding_members[id(other)]
+                                                 for other in self.role_bindings[role]):
+                    roles.discard(role)
+                    if not roles:
+                        del self.member_roles[member]
+            removed.extend(matching)
+        return removed
+
+    def remove_members_with_prefix(self, role, *prefixes):
+        """
+        Remove the members of the role of the given types and return the list of removed members
+        :param role: Role, for example roles/owner
+        :param prefixes: Member prefixes, for example user: or serviceAccount:
+        """
+        return self.remove_members(role, lambda member: member.startswith(prefixes))
+
+    def to_policy(self):
+        """
+        Return the policy in the API shape, without the bindings left without members
+        """
+        self.policy["bindings"] = [binding for binding in self.bindings if binding["members"]]
+        return self.policy
+
+
+class PolicyEdit:
+    """
+    Edit of an IAM policy. apply changes the IamPolicy in place and returns True if it changed it.
+    """
+    __slots__ = ("apply", "changed", "error")
+
+    def __init__(self, apply):
+        self.apply = apply
+        self.changed = False
+        self.error = None
+
+
+class IamPolicyTransaction:
+    """
+    Pending edits of the IAM policy of one resource
+    """
+
+    def __init__(self, service, resource, update_mask, log=logger):
+        """
+        :param service: Client of the API of the resource, for example cloudresourcemanager
+        :param resource: Resource of the policy, for example projects/my-project
+        :param update_mask: Comma separated policy fields written by the edits, for example bindings
+        :param log: Logger of the function
+        """
+        self.service = service
+        self.resource = resource
+        self.update_mask = update_mask
+        self.log = log
+        self.edits = []
+        self.attempts = 0
+
+    def add(self, apply):
+        """
+        Add an edit to the transaction and return its PolicyEdit, which holds its outcome once committed
+        :param apply: Function changing the IamPolicy in place and returning True if it changed it
+        """
+        edit = PolicyEdit(apply)
+        self.edits.append(edit)
+        return edit
+
+    def read(self):
+        return self.service.projects().getIamPolicy(
+            resource=self.resource, body={"options": {"requestedPolicyVersion": POLICY_VERSION}}).execute(
+            num_retries=READ_RETRIES)
+
+    def write(self, policy):
+        fields = [field.strip() for field in self.update_mask.split(",")]
+        body = {"policy": {field: policy[field] for field in fields if field in policy},
+                "updateMask": self.update_mask}
+        # The etag makes the write fail with a conflict if the policy changed since it was read
+        body["policy"]["etag"] = policy.get("etag")
+        body["policy"]["version"] = POLICY_VERSION
+        return self.service.projects().setIamPolicy(resource=self.resource, body=body).execute()
+
+    def apply(self, policy):
+        """
+        Apply every edit to the IamPolicy and return True if one of them changed it.
+        An edit which raises is marked as failed and does not stop the other edits.
+        """
+        changed = False
+        for edit in self.edits:
+            if edit.error is not None:
+                continue
+            try:
+                edit.changed = bool(edit.apply(policy))
+            except Exception as error:
+                self.log.exception(f"Error occurred while editing the IAM policy of {self.resource}. Reason: {error}")
+                edit.error = error
+                continue
+            changed = changed or edit.changed
+        return changed
+
+    def commit(self):
+        """
+        Read the policy, apply the edits and write the policy once if it changed, retrying on conflicts, throttling
+        and server errors. Return True if the policy was written.
+        """
+        for attempt in range(1, MAX_COMMIT_ATTEMPTS + 1):
+            self.attempts = attempt
+            policy = IamPolicy(self.read())
+            if not self.apply(policy):
+                self.log.info(f"IAM policy of {self.resource} is already compliant")
+                return False
+            try:
+                response = self.write(policy.to_policy())
+            except HttpError as http_error:
+                status = http_error.resp.status
+                if status not in CONFLICT_STATUS_CODES + RETRYABLE_STATUS_CODES or attempt == MAX_COMMIT_ATTEMPTS:
+                    raise
+                if status in CONFLICT_STATUS_CODES:
+                    self.log.warning(f"IAM policy of {self.resource} changed while it was updated, re-applying "
+                                     f"{len(self.edits)} edits. Retrying {attempt}/{MAX_COMMIT_ATTEMPTS}")
+                    time.sleep(random.uniform(0.5, 1.5) * attempt)
+                else:
+                    self.log.warning(f"IAM policy update of {self.resource} failed with status {status}, re-applying "
+                                     f"{len(self.edits)} edits. Retrying {attempt}/{MAX_COMMIT_ATTEMPTS}")
+                    # Exponential backoff with jitter, the API being throttled or unavailable
+                    time.sleep(random.uniform(0.5, 1.5) * 2 ** (attempt - 1))
+                continue
+            self.log.debug(f"Update policy response: {response}")
+            self.log.info(f"Updated the IAM policy of {self.resource} with {len(self.edits)} edits "
+                          f"in {attempt} attempts")
+            return True
+
+
+def remediate_policy_violations(violations, service, get_resource, get_edit, update_mask, max_workers=None,
+                                budget=None, log=logger):
+    """
+    Remediate the violations with one IAM policy transaction per resource, the transactions of different resources
+    being committed concurrently. Return the RemediationSummary of the violations.
+    :param violations: Violations of the message
+    :param service: Client of the API of the resources, for example cloudresourcemanager
+    :param get_resource: Function returning the resource of the policy of a violation, for example projects/my-project
+    :param get_edit: Function returning the edit of a violation, see IamPolicyTransaction.add
+    :param update_mask: Comma separated policy fields written by the edits
+    :param max_workers: Maximum number of transactions committed at the same time, REMEDIATION_CONCURRENCY by default
+    :param budget: TimeBudget of the invocation, the violations of the transactions not started when it expires are
+     left in summary.leftover. The first transaction is always committed.
+    :param log: Logger of the function
+    """
+    summary = executor.RemediationSummary()
+    transactions = {}
+    edits = []
+    for violation in violations:
+        try:
+            resource = get_resource(violation)
+            apply = get_edit(violation)
+        except Exception as error:
+            log.exception(f"Error occurred while reading the violation {violation}. Reason: {error}")
+            summary.add(executor.RemediationOutcome(violation, violation.get("account_id"), error=error))
+            continue
+        transaction = transactions.get(resource)
+        if transaction is None:
+            transaction = transactions[resource] = IamPolicyTransaction(service, resource, update_mask, log=log)
+        edits.append((violation, resource, transaction.add(apply)))
+
+    first_transaction = next(iter(transactions.values()), None)
+
+    def commit(transaction):
+        if budget is not None and transaction is not first_transaction and budget.expired():
+            return DEFERRED, 0.0
+        start = time.monotonic()
+        try:
+            transaction.commit()
+            return None, time.monotonic() - start
+        except Exception as error:
+            log.exception(f"Error occurred while updating the IAM policy of {transaction.resource}. Reason: {error}")
+            return error, time.monotonic() - start
+
+    with ThreadPoolExecutor(max_workers=max(max_workers or executor.REMEDIATION_CONCURRENCY, 1)) as pool:
+        results = dict(zip(transactions, pool.map(commit, transactions.values())))
+
+    for violation, resource, edit in edits:
+        commit_error, seconds = results[resource]
+        if commit_error is DEFERRED:
+            summary.leftover.append(violation)
+            continue
+        summary.add(executor.RemediationOutcome(violation, resource, result=edit.changed,
+                                                error=edit.error or commit_error, seconds=seconds))
+    summary.seconds = time.monotonic() - summary.start
+    deferred = sum(1 for commit_error, _ in results.values() if commit_error is DEFERRED)
+    log.info(f"Committed {len(edits) - len(summary.leftover)} IAM policy edits in {len(transactions) - deferred} "
+             f"transactions")
+    return summary
@@ -0,0 +1,240 @@
+"""
+Tracker of the long-running operations started by the remediation functions.
+
+A remediation submits its mutation, hands the returned operation to the tracker and gets a future. A single
+scheduler thread polls every pending operation of the function instance, Compute Engine operations with the long-poll
+wait method and Cloud SQL and GKE operations with get and an exponential backoff, and resolves the future of each
+operation once it is DONE. The remediations of a message are thereby not serialized on fixed sleeps.
+A long-poll holds its thread until the operation is DONE or the server times the call out, so the long-polls run on
+their own pool and never delay the get calls of the other operations.
+"""
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from googleapiclient.errors import HttpError
+
+logger = logging.getLogger("operation-tracker")
+
+# Seconds after which an operation which is not DONE is reported as timed out
+OPERATION_TIMEOUT = float(os.getenv('OPERATION_TIMEOUT', '300'))
+# Backoff between two get calls of an operation
+OPERATION_POLL_INITIAL_DELAY = float(os.getenv('OPERATION_POLL_INITIAL_DELAY', '1'))
+OPERATION_POLL_MAX_DELAY = float(os.getenv('OPERATION_POLL_MAX_DELAY', '20'))
+# Maximum number of get calls in flight
+OPERATION_POLL_CONCURRENCY = int(os.getenv('OPERATION_POLL_CONCURRENCY', '8'))
+# Maximum number of long-poll wait calls in flight, each one holding a thread for up to the server timeout of the call
+OPERATION_LONG_POLL_CONCURRENCY = int(os.getenv('OPERATION_LONG_POLL_CONCURRENCY', '32'))
+
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class OperationError(Exception):
+    """
+    The operation completed with an error
+    """
+
+    def __init__(self, description, error):
+        super().__init__(f"Operation {description} failed. Error: {error}")
+        self.error = error
+
+
+class OperationTimeoutError(Exception):
+    """
+    The operation was not DONE before its deadline
+    """
+
+
+class TrackedOperation:
+    """
+    Pending operation of the tracker
+    """
+    __slots__ = ("poll", "description", "long_poll", "deadline", "delay", "future")
+
+    def __init__(self, poll, description, long_poll, deadline):
+        self.poll = poll
+        self.description = description
+        self.long_poll = long_poll
+        self.deadline = deadline
+        self.delay = OPERATION_POLL_INITIAL_DELAY
+        self.future = Future()
+
+    def next_delay(self):
+        delay = self.delay
+        self.delay = min(self.delay * 2, OPERATION_POLL_MAX_DELAY)
+        return delay
+
+
+class OperationTracker:
+    """
+    Poll the pending operations and resolve their futures with the DONE operation
+    """
+
+    def __init__(self, poll_concurrency=OPERATION_POLL_CONCURRENCY,
+                 long_poll_concurrency=OPERATION_LONG_POLL_CONCURRENCY):
+        self.condition = threading.Condition()
+        # Heap of (poll time, sequence, operation)
+        self.schedule = []
+        self.sequence = itertools.count()
+        self.pollers = ThreadPoolExecutor(max_workers=poll_concurrency, thread_name_prefix="operation-poller")
+        self.long_pollers = ThreadPoolExecutor(max_workers=long_poll_concurrency,
+                                               thread_name_prefix="operation-long-poller")
+        self.thread = None
+
+    def track(self, poll, description, long_poll=False, timeout=None):
+        """
+        Track an operation and return a future resolved with the operation once it is DONE
+        :param poll: Function returning the current state of the operation
+        :param description: Description of the operation used in the logs and errors
+        :param long_poll: True if poll waits on the server side until the operation is DONE or a server timeout
+        :param timeout: Seconds after which the future fails with OperationTimeoutError, OPERATION_TIMEOUT by default
+        """
+        operation = TrackedOperation(poll, description, long_poll,
+                                     time.monotonic() + (timeout or OPERATION_TIMEOUT))
+        # A long-poll is issued right away, a get after the first backoff as operations are rarely done immediately
+        self.schedule_poll(operation, 0 if long_poll else operation.next_delay())
+        return operation.future
+
+    def schedule_poll(self, operation, delay):
+        with self.condition:
+            heapq.heappush(self.schedule, (time.monotonic() + delay, next(self.sequence), operation))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="operation-tracker", daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                now = time.monotonic()
+                while not self.schedule or self.schedule[0][0] > now:
+                    self.condition.wait(self.schedule[0][0] - now if self.schedule else None)
+                    now = time.monotonic()
+                due = []
+                while self.schedule and self.schedule[0][0] <= now:
+                    due.append(heapq.heappop(self.schedule)[2])
+            for operation in due:
+                pollers = self.long_pollers if operation.long_poll else self.pollers
+                pollers.submit(self.poll, operation)
+
+    def poll(self, operation):
+        try:
+            result = operation.poll()
+        except HttpError as http_error:
+            if http_error.resp.status not in RETRYABLE_STATUS_CODES:
+                operation.future.set_exception(http_error)
+                return
+            logger.warning(f"Polling the operation {operation.description} failed with {http_error.resp.status}, "
+                           f"retrying")
+            result = {}
+        except Exception as error:
+            operation.future.set_exception(error)
+            return
+
+        if result.get("status") == "DONE":
+            if result.get("error"):
+                operation.future.set_exception(OperationError(operation.description, result["error"]))
+            else:
+                operation.future.set_result(result)
+        elif time.monotonic() >= operation.deadline:
+            operation.future.set_exception(OperationTimeoutError(
+                f"Timed out while waiting for the operation {operation.description} to be completed"))
+        else:
+            logger.debug(f"Operation {operation.description} status: {result.get('status')}")
+            self.schedule_poll(operation, operation.next_delay())
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_tracker():
+    """
+    Return the operation tracker of the function instance
+    """
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = OperationTracker()
+        return _tracker
+
+
+def track_global_operation(service, project, operation, timeout=None):
+    """
+    Track a global Compute Engine operation
+    :param service: compute service object
+    :param project: Id of the project
+    :param operation: Name of the operation
+    :param timeout: Seconds to wait for the operation
+    """
+    return get_tracker().track(lambda: service.globalOperations().wait(project=project,
+                                                                       operation=operation).execute(),
+                               f"{project}/global/{operation}", long_poll=True, timeout=timeout)
+
+
+def track_region_operation(service, project, region, operation, timeout=None):
+    """
+    Track a regional Compute Engine operation
+    :param service: compute service object
+    :param project: Id of the project
+    :param region: Region of the operation
+    :param operation: Name of the operation
+    :param timeout: Seconds to wait for the operation
+    """
+    return get_tracker().track(lambda: service.regionOperations().wait(project=project, region=region,
+                                                                       operation=operation).execute(),
+                               f"{project}/{region}/{operation}", long_poll=True, timeout=timeout)
+
+
+def track_zone_operation(service, project, zone, operation, timeout=None):
+    """
+    Track a zonal Compute Engine operation
+    :param service: compute service object
+    :param project: Id of the project
+    :param zone: Zone of the operation
+    :param operation: Name of the operation
+    :param timeout: Seconds to wait for the operation
+    """
+    return get_tracker().track(lambda: service.zoneOperations().wait(project=project, zone=zone,
+                                                                     operation=operation).execute(),
+                               f"{project}/{zone}/{operation}", long_poll=True, timeout=timeout)
+
+
+def track_sql_operation(service, project, operation, timeout=None):
+    """
+    Track a Cloud SQL Admin operation
+    :param service: sqladmin service object
+    :param project: Id of the project
+    :param operation: Name of the operation
+    :param timeout: Seconds to wait for the operation
+    """
+    return get_tracker().track(lambda: service.operations().get(project=project, operation=operation).execute(),
+                               f"{project}/{operation}", timeout=timeout)
+
+
+def track_container_operation(service, name, timeout=None):
+    """
+    Track a GKE operation
+    :param service: container service object
+    :param name: Full name of the operation, projects/<project>/locations/<location>/operations/<operation>
+    :param timeout: Seconds to wait for the operation
+    """
+    return get_tracker().track(lambda: service.projects().locations().operations().get(name=name).execute(),
+                               name, timeout=timeout)
+
+
+def wait(future):
+    """
+    Wait for a tracked operation and return DONE, or Timeout if it was not DONE before its deadline.
+    Raises OperationError if the operation completed with an error.
+    :param future: Future returned by one of the track functions
+    """
+    try:
+        future.result()
+        return "DONE"
+    except OperationTimeoutError as error:
+        logger.warning(str(error))
+        return "Timeout"
@@ -0,0 +1,48 @@
+"""
+Remediation of the rules, one module per rule with its google_cloud_function_handler.
+
+The modules are used by the per-rule functions, whose main.py is a thin wrapper of the module of its rule, and by the
+RemediationDispatcherFunction, which remediates the messages of every rule in one function. The modules of a
+dispatcher instance share the Google API clients, the HTTP transports and the executors of the common package.
+"""
+import importlib
+import re
+
+# Module of the remediation of every rule, by rule ID
+RULE_MODULES = {
+    "CIS-1-0-0-1-4": "service_account_admin_privileges",
+    "CIS-1-0-0-1-6": "user_managed_key_rotation",
+    "CIS-1-0-0-2-1": "cloud_audit_logging",
+    "CIS-1-0-0-3-1": "default_vpc_network",
+    "CIS-1-0-0-3-6": "restrict_ssh_access",
+    "CIS-1-0-0-3-9": "vpc_flowlog_enable",
+    "CIS-1-0-0-4-2": "vm_instance_block_project_wide_ssh_keys",
+    "CIS-1-0-0-5-1": "storage_bucket_public_access",
+    "CIS-1-0-0-6-1": "cloud_sql_instance_ssl_connection",
+    "CIS-1-0-0-6-2": "cloud_sql_instance_public_network",
+    "CIS-1-0-0-7-1": "kubernetes_stackdriver_logging",
+    "CIS-1-2-0-1-6": "service_account_role",
+}
+
+# Rule short names are the topic IDs of the rules, the rule ID optionally followed by the region
+RULE_ID = re.compile(r"^CIS(?:-\d+){5}")
+
+
+def get_rule_id(rule_short_name):
+    """
+    Return the rule ID of a rule short name, for example CIS-1-0-0-3-1 for CIS-1-0-0-3-1-us-east1
+    :param rule_short_name: Rule short name or topic ID of the rule
+    """
+    match = RULE_ID.match(rule_short_name or "")
+    if not match or match.group(0) not in RULE_MODULES:
+        raise Exception(f"No remediation found for the rule {rule_short_name}")
+    return match.group(0)
+
+
+def get_rule_module(rule_short_name):
+    """
+    Return the remediation module of the rule. The module is imported on the first message of its rule, so that a
+    dispatcher instance only loads the rules it remediates.
+    :param rule_short_name: Rule short name or topic ID of the rule
+    """
+    return importlib.import_module(f"{__name__}.{RULE_MODULES[get_rule_id(rule_short_name)]}")
@@ -0,0 +1,100 @@
+import logging
+import os
+from common import envelope, deadline, clients, iam_policy
+
+# Set up  logger
+LOG_LEVEL = os.getenv('LOGLEVEL', 'DEBUG')
+logger = logging.getLogger("CIS-1-0-0-2-1-cloud-audit-logging-remediation-function")
+level_name = logging.getLevelName(LOG_LEVEL)
+logger.setLevel(level_name)
+logging.getLogger("googleapiclient.discovery_cache").setLevel(logging.WARNING)
+
+
+def google_cloud_function_handler(event, context):
+    """
+    Google Cloud function handler for the use case:
+    Rule Name: Audit/log records: Ensure that Cloud Audit Logging is configured properly across all services and all
+     users from a project
+    Definition: GCP should have atleast one AuditConfigs with [ Service eq "allServices" and AuditLogConfigs with
+     [ LogType eq "DATA_READ" ] and AuditLogConfigs with [ LogType eq "DATA_WRITE" ] and AuditLogConfigs with
+      [ LogType eq "ADMIN_READ" ] ] and every AuditConfigs with [ HasExemptedMembers eq False ]
+    """
+    budget = deadline.start_budget(context)
+    try:
+        service = clients.get_client("cloudresourcemanager", "v3")
+        # The violations of a project are applied to its IAM policy in one transaction
+        summary = iam_policy.remediate_policy_violations(envelope.decode_violations(event), service,
+                                                         get_violation_resource, get_violation_edit,
+                                                         update_mask="auditConfigs", budget=budget, log=logger)
+        summary.log(logger)
+        deadline.publish_leftover(budget, event, summary, log=logger)
+        summary.raise_for_failures()
+    except Exception as error:
+        raise Exception(f"Error occurred while doing remediation of the use case. Reason: {error}") from error
+
+
+def get_violation_resource(violation):
+    return violation["resource_id"]
+
+
+def get_violation_edit(violation):
+    """
+    Return the IAM policy edit remediating one violation of the message
+    :param violation: Violation with account_id, resource_id and region_name
+    """
+    project_id = violation.get("account_id")
+    project_id_to_set_audit_logging = violation.get("resource_id")
+    region = violation.get("region_name")
+
+    logger.info(f"Alert details: Project ID {project_id}, Project ID to configure Audit logging"
+                f" {project_id_to_set_audit_logging}, Region {region}")
+
+    return check_and_configure_all_services_audit_logging
+
+
+def check_and_configure_all_services_audit_logging(policy):
+    """
+    Check and configure audit logging in the IAM policy of the project
+
+    :param policy: IamPolicy of the project, updated in place
+    """
+    audit_configs = policy.policy.setdefault("auditConfigs", [])
+
+    all_services_audit_log_configs = [
+      {
+        "logType": "DATA_READ"
+      },
+      {
+        "logType": "DATA_WRITE"
+      },
+      {
+        "logType": "ADMIN_READ"
+      }
+    ]
+    is_all_services_audit_config_present = False
+    update_policy = False
+
+    for audit_config in audit_configs:
+        if audit_config["service"] == "allServices":
+            if audit_config.get("auditLogConfigs") != all_services_audit_log_configs:
+                audit_config["auditLogConfigs"] = all_services_audit_log_configs
+                update_policy = True
+            is_all_services_audit_config_present = True
+
+        for audit_log_config in audit_config.get("auditLogConfigs", []):
+            if audit_log_config.get("exemptedMembers"):
+                del audit_log_config["exemptedMembers"]
+                update_policy = True
+
+    # Adding allservices in audit configs
+    if not is_all_services_audit_config_present:
+        audit_configs.append({
+          "service": "allServices",
+          "auditLogConfigs": all_services_audit_log_configs
+        })
+        update_policy = True
+
+    if update_policy:
+        return True
+    else:
+        logger.info("Audit logging is already properly configured.")
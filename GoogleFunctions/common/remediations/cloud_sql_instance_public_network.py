@@ -0,0 +1,150 @@
+import functools
+import logging
+import os
+import json
+from googleapiclient import errors
+from common import envelope, deadline, batch, clients, executor, operations, sql_ip_configuration
+
+LOG_LEVEL = os.getenv('LOGLEVEL', 'INFO')
+logger = logging.getLogger("CIS-1-0-0-6-2-SQLInstancePublicNetworkRemediationFunction")
+logger.setLevel(logging.getLevelName(LOG_LEVEL))
+logging.getLogger('googleapiclient.discovery_cache').setLevel(logging.ERROR)
+
+PROJECT_ID = os.getenv("GCP_PROJECT")
+GCP_REGION = os.getenv('FUNCTION_REGION')
+
+RULE_ID = "CIS-1-0-0-6-2"
+
+
+def google_cloud_function_handler(event, context):
+    """
+    Google Cloud function for the use case:
+        Rule Name: Identities and credentials: Ensure that Cloud SQL database Instances are not open to the world
+        Definition: SqlInstance should not have Settings.IpConfiguration.AuthorizedNetworks with [ CIDR eq 0.0.0.0/0 ]
+    """
+    budget = deadline.start_budget(context)
+    try:
+        violations = envelope.decode_violations(event)
+        instances = read_instances(violations)
+        patches = sql_ip_configuration.InstancePatches(violations, RULE_ID, get_violation_instance)
+        remediate = functools.partial(remediate_violation, instances=instances, patches=patches)
+        summary = executor.remediate_violations(violations, remediate, budget=budget, log=logger)
+        summary.log(logger)
+        deadline.publish_leftover(budget, event, summary, log=logger)
+        summary.raise_for_failures()
+
+    except Exception as error:
+        raise Exception(f'Error occurred while doing remediation of the use case. Reason: {error}') from error
+
+
+def get_violation_instance(violation):
+    """
+    Return the project ID and the Cloud SQL instance name of a violation
+    :param violation: Violation with account_id and resource_id
+    """
+    return violation.get("account_id", PROJECT_ID), violation["resource_id"].split('sqlInstances/')[1]
+
+
+def read_instances(violations):
+    """
+    Read the metadata of the Cloud SQL instances of the violations in batches, as {(project_id, instance): metadata}
+    :param violations: Violations of the message
+    """
+    service = clients.get_client('sqladmin', 'v1')
+    requests = {}
+    for violation in violations:
+        try:
+            project_id, instance = get_violation_instance(violation)
+        except (KeyError, IndexError):
+            # Reported by the remediation of the violation
+            continue
+        requests[(project_id, instance)] = service.instances().get(project=project_id, instance=instance)
+    return batch.batch_read(service, requests, log=logger)
+
+
+def remediate_violation(violation, instances, patches):
+    """
+    Remediate one violation of the message, with the other violations of its instance
+    :param violation: Violation with account_id, resource_id and region_name
+    :param instances: Metadata of the Cloud SQL instances read in batches, as {(project_id, instance): metadata}
+    :param patches: InstancePatches of the message
+    """
+    project_id, instance = get_violation_instance(violation)
+    region = violation.get("region_name", GCP_REGION)
+
+    logger.info(f'Got event with Project ID: {project_id}, Cloud SQL Instance: {instance} '
+                f'and Region: {region}')
+    # Taken out of the batch results, as the remediation updates the resource it is given
+    patches.patch((project_id, instance), lambda rules: disable_public_access_cloud_sql_database_instance(
+        instance, project_id, region, instances.pop((project_id, instance), None), rules))
+
+
+def disable_public_access_cloud_sql_database_instance(instance, project_id, region, instance_metadata=None,
+                                                      rules=(RULE_ID,)):
+    """
+    This function removes public network from Cloud SQL Database Instance
+    :param instance: Name of Cloud SQL Database Instance
+    :param project_id: Id of the project
+    :param region: Region of Cloud SQL Database Instance
+    :param instance_metadata: Metadata of the Cloud SQL Instance if already read
+    :param rules: Rule IDs of the violations of the instance, whose changes are merged into the same patch
+    """
+    try:
+        service = clients.get_client('sqladmin', 'v1')
+        # get metadata of a Cloud SQL instance.
+        if instance_metadata is None:
+            instance_metadata = service.instances().get(project=project_id, instance=instance).execute()
+        logger.debug(f'response from get call : {instance_metadata}')
+        # Considering only networks which do not have the value="0.0.0.0/0", with the changes of the other rules
+        # reported for the instance
+        changes = sql_ip_configuration.get_pending_changes(instance_metadata, rules)
+        if changes:
+            # Update metadata of a Cloud SQL instance.
+            updated_patch = {"settings": {"ipConfiguration": changes}}
+            update_instance_metadata(service, project_id, instance, updated_patch, region)
+        else:
+            logger.info(f'Remediation was already completed for Cloud SQL Instance: {instance} of Project: '
+                        f'{project_id} and Region: {region}')
+
+    except executor.RetryLater:
+        raise
+    except Exception as error:
+        logger.exception(f'Error occurred while doing remediation for Cloud SQL Instance: {instance} of Project: '
+                         f'{project_id} and Region: {region}. Skipping remediation for this instance. Reason: {error}')
+
+
+def update_instance_metadata(service, project_id, instance, instance_metadata, region):
+    """
+    This function Updates cloud SQL instance metadata. When another operation is in progress on the instance, the
+    violation is deferred by raising executor.RetryLater instead of waiting for it.
+    :param service: compute service object
+    :param project_id: Id of the project
+    :param instance: Cloud SQL Instance Name
+    :param instance_metadata: Metadata of cloud SQL instance
+    :param region: Region of cloud SQL instance
+    """
+    try:
+        response = service.instances().patch(project=project_id, instance=instance,
+                                             body=instance_metadata).execute()
+        logger.info(f'Update call executed')
+        logger.debug(f'response from update call : {response}')
+        operation = response['name']
+        # Wait for update operation to be completed
+        status = operations.wait(operations.track_sql_operation(service, project_id, operation))
+        if status == "DONE":
+            logger.info(f'Successfully completed remediation for Cloud SQL Instance: {instance} of '
+                        f'Project: {project_id} and Region: {region}')
+        elif status == "Timeout":
+            logger.warning(f'Timed out while waiting for operation: {operation} to be completed. '
+                           f'Skipping remediation for the Cloud SQL Instance: {instance} of Project: {project_id} '
+                           f'and Region: {region}')
+    except errors.HttpError as http_err:
+        error_json = json.loads(http_err.content).get('error').get('errors')[0]
+        reason = error_json.get("reason")
+        if http_err.resp.status == 409 and reason == "operationInProgress":
+            raise executor.RetryLater(f'Another operation is in progress on the Cloud SQL Instance: {instance}'
+                                      f' of Project: {project_id}') from http_err
+        logger.exception(f'Error occurred while calling patch update API. Error: {http_err}')
+    except Exception as error:
+        logger.exception(f'Error occurred while updating Cloud SQL Instance: {instance}. Reason: {error}. '
+                         f'Skipping remediation for this instance')
@@ -0,0 +1,82 @@
+import logging
+import os
+import json
+from googleapiclient import errors
+from common import envelope, deadline, clients, executor, operations
+
+LOG_LEVEL = os.getenv('LOGLEVEL', 'INFO')
+logger = logging.getLogger("CIS-1-0-0-3-1-DefaultVPCNetworkRemediationFunction")
+logger.setLevel(logging.getLevelName(LOG_LEVEL))
+logging.getLogger('googleapiclient.discovery_cache').setLevel(logging.ERROR)
+
+PROJECT_ID = os.getenv("GCP_PROJECT")
+GCP_REGION = os.getenv('FUNCTION_REGION')
+
+
+def google_cloud_function_handler(event, context):
+    """
+    Google Cloud function for the use case:
+        Rule Name: Communications and control network protection: Ensure the default network does not exist in a project
+        Definition: VPC should not have Name eq "default" and AutoCreateSubnetworks eq True
+    """
+    budget = deadline.start_budget(context)
+    try:
+        violations = envelope.decode_violations(event)
+        summary = executor.remediate_violations(violations, remediate_violation, budget=budget, log=logger)
+        summary.log(logger)
+        deadline.publish_leftover(budget, event, summary, log=logger)
+        summary.raise_for_failures()
+
+    except Exception as error:
+        raise Exception(f'Error occurred while doing remediation of the use case. Reason: {error}') from error
+
+
+def remediate_violation(violation):
+    """
+    Remediate one violation of the message
+    :param violation: Violation with account_id, resource_id and region_name
+    """
+    project_id = violation.get("account_id", PROJECT_ID)
+    region = violation.get("region_name", GCP_REGION)
+    network = violation["resource_id"].split('networks/')[1]
+
+    logger.info(f'Got event with Project ID: {project_id}, VPC Network: {network} and Region: {region}')
+    if network == "default":  # check with Default
+        delete_default_vpc_network(network, project_id)
+    else:
+        logger.error(f'Given VPC Network: {network} is not default. Skipping remediation of this VPC Network')
+
+
+def delete_default_vpc_network(network, project_id):
+    """
+    This function deletes default VPC network
+    :param network: Name of VPC Network
+    :param project_id: Id of the project
+    """
+    try:
+        service = clients.get_client('compute', 'v1')
+        # delete default VPC Network.
+        response = service.networks().delete(project=project_id, network=network).execute()
+        logger.debug(f'response from delete call : {response}')
+        operation = response['name']
+        status = operations.wait(operations.track_global_operation(service, project_id, operation))
+        if status == "DONE":
+            logger.info(f'Successfully deleted default VPC Network of Project: {project_id}')
+        elif status == "Timeout":
+            logger.warning(f'Remediation not completed. Reason - Timed out while waiting for operation: '
+                           f'{operation} to be completed.')
+
+    except errors.HttpError as http_error:
+        error_json = json.loads(http_error.content).get('error').get('errors')[0]
+        reason = error_json.get("reason")
+        message = error_json.get("message")
+        if reason == "resourceNotReady":
+            raise executor.RetryLater(f"Another VPC network operation is running for the default network."
+                                      f" Reason: {message}") from http_error
+        elif reason == "notFound":
+            logger.error(f"It seems default VPC Network does not present for project: {project_id}. Reason: {message}")
+        else:
+            logger.exception(f'Error occurred while deleting default VPC Network. Reason: {http_error}')
+
+    except Exception as error:
+        logger.exception(f'Error occurred while deleting default VPC Network. Reason: {error}')
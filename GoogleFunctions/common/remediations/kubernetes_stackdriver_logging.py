@@ -0,0 +1,135 @@
+import functools
+import json
+import logging
+import os
+from googleapiclient.errors import HttpError
+from common import envelope, deadline, batch, clients, executor, operations
+
+# Set up  logger
+LOG_LEVEL = os.getenv('LOGLEVEL', 'DEBUG')
+logger = logging.getLogger("CIS-1-0-0-7-1-kubernetes-stack-driver-logging-remediation-function")
+level_name = logging.getLevelName(LOG_LEVEL)
+logger.setLevel(level_name)
+logging.getLogger("googleapiclient.discovery_cache").setLevel(logging.WARNING)
+
+# Seconds to wait for the set logging operation, which updates the nodes of the cluster
+SET_LOGGING_TIMEOUT = 600
+
+
+def google_cloud_function_handler(event, context):
+    """
+    Google Cloud function handler for the use case:
+    Rule Name: Audit/log records: Ensure Stackdriver Logging is set to Enabled on Kubernetes Engine Clusters
+    Definition: KubernetesCluster should have LoggingService in ( "logging.googleapis.com",
+     "logging.googleapis.com/kubernetes")
+    """
+    budget = deadline.start_budget(context)
+    try:
+        violations = envelope.decode_violations(event)
+        clusters = read_clusters(violations)
+        remediate = functools.partial(remediate_violation, clusters=clusters)
+        summary = executor.remediate_violations(violations, remediate, budget=budget, log=logger)
+        summary.log(logger)
+        deadline.publish_leftover(budget, event, summary, log=logger)
+        summary.raise_for_failures()
+    except Exception as error:
+        raise Exception(f"Error occurred while doing remediation of the use case. Reason: {error}") from error
+
+
+def read_clusters(violations):
+    """
+    Read the kubernetes clusters of the violations in batches, as {kubernetes_cluster_name: cluster}
+    :param violations: Violations of the message
+    """
+    service = clients.get_client("container", "v1")
+    requests = {violation["resource_id"]: service.projects().locations().clusters().get(name=violation["resource_id"])
+                for violation in violations if violation.get("resource_id")}
+    return batch.batch_read(service, requests, log=logger)
+
+
+def remediate_violation(violation, clusters):
+    """
+    Remediate one violation of the message
+    :param violation: Violation with account_id, resource_id and region_name
+    :param clusters: Kubernetes clusters read in batches, as {kubernetes_cluster_name: cluster}
+    """
+    service = clients.get_client("container", "v1")
+
+    project_id = violation.get("account_id")
+    kubernetes_cluster_name = violation.get("resource_id")
+    region = violation.get("region_name")
+
+    logger.info(f"Alert details: Project ID {project_id}, Kubernetes cluster Name"
+                f" {kubernetes_cluster_name}, Region {region}")
+
+    status = set_logging_in_kubernetes_cluster(service, kubernetes_cluster_name,
+                                               clusters.pop(kubernetes_cluster_name, None))
+    if status:
+        logger.info(f"Remediation is successful for the project {project_id},"
+                    f"  Kubernetes cluster name {kubernetes_cluster_name} and"
+                    f" region {region}")
+
+
+def wait_for_set_logging_operation_complete(service, kubernetes_cluster_name, operation_name):
+    """
+    Wait for the set kubernetes logging operation to complete
+
+    :param service: kubernetes container service object
+    :param kubernetes_cluster_name: Name of the kubernetes cluster
+    :param operation_name: Name of the executed operation to wait for
+    """
+    try:
+        name = f"{kubernetes_cluster_name.split('clusters')[0]}operations/{operation_name}"
+        operation = operations.track_container_operation(service, name, timeout=SET_LOGGING_TIMEOUT)
+        if operations.wait(operation) == "DONE":
+            return True
+        logger.info(f"Remediation is not completed. Reason: Timed out while checking operation {operation_name}"
+                    f" status")
+    except Exception as error:
+        raise Exception(f"Remediation might not be completed."
+                        f" Error occurred while checking the kubernetes cluster set logging operation."
+                        f" Reason: {error}") from error
+
+
+def set_logging_in_kubernetes_cluster(service, kubernetes_cluster_name, cluster=None):
+    """
+    Set logging in kubernetes cluster
+
+    :param service: kubernetes container service object
+    :param kubernetes_cluster_name: Name of the kubernetes cluster
+    :param cluster: Kubernetes cluster if already read
+    """
+    try:
+        if cluster is None:
+            cluster = service.projects().locations().clusters().get(name=kubernetes_cluster_name).execute()
+        logging_service = cluster.get("loggingService", "none")
+        if logging_service and logging_service == "none":
+            body = {"loggingService": "logging.googleapis.com/kubernetes"}
+            response = service.projects().locations().clusters().setLogging(name=kubernetes_cluster_name,
+                                                                            body=body).execute()
+            logger.debug(f"Set kubernetes cluster logging response: {response}")
+            return wait_for_set_logging_operation_complete(service, kubernetes_cluster_name, response.get("name"))
+        else:
+            logger.info(f"Kubernetes cluster logging is already set with service {logging_service}.")
+
+    except HttpError as http_error:
+        if http_error.resp.get('content-type', '').startswith('application/json'):
+
+            error_json = json.loads(http_error.content).get('error')
+            status = error_json.get("status")
+            message = error_json.get("message")
+
+            if status == "NOT_FOUND":
+                logger.error(f"Error occurred while remediation. kubernetes cluster {kubernetes_cluster_name}"
+                             f" not found. Reason: {message}")
+            else:
+                logger.error(f"Error occurred while setting kubernetes cluster logging from the"
+                             f" kubernetes cluster {kubernetes_cluster_name}."
+                             f" Reason: {status} - {message}")
+
+        else:
+            logger.exception(f"Error occurred while setting kubernetes cluster logging from the"
+                             f" kubernetes cluster {kubernetes_cluster_name}. Reason: {http_error}")
+    except Exception as error:
+        logger.exception(f"Error occurred while setting kubernetes cluster logging from the"
+                         f" kubernetes cluster {kubernetes_cluster_name}. Reason: {error}")
@@ -0,0 +1,334 @@
+from googleapiclient.errors import HttpError
+from concurrent.futures import Future
+import functools
+import logging
+import os
+import threading
+from common import envelope, deadline, batch, clients, executor, operations
+
+# Set up  logger
+LOG_LEVEL = os.getenv('LOGLEVEL', 'DEBUG')
+logger = logging.getLogger("CIS-1-0-0-3-6-restrict-SSH-access-remediation-function")
+level_name = logging.getLevelName(LOG_LEVEL)
+logger.setLevel(level_name)
+logging.getLogger("googleapiclient.discovery_cache").setLevel(logging.WARNING)
+
+# Remediate every firewall rule of the project of a violation open to SSH from the internet, reported or not: one
+# firewalls().list per project, the port 22 condition evaluated locally and the patches and deletes sent in HTTP
+# batches, instead of one get, update and wait per violation
+FIREWALL_PROJECT_SWEEP = os.getenv('FIREWALL_PROJECT_SWEEP', 'false').lower() == 'true'
+
+PUBLIC_SOURCE_RANGE = "0.0.0.0/0"
+SSH_PORT = 22
+# Server-side filter of the sweep on the scalar fields of the rules. sourceRanges is a repeated field, the rules open
+# to 0.0.0.0/0 are selected locally.
+SWEEP_FILTER = 'direction="INGRESS" AND disabled=false'
+# HTTP statuses of the sweep retried later, throttling and unavailability of the API
+RETRY_LATER_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def google_cloud_function_handler(event, context):
+    """
+    Google Cloud function handler for the use case:
+    Rule Name: Ensure that SSH access is restricted from the internet
+    Definition: FirewallRule where Disabled eq False should not have Direction eq "INGRESS" and SourceRanges with [ Value eq 0.0.0.0/0 ] and Allowed with [ Protocol in ("all", "tcp") and Ports with [ FromPort lte 22 and ToPort gte 22 ] ]
+    """
+    budget = deadline.start_budget(context)
+    try:
+        violations = envelope.decode_violations(event)
+        if FIREWALL_PROJECT_SWEEP:
+            remediate = functools.partial(sweep_violation, sweeps=ProjectSweeps(violations))
+        else:
+            firewall_rules = read_firewall_rules(violations)
+            remediate = functools.partial(remediate_violation, firewall_rules=firewall_rules)
+        summary = executor.remediate_violations(violations, remediate, budget=budget, log=logger)
+        summary.log(logger)
+        deadline.publish_leftover(budget, event, summary, log=logger)
+        summary.raise_for_failures()
+    except Exception as error:
+        raise Exception(f"Error occurred while doing remediation of the use case. Reason: {error}") from error
+
+
+def read_firewall_rules(violations):
+    """
+    Read the firewall rules of the violations in batches, as {(project_id, firewall_rule_name): firewall rule}
+    :param violations: Violations of the message
+    """
+    service = clients.get_client("compute", "v1")
+    requests = {}
+    for violation in violations:
+        project_id = violation.get("account_id")
+        firewall_rule_name = violation.get("resource_id", "").split("/")[-1]
+        if project_id and firewall_rule_name:
+            requests[(project_id, firewall_rule_name)] = service.firewalls().get(project=project_id,
+                                                                                 firewall=firewall_rule_name)
+    return batch.batch_read(service, requests, log=logger)
+
+
+def remediate_violation(violation, firewall_rules):
+    """
+    Remediate one violation of the message
+    :param violation: Violation with account_id, resource_id and region_name
+    :param firewall_rules: Firewall rules read in batches, as {(project_id, firewall_rule_name): firewall rule}
+    """
+    service = clients.get_client("compute", "v1")
+
+    project_id = violation.get("account_id")
+    firewall_rule_name = violation.get("resource_id").split("/")[-1]
+    region = violation.get("region_name")
+
+    logger.info(f"Alert details: Project ID {project_id}, Firewall rule name"
+                f" {firewall_rule_name}, Region {region}")
+
+    # Taken out of the batch results, as the remediation updates the resource it is given
+    status = update_firewall_rule_source_ranges(service, project_id, firewall_rule_name,
+                                                firewall_rules.pop((project_id, firewall_rule_name), None))
+    if status:
+        logger.info(f"Remediation is successful for the project {project_id},"
+                    f" firewall rule {firewall_rule_name} and region {region}")
+
+
+def wait_for_firewall_operation_complete(service, project_name, operation_name):
+    """
+    Wait for the firewall operation to complete
+
+    :param service: compute service object
+    :param project_name: Name of the project
+    :param operation_name: Name of the executed operation to wait for
+    """
+    try:
+        operation = operations.track_global_operation(service, project_name, operation_name)
+        if operations.wait(operation) == "DONE":
+            return True
+        logger.info(f"Remediation is not completed. Reason: Timed out while checking operation {operation_name}"
+                    f" status")
+    except Exception as error:
+        raise Exception(f"Remediation might not be completed."
+                        f" Error occurred while checking the firewall rule update operation."
+                        f" Reason: {error}") from error
+
+
+def update_firewall_rule_source_ranges(service, project_name, firewall_rule_name, firewall_rule=None):
+    """
+    Remove "0.0.0.0/0" entry from the firewall rule source ranges
+
+    :param service: compute service object
+    :param project_name: Name of the project
+    :param firewall_rule_name: firewall rule name
+    :param firewall_rule: firewall rule if already read
+    """
+    try:
+        firewall_service = service.firewalls()
+        if firewall_rule is None:
+            firewall_rule = firewall_service.get(project=project_name, firewall=firewall_rule_name).execute()
+        source_ranges = firewall_rule.get("sourceRanges", [])
+
+        if "0.0.0.0/0" in source_ranges:
+            source_ranges.remove("0.0.0.0/0")
+
+            if source_ranges:
+                response = firewall_service.patch(project=project_name, firewall=firewall_rule_name,
+                                                  body={"name": firewall_rule_name,
+                                                        "sourceRanges": source_ranges}).execute()
+            else:
+                response = firewall_service.delete(project=project_name, firewall=firewall_rule_name).execute()
+
+            logger.debug(f"Firewall rules update/delete response: {response}")
+            return wait_for_firewall_operation_complete(service, project_name, response.get("name"))
+        else:
+            logger.info("No entries found from source ranges for 0.0.0.0/0 from firewall rule")
+
+    except HttpError as http_error:
+        error_details = clients.get_error_details(http_error)
+        if error_details:
+            reason = error_details.get("reason")
+            message = error_details.get("message")
+
+            if reason == "resourceNotReady":
+                raise executor.RetryLater(f"Another firewall operation is running for the rule {firewall_rule_name}."
+                                          f" Reason: {message}") from http_error
+            elif reason == "notFound":
+                logger.error(f"Error occurred while remediation. Firewall rule {firewall_rule_name} not found."
+                             f" Reason: {message}")
+            else:
+                logger.error(
+                    f"Error occurred while updating/removing firewall rule {firewall_rule_name}"
+                    f" and project {project_name}."
+                    f" Reason: {reason} - {message}")
+        else:
+            logger.exception(
+                f"Error occurred while updating/removing firewall rule {firewall_rule_name} and project {project_name}."
+                f" Reason: {http_error}")
+    except Exception as error:
+        logger.exception(
+            f"Error occurred while updating/removing firewall rule {firewall_rule_name} and project {project_name}."
+            f" Reason: {error}")
+
+
+def allows_ssh(firewall_rule):
+    """
+    Return True if the firewall rule allows the SSH port, over all protocols or TCP
+
+    :param firewall_rule: firewall rule
+    """
+    for allowed in firewall_rule.get("allowed", []):
+        if allowed.get("IPProtocol") not in ("all", "tcp"):
+            continue
+        # No ports allows every port of the protocol
+        ports = allowed.get("ports") or ["0-65535"]
+        for port_range in ports:
+            from_port, _, to_port = port_range.partition("-")
+            if int(from_port) <= SSH_PORT <= int(to_port or from_port):
+                return True
+    return False
+
+
+def list_public_ingress_rules(service, project_name):
+    """
+    Return the enabled ingress firewall rules of the project whose source ranges contain 0.0.0.0/0, among others or
+    alone
+
+    :param service: compute service object
+    :param project_name: Name of the project
+    """
+    firewall_service = service.firewalls()
+    request = firewall_service.list(project=project_name, filter=SWEEP_FILTER)
+    firewall_rules = []
+    while request is not None:
+        response = request.execute()
+        firewall_rules.extend(response.get("items", []))
+        request = firewall_service.list_next(request, response)
+    return [firewall_rule for firewall_rule in firewall_rules
+            if firewall_rule.get("direction", "INGRESS") == "INGRESS" and not firewall_rule.get("disabled")
+            and PUBLIC_SOURCE_RANGE in firewall_rule.get("sourceRanges", [])]
+
+
+def sweep_project_firewall_rules(service, project_name, reported_rule_names):
+    """
+    Remove "0.0.0.0/0" from the source ranges of every firewall rule of the project which allows SSH from the
+    internet, and of the reported firewall rules. The patches and deletes are sent in HTTP batches and their
+    operations are waited on together.
+
+    :param service: compute service object
+    :param project_name: Name of the project
+    :param reported_rule_names: Names of the firewall rules of the violations of the project
+    """
+    firewall_rules = [firewall_rule for firewall_rule in list_public_ingress_rules(service, project_name)
+                      if allows_ssh(firewall_rule) or firewall_rule.get("name") in reported_rule_names]
+    if not firewall_rules:
+        logger.info(f"No firewall rule of the project {project_name} allows SSH from 0.0.0.0/0")
+        return True
+
+    firewall_service = service.firewalls()
+    requests = {}
+    for firewall_rule in firewall_rules:
+        firewall_rule_name = firewall_rule.get("name")
+        source_ranges = [source_range for source_range in firewall_rule.get("sourceRanges", [])
+                         if source_range != PUBLIC_SOURCE_RANGE]
+        if source_ranges:
+            requests[firewall_rule_name] = firewall_service.patch(project=project_name, firewall=firewall_rule_name,
+                                                                  body={"name": firewall_rule_name,
+                                                                        "sourceRanges": source_ranges})
+        else:
+            requests[firewall_rule_name] = firewall_service.delete(project=project_name, firewall=firewall_rule_name)
+    responses, errors = batch.batch_execute(service, requests, log=logger)
+
+    pending_operations = [(firewall_rule_name, response.get("name"),
+                           operations.track_global_operation(service, project_name, response.get("name")))
+                          for firewall_rule_name, response in responses.items()]
+    statuses = []
+    for firewall_rule_name, operation_name, operation in pending_operations:
+        try:
+            statuses.append(operations.wait(operation) == "DONE")
+        except Exception as error:
+            logger.error(f"Error occurred while checking the operation {operation_name} of the firewall rule"
+                         f" {firewall_rule_name} and project {project_name}. Reason: {error}")
+            statuses.append(False)
+
+    not_ready_rule_names = []
+    for firewall_rule_name, error in errors.items():
+        reason = clients.get_error_reason(error)
+        if reason == "resourceNotReady":
+            not_ready_rule_names.append(firewall_rule_name)
+        elif reason == "notFound":
+            # Removed since it was listed
+            continue
+        else:
+            logger.error(f"Error occurred while updating/removing firewall rule {firewall_rule_name}"
+                         f" and project {project_name}. Reason: {error}")
+            statuses.append(False)
+    logger.info(f"Updated/removed {sum(statuses)} of {len(firewall_rules)} firewall rules allowing SSH from"
+                f" 0.0.0.0/0 in the project {project_name}")
+    if not all(statuses):
+        raise Exception(f"Failed to update/remove {len(statuses) - sum(statuses)} firewall rules allowing SSH from"
+                        f" 0.0.0.0/0 in the project {project_name}")
+    if not_ready_rule_names:
+        # The retry lists the rules again, those fixed by now are left out
+        raise executor.RetryLater(f"Another firewall operation is running for the rules"
+                                  f" {', '.join(not_ready_rule_names)} of the project {project_name}")
+    return True
+
+
+class ProjectSweeps:
+    """
+    Sweeps of the projects of a message, every project being swept once for all its violations
+    """
+
+    def __init__(self, violations):
+        """
+        :param violations: Violations of the message
+        """
+        self.lock = threading.Lock()
+        # {project_id: Future of the sweep}
+        self.sweeps = {}
+        # {project_id: names of the reported firewall rules}
+        self.reported_rule_names = {}
+        for violation in violations:
+            self.reported_rule_names.setdefault(violation.get("account_id"), set()).add(
+                violation.get("resource_id", "").split("/")[-1])
+
+    def sweep(self, service, project_id):
+        """
+        Return the result of the sweep of the project, started by the first violation of the project
+        :param service: compute service object
+        :param project_id: Id of the project
+        """
+        with self.lock:
+            future = self.sweeps.get(project_id)
+            started = future is None
+            if started:
+                future = self.sweeps[project_id] = Future()
+        if started:
+            try:
+                future.set_result(sweep_project_firewall_rules(service, project_id,
+                                                               self.reported_rule_names.get(project_id, set())))
+            except Exception as error:
+                # A retry of the violations sweeps the project again
+                with self.lock:
+                    del self.sweeps[project_id]
+                future.set_exception(error)
+        return future.result()
+
+
+def sweep_violation(violation, sweeps):
+    """
+    Remediate one violation of the message by sweeping its project
+
+    :param violation: Violation with account_id, resource_id and region_name
+    :param sweeps: ProjectSweeps of the message
+    """
+    service = clients.get_client("compute", "v1")
+    project_id = violation.get("account_id")
+    firewall_rule_name = violation.get("resource_id").split("/")[-1]
+    logger.info(f"Alert details: Project ID {project_id}, Firewall rule name"
+                f" {firewall_rule_name}, Region {violation.get('region_name')}")
+
+    try:
+        sweeps.sweep(service, project_id)
+    except HttpError as http_error:
+        if http_error.resp.status in RETRY_LATER_STATUS_CODES:
+            raise executor.RetryLater(f"Error occurred while sweeping the firewall rules of the project"
+                                      f" {project_id}. Reason: {http_error}") from http_error
+        raise Exception(f"Error occurred while sweeping the firewall rules of the project {project_id}."
+                        f" Reason: {http_error}") from http_error
+    logger.info(f"Remediation is successful for the project {project_id} and firewall rule {firewall_rule_name}")
@@ -0,0 +1,66 @@
+import re
+import logging
+import os
+from common import envelope, deadline, clients, iam_policy
+
+# Set up  logger
+LOG_LEVEL = os.getenv('LOGLEVEL', 'DEBUG')
+logger = logging.getLogger("CIS-1-0-0-1-4-service-account-admin-privileges-remediation-function")
+level_name = logging.getLevelName(LOG_LEVEL)
+logger.setLevel(level_name)
+logging.getLogger("googleapiclient.discovery_cache").setLevel(logging.WARNING)
+
+SERVICE_ACCOUNT_MEMBER = re.compile(r"^serviceAccount:.*iam\.gserviceaccount\.com$")
+
+
+def google_cloud_function_handler(event, context):
+    """
+    Google Cloud function handler for the use case:
+    Rule Name: Identities and credentials: Ensure that ServiceAccount has no Admin privileges.
+    Definition: IAMPolicy should not have Members . ServiceEmails with [ Email like "iam\.gserviceaccount\.com$" ]
+     and ( Role . id in ("roles/editor", "roles/owner") or Role . id like ".*Admin$" )
+    """
+    budget = deadline.start_budget(context)
+    try:
+        service = clients.get_client("cloudresourcemanager", "v3")
+        # The violations of a project are applied to its IAM policy in one transaction
+        summary = iam_policy.remediate_policy_violations(envelope.decode_violations(event), service,
+                                                         get_violation_resource, get_violation_edit,
+                                                         update_mask="bindings", budget=budget, log=logger)
+        summary.log(logger)
+        deadline.publish_leftover(budget, event, summary, log=logger)
+        summary.raise_for_failures()
+    except Exception as error:
+        raise Exception(f"Error occurred while doing remediation of the use case. Reason: {error}") from error
+
+
+def get_violation_resource(violation):
+    return f"projects/{violation['account_id']}"
+
+
+def get_violation_edit(violation):
+    """
+    Return the IAM policy edit remediating one violation of the message
+    :param violation: Violation with account_id, resource_id and region_name
+    """
+    project_id = violation["account_id"]
+    role_name = violation["resource_id"].split('roles/')[1]
+    role_name = f"roles/{role_name}"
+    region = violation["region_name"]
+    logger.info(f"Alert details: Project ID {project_id}, Role {role_name}, Region {region}")
+
+    return lambda policy: remove_service_account_having_admin_privileges(policy, project_id, role_name)
+
+
+def remove_service_account_having_admin_privileges(policy, project_id, role_name):
+    """
+    Removes service account from policy role binding having admin privileges
+
+    :param policy: IamPolicy of the project, updated in place
+    :param project_id: ID of the project
+    :param role_name: role name from which to remove service account
+    """
+    if policy.remove_members(role_name, SERVICE_ACCOUNT_MEMBER.fullmatch):
+        return True
+    else:
+        logger.info(f"No service account found in members of {role_name} binding for project {project_id}")
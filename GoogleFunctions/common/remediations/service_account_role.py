@@ -0,0 +1,74 @@
+import logging
+import os
+from common import envelope, deadline, clients, iam_policy
+
+# Set up  logger
+LOG_LEVEL = os.getenv('LOGLEVEL', 'DEBUG')
+logger = logging.getLogger("CIS-1-2-0-1-6-service-account-role-remediation-function")
+level_name = logging.getLevelName(LOG_LEVEL)
+logger.setLevel(level_name)
+logging.getLogger("googleapiclient.discovery_cache").setLevel(logging.WARNING)
+
+
+def google_cloud_function_handler(event, context):
+    """
+    Google Cloud function handler for the use case:
+    Rule Name: Ensure that IAM users are not assigned the Service Account User or Service Account Token Creator
+     roles at project level
+    Definition: IAMPolicy where Name eq "iam.serviceAccountUser" or Name eq "iam.serviceAccountTokenCreator"
+     should have Members . UserEmails len() eq 0
+    """
+    budget = deadline.start_budget(context)
+    try:
+        service = clients.get_client("cloudresourcemanager", "v3")
+        # The violations of a project are applied to its IAM policy in one transaction
+        summary = iam_policy.remediate_policy_violations(envelope.decode_violations(event), service,
+                                                         get_violation_resource, get_violation_edit,
+                                                         update_mask="bindings", budget=budget, log=logger)
+        summary.log(logger)
+        deadline.publish_leftover(budget, event, summary, log=logger)
+        summary.raise_for_failures()
+
+    except Exception as error:
+        raise Exception(f"Error occurred while doing remediation of the use case. Reason: {error}") from error
+
+
+def get_violation_resource(violation):
+    return f"projects/{violation['account_id']}"
+
+
+def get_violation_edit(violation):
+    """
+    Return the IAM policy edit remediating one violation of the message
+    :param violation: Violation with account_id, resource_id and region_name
+    """
+    project_id = violation["account_id"]
+    role_name = violation["resource_id"].split('roles/')[1]
+    role_name = f"roles/{role_name}"
+    region = violation["region_name"]
+    logger.info(f"Alert details: Project ID {project_id}, Role {role_name}, Region {region}")
+
+    if role_name not in ("roles/iam.serviceAccountTokenCreator", "roles/iam.serviceAccountUser"):
+        logger.info("Remediation will only work with role name "
+                    "iam.serviceAccountTokenCreator or iam.serviceAccountUser")
+        return lambda policy: False
+
+    return lambda policy: remove_iam_users_having_service_account_user_or_token_role(policy, project_id, role_name)
+
+
+def remove_iam_users_having_service_account_user_or_token_role(policy, project_id, role_name):
+    """
+    Removes IAM users from service account user or service account token creator role
+    from policy role binding
+
+    :param policy: IamPolicy of the project, updated in place
+    :param project_id: ID of the project
+    :param role_name: role name from which to remove service account
+    """
+    if not policy.has_role(role_name):
+        logger.info(f"No policy binding found for role {role_name} and project {project_id}")
+        return
+
+    if policy.remove_members_with_prefix(role_name, "user:"):
+        return True
+    logger.info(f"No users found in IAM policy binding for role {role_name} and project {project_id}")
@@ -0,0 +1,103 @@
+import functools
+import logging
+import os
+from common import envelope, deadline, batch, clients, executor
+
+LOG_LEVEL = os.getenv('LOGLEVEL', 'INFO')
+logger = logging.getLogger("CIS-1-0-0-5-1-bucket-public-access-remediation-function")
+logger.setLevel(logging.getLevelName(LOG_LEVEL))
+logging.getLogger('googleapiclient.discovery_cache').setLevel(logging.ERROR)
+
+PROJECT_ID = os.getenv("GCP_PROJECT")
+GCP_REGION = os.getenv('FUNCTION_REGION')
+
+
+def google_cloud_function_handler(event, context):
+    """
+    Google Cloud function for the use case:
+        Rule Name: Identities and credentials: Ensure that Cloud Storage bucket is not anonymously or publicly
+                   accessible
+        Definition: Bucket should not have Policies with [ Members . lAlUsers eq True or Members . AllAuthenticatedUsers
+                    eq True ]
+    """
+    budget = deadline.start_budget(context)
+    try:
+        violations = envelope.decode_violations(event)
+        policies = read_bucket_policies(violations)
+        remediate = functools.partial(remediate_violation, policies=policies)
+        summary = executor.remediate_violations(violations, remediate, budget=budget, log=logger)
+        summary.log(logger)
+        deadline.publish_leftover(budget, event, summary, log=logger)
+        summary.raise_for_failures()
+
+    except Exception as error:
+        raise Exception(f'Error occurred while doing remediation of the use case. Reason: {error}') from error
+
+
+def read_bucket_policies(violations):
+    """
+    Read the IAM policies of the buckets of the violations in batches, as {bucket_name: policy}
+    :param violations: Violations of the message
+    """
+    service = clients.get_client('storage', 'v1')
+    requests = {}
+    for violation in violations:
+        if 'buckets/' in violation.get("resource_id", ""):
+            bucket_name = violation["resource_id"].split('buckets/')[1]
+            requests[bucket_name] = service.buckets().getIamPolicy(bucket=bucket_name)
+    return batch.batch_read(service, requests, log=logger)
+
+
+def remediate_violation(violation, policies):
+    """
+    Remediate one violation of the message
+    :param violation: Violation with account_id, resource_id and region_name
+    :param policies: IAM policies of the buckets read in batches, as {bucket_name: policy}
+    """
+    project_id = violation.get("account_id", PROJECT_ID)
+    region = violation.get("region_name", GCP_REGION)
+    bucket_name = violation["resource_id"].split('buckets/')[1]
+
+    logger.info(f'Got event with Project ID: {project_id}, Bucket: {bucket_name} and Region: {region}')
+    # Taken out of the batch results, as the remediation updates the resource it is given
+    disable_public_access_of_bucket(bucket_name, project_id, region, policies.pop(bucket_name, None))
+
+
+def disable_public_access_of_bucket(bucket_name, project_id, region, policy=None):
+    """
+    This function disables public access of the bucket by removing principals ('allUsers' and 'allAuthenticatedUsers')
+    from bucket's permission
+    :param bucket_name: Name of bucket
+    :param project_id: Id of the GCP project
+    :param region: Region of bucket
+    :param policy: IAM policy of the bucket if already read
+    """
+
+    try:
+        service = clients.get_client('storage', 'v1')
+        is_bucket_public = False
+        # get IAM policy of the bucket
+        if policy is None:
+            policy = service.buckets().getIamPolicy(bucket=bucket_name).execute()
+        logger.debug(f'Response from getIamPolicy method: {policy}')
+        bindings = policy['bindings']
+        for binding in bindings:
+            if 'allAuthenticatedUsers' in binding['members']:
+                is_bucket_public = True
+                binding['members'].remove('allAuthenticatedUsers')
+            if 'allUsers' in binding['members']:
+                is_bucket_public = True
+                binding['members'].remove('allUsers')
+
+        if is_bucket_public:
+            # update IAM policy of the bucket
+            response = service.buckets().setIamPolicy(bucket=bucket_name, body=policy).execute()
+            logger.debug(f'Response from setIamPolicy method: {response}')
+            logger.info(f'Successfully completed remediation for Bucket: {bucket_name} of Project: {project_id}')
+        else:
+            logger.info(f'Remediation was already completed for Bucket: {bucket_name} of Project: {project_id}')
+
+    except Exception as error:
+        logger.exception(
+            f'Error occurred while disabling public access of Bucket: {bucket_name}. Reason: {error}. '
+            f'Skipping remediation for this bucket')
@@ -0,0 +1,130 @@
+import functools
+import logging
+import os
+from common import envelope, deadline, batch, clients, executor, operations
+
+LOG_LEVEL = os.getenv('LOGLEVEL', 'INFO')
+logger = logging.getLogger("CIS-1-0-0-4-2-ProjectWideSSHKeyRemediationFunction")
+logger.setLevel(logging.getLevelName(LOG_LEVEL))
+logging.getLogger('googleapiclient.discovery_cache').setLevel(logging.ERROR)
+
+
+def google_cloud_function_handler(event, context):
+    """
+    Google Cloud function for the use case:
+        Rule Name: Remote access: Ensure "Block Project-wide SSH keys" enabled for VM instances
+        Definition: Instance should have Metadata items with [ Key eq "block-project-ssh-keys" and Value like "True" ]
+    """
+    budget = deadline.start_budget(context)
+    try:
+        violations = envelope.decode_violations(event)
+        instances = read_instances(violations)
+        remediate = functools.partial(remediate_violation, instances=instances)
+        summary = executor.remediate_violations(violations, remediate, budget=budget, log=logger)
+        summary.log(logger)
+        deadline.publish_leftover(budget, event, summary, log=logger)
+        summary.raise_for_failures()
+
+    except Exception as error:
+        raise Exception(f'Error occurred while doing remediation of the use case. Reason: {error}') from error
+
+
+def get_violation_instance(violation):
+    """
+    Return the project ID, the zone and the name of the VM instance of a violation
+    :param violation: Violation with account_id and resource_id
+    """
+    instance = violation["resource_id"].split('instances/')[1]
+    zone = violation["resource_id"].split("zones/")[1].split("/")[0]
+    return violation["account_id"], zone, instance
+
+
+def read_instances(violations):
+    """
+    Read the VM instances of the violations in batches, as {(project_id, zone, instance): instance}
+    :param violations: Violations of the message
+    """
+    service = clients.get_client('compute', 'v1')
+    requests = {}
+    for violation in violations:
+        try:
+            project_id, zone, instance = get_violation_instance(violation)
+        except (KeyError, IndexError):
+            # Reported by the remediation of the violation
+            continue
+        requests[(project_id, zone, instance)] = service.instances().get(project=project_id, zone=zone,
+                                                                         instance=instance)
+    return batch.batch_read(service, requests, log=logger)
+
+
+def remediate_violation(violation, instances):
+    """
+    Remediate one violation of the message
+    :param violation: Violation with account_id, resource_id and region_name
+    :param instances: VM instances read in batches, as {(project_id, zone, instance): instance}
+    """
+    project_id, zone, instance = get_violation_instance(violation)
+
+    logger.info(f'Got event with Project ID: {project_id}, VM Instance: {instance} '
+                f'and Zone: {zone}')
+    # Taken out of the batch results, as the remediation updates the resource it is given
+    enable_block_project_wide_ssh_keys_for_vm_instance(instance, project_id, zone,
+                                                       instances.pop((project_id, zone, instance), None))
+
+
+def enable_block_project_wide_ssh_keys_for_vm_instance(instance, project_id, zone, instance_metadata=None):
+    """
+    This function enables block project-wide ssh keys for VM instance
+    :param instance: Name of Compute Engine VM Instance
+    :param project_id: Id of the project
+    :param zone: Zone of Compute Engine VM Instance
+    :param instance_metadata: Compute Engine VM Instance if already read
+    """
+    try:
+        service = clients.get_client('compute', 'v1')
+
+        # get metadata of a VM instance.
+        if instance_metadata is None:
+            instance_metadata = service.instances().get(project=project_id, instance=instance, zone=zone).execute()
+        logger.debug(f'response from get call : {instance_metadata}')
+        is_ssh_key_present = True
+        if "items" in instance_metadata['metadata']:
+            metadata_items = instance_metadata['metadata']['items']
+            for item in metadata_items:
+                if item['key'] == 'block-project-ssh-keys' and (item['value'] == 'True' or item['value'] == 'true'):
+                    logger.info(f'Remediation was already completed for VM Instance: {instance} of Project: '
+                                f'{project_id} and Zone: {zone}')
+                    return 0
+                elif item['key'] == 'block-project-ssh-keys' and (item['value'] == 'False' or item['value'] == 'false'):
+                    # Update parameter 'block-project-ssh-keys' value to True
+                    item['value'] = True
+                    is_ssh_key_present = True
+                    break
+                else:
+                    is_ssh_key_present = False
+
+            if not is_ssh_key_present:
+                new_item = {"key": "block-project-ssh-keys", "value": True}
+                # Append new item to metadata items
+                instance_metadata['metadata']['items'].append(new_item)
+        else:
+            # Add items key in instance metadata
+            instance_metadata['metadata'].update(items=[{"key": "block-project-ssh-keys", "value": True}])
+
+        response = service.instances().setMetadata(project=project_id, zone=zone, instance=instance,
+                                                   body=instance_metadata['metadata']).execute()
+        logger.debug(f'response from setMetadata call : {response}')
+        operation = response['name']
+        # wait for operation to complete
+        status = operations.wait(operations.track_zone_operation(service, project_id, zone, operation))
+        if status == "DONE":
+            logger.info(f'Successfully completed remediation for VM Instance: {instance} of '
+                        f'Project: {project_id} and Zone: {zone}')
+        elif status == "Timeout":
+            logger.warning(f'Timed out while waiting for operation: {operation} to be completed. '
+                           f'Skipping remediation for this VM Instance: {instance} of Project: {project_id} '
+                           f'and Zone: {zone}')
+
+    except Exception as error:
+        logger.exception(f'Error occurred while doing remediation for VM Instance: {instance}. '
+                         f'Skipping remediation for this VM instance. Reason: {error}')
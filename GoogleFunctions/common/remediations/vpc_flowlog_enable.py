@@ -0,0 +1,246 @@
+import logging
+import os
+from googleapiclient.errors import HttpError
+from common import envelope, deadline, batch, clients, executor, operations
+
+# Set up  logger
+LOG_LEVEL = os.getenv('LOGLEVEL', 'DEBUG')
+logger = logging.getLogger("CIS-1-0-0-3-9-vpc-flow-log-enable-remediation-function")
+level_name = logging.getLevelName(LOG_LEVEL)
+logger.setLevel(level_name)
+logging.getLogger("googleapiclient.discovery_cache").setLevel(logging.WARNING)
+
+GCP_REGION = os.getenv('FUNCTION_REGION', 'us-east-1')
+# Find the subnets without flow logs of the VPC network in every region with one subnetworks().aggregatedList call and
+# patch them in HTTP batches, instead of the subnets of FUNCTION_REGION only
+FLOW_LOGS_ALL_REGIONS = os.getenv('FLOW_LOGS_ALL_REGIONS', 'false').lower() == 'true'
+
+
+def google_cloud_function_handler(event, context):
+    """
+    Google Cloud function handler for the use case:
+    Rule Name: Communications and control network protection: Ensure VPC Flow logs is enabled for every subnet in VPC
+     Network
+    Definition: VPC should have every Subnetworks with [ LogEnabled ]
+    """
+    budget = deadline.start_budget(context)
+    violations = envelope.decode_violations(event)
+    summary = executor.remediate_violations(violations, remediate_violation, budget=budget, log=logger)
+    summary.log(logger)
+    deadline.publish_leftover(budget, event, summary, log=logger)
+    summary.raise_for_failures()
+
+
+def remediate_violation(violation):
+    """
+    Remediate one violation of the message
+    :param violation: Violation with account_id, resource_id and region_name
+    """
+    service = clients.get_client("compute", "v1")
+
+    project_id = violation.get("account_id")
+    vpc_name = violation.get("resource_id").split("/")[-1]
+    region = violation.get("region_name")
+
+    if FLOW_LOGS_ALL_REGIONS:
+        status = enable_flow_logs_for_all_subnets(service, project_id, vpc_name)
+        if status:
+            logger.info(f"Remediation is successful for the project {project_id},"
+                        f" VPC {vpc_name} and all regions")
+        return
+
+    status = enable_flow_logs_for_subnets(service, GCP_REGION, project_id, vpc_name)
+    if status:
+        logger.info(f"Remediation is successful for the project {project_id},"
+                    f" VPC {vpc_name} and region {GCP_REGION}")
+
+
+def wait_for_vpc_operation_complete(operation, operation_name):
+    """
+    Wait for the subnetwork operation to complete
+
+    :param operation: Future of the tracked operation
+    :param operation_name: Name of the executed operation to wait for
+    """
+    try:
+        if operations.wait(operation) == "DONE":
+            return True
+        logger.info(f"Remediation is not completed. Reason: Timed out while checking operation"
+                    f" {operation_name} status")
+    except Exception as error:
+        raise Exception(f"Remediation might not be completed."
+                        f" Error occurred while checking the update subnet operation."
+                        f" Reason: {error}") from error
+
+
+def get_network_url(project_name, vpc_name):
+    # Sub network list API response is giving the URL of the VPC Network instead of name,
+    # hence we need to give following URL string to filter subnetworks
+    return f"https://www.googleapis.com/compute/v1/projects/{project_name}/global/networks/{vpc_name}"
+
+
+def list_subnets_without_flow_logs(service, project_name, vpc_name):
+    """
+    Return the subnets of the VPC network without flow logs in every region, listed with subnetworks().aggregatedList
+
+    :param service: compute service object
+    :param project_name: Name of the project
+    :param vpc_name: VPC Network Name
+    """
+    subnet_service = service.subnetworks()
+    request = subnet_service.aggregatedList(
+        project=project_name, filter=f'network="{get_network_url(project_name, vpc_name)}" AND enableFlowLogs=false')
+    subnets = []
+    while request is not None:
+        response = request.execute()
+        # Items are scoped by region, as {"regions/<region>": {"subnetworks": [...]}} or a warning for the regions
+        # without subnets of the network
+        for scoped_list in response.get("items", {}).values():
+            subnets.extend(scoped_list.get("subnetworks", []))
+        request = subnet_service.aggregatedList_next(request, response)
+    return subnets
+
+
+def enable_flow_logs_for_all_subnets(service, project_name, vpc_name):
+    """
+    Enable flow logging for the subnets of given VPC in every region. The subnets are listed with one aggregated call,
+    patched concurrently in HTTP batches and their regional operations are waited on together.
+
+    :param service: compute service object
+    :param project_name: Name of the project
+    :param vpc_name: VPC Network Name
+    """
+    try:
+        # Validate that VPC network exist in the project
+        service.networks().get(project=project_name, network=vpc_name).execute()
+
+        subnets = list_subnets_without_flow_logs(service, project_name, vpc_name)
+        if not subnets:
+            logger.info(f"VPC flow logging is already enabled for subnetworks present in every region"
+                        f" for VPC network {vpc_name}")
+            return
+
+        subnet_service = service.subnetworks()
+        requests = {}
+        for subnet in subnets:
+            region = subnet.get("region", "").split("/")[-1]
+            request_body = {"enableFlowLogs": True, "fingerprint": subnet.get("fingerprint")}
+            requests[(region, subnet.get("name"))] = subnet_service.patch(
+                project=project_name, region=region, subnetwork=subnet.get("name"), body=request_body)
+        responses, errors = batch.batch_execute(service, requests, log=logger)
+
+        pending_operations = [(region, subnet_name, response.get("name"),
+                               operations.track_region_operation(service, project_name, region, response.get("name")))
+                              for (region, subnet_name), response in responses.items()]
+        subnet_update_status = []
+        for region, subnet_name, operation_name, operation in pending_operations:
+            operation_status = wait_for_vpc_operation_complete(operation, operation_name)
+            logger.info(f"Enabled Flow logging for subnet {subnet_name}, VPC Network"
+                        f" {vpc_name} and region {region}")
+            subnet_update_status.append(operation_status)
+
+        not_ready_subnets = []
+        failed_subnets = []
+        for (region, subnet_name), error in errors.items():
+            if clients.get_error_reason(error) == "resourceNotReady":
+                not_ready_subnets.append(subnet_name)
+            else:
+                logger.error(f"Error occurred while enabling flow logs for subnet {subnet_name}, VPC network"
+                             f" {vpc_name} and region {region}. Reason: {error}")
+                failed_subnets.append(f"{subnet_name} ({region})")
+        if failed_subnets:
+            # The subnets of the other regions are patched, the retry of the violation only lists the failed ones
+            raise Exception(f"Failed to enable flow logs for the subnets {', '.join(failed_subnets)}"
+                            f" of the VPC network {vpc_name} and project {project_name}")
+        if not_ready_subnets:
+            # The retry lists the subnets again, those patched by now are left out
+            raise executor.RetryLater(f"Another VPC network operation is running for the subnets"
+                                      f" {', '.join(not_ready_subnets)} of {vpc_name}")
+
+        if not all(subnet_update_status):
+            raise Exception(f"Failed to enable flow logging in some of the subnets of the VPC network {vpc_name}"
+                            f" and project {project_name}, their operations did not complete")
+        return True
+
+    except HttpError as http_error:
+        reason = clients.get_error_reason(http_error)
+        if reason == "resourceNotReady":
+            raise executor.RetryLater(f"Another VPC network operation is running for {vpc_name}."
+                                      f" Reason: {http_error}") from http_error
+        elif reason == "notFound":
+            logger.error(f"Error occurred while remediation. VPC network {vpc_name} not found. Reason: {http_error}")
+        else:
+            raise Exception(f"Error occurred while enabling flow logs for the VPC network"
+                            f" {vpc_name} and project {project_name}. Reason: {http_error}") from http_error
+
+
+def enable_flow_logs_for_subnets(service, region, project_name, vpc_name):
+    """
+    Enable flow logging for subnets of given VPC
+
+    :param service: compute service object
+    :param region: Name of the region
+    :param project_name: Name of the project
+    :param vpc_name: VPC Network Name
+    """
+    try:
+        # Validate that VPC network exist in the project
+        network_service = service.networks()
+        network_service.get(project=project_name, network=vpc_name).execute()
+
+        subnet_service = service.subnetworks()
+
+        vpc_network_string = get_network_url(project_name, vpc_name)
+        subnets = subnet_service.list(project=project_name, region=region,
+                                      filter=f'network="{vpc_network_string}" AND enableFlowLogs=false').execute()
+        subnets = subnets.get("items", [])
+
+        if not subnets:
+            logger.info(f"VPC flow logging is already enabled for subnetworks present in the region {region}"
+                        f" for VPC network {vpc_name}")
+            return
+
+        subnet_update_status = []
+
+        # Patch every subnet first, then wait for the operations which run in parallel
+        pending_operations = []
+        for subnet in subnets:
+            request_body = {"enableFlowLogs": True, "fingerprint": subnet.get("fingerprint")}
+            response = subnet_service.patch(project=project_name, region=region, subnetwork=subnet.get("name"),
+                                            body=request_body).execute()
+            operation = operations.track_region_operation(service, project_name, region, response.get("name"))
+            pending_operations.append((subnet, operation, response.get("name")))
+
+        for subnet, operation, operation_name in pending_operations:
+            operation_status = wait_for_vpc_operation_complete(operation, operation_name)
+            logger.info(f"Enabled Flow logging for subnet {subnet.get('name')}, VPC Network"
+                        f" {vpc_name} and region {region}")
+            subnet_update_status.append(operation_status)
+
+        if subnet_update_status and all(subnet_update_status):
+            return True
+        else:
+            logger.error("Error occurred while enabling flow logging in subnets."
+                         " Failed to enable flow logging in some of subnets")
+
+    except HttpError as http_error:
+        error_details = clients.get_error_details(http_error)
+        if error_details:
+            reason = error_details.get("reason")
+            message = error_details.get("message")
+
+            if reason == "resourceNotReady":
+                raise executor.RetryLater(f"Another VPC network operation is running for {vpc_name}."
+                                          f" Reason: {message}") from http_error
+            elif reason == "notFound":
+                logger.error(f"Error occurred while remediation. VPC network {vpc_name} not found. Reason: {message}")
+            else:
+                logger.error(f"Error occurred while enabling flow logs for the VPC network"
+                             f" {vpc_name} and project {project_name}. Reason: {reason} - {message}")
+
+        else:
+            logger.exception(f"Error occurred while enabling flow logs for the VPC network"
+                             f" {vpc_name} and project {project_name}. Reason: {http_error}")
+    except Exception as error:
+        logger.exception(f"Error occurred while enabling flow logs for the VPC network"
+                         f" {vpc_name} and project {project_name}. Reason: {error}")
@@ -0,0 +1,126 @@
+"""
+Pending changes to the ipConfiguration of a Cloud SQL instance.
+
+CIS-1-0-0-6-1 sets requireSsl and CIS-1-0-0-6-2 removes 0.0.0.0/0 from the authorizedNetworks of the same instances.
+Remediated separately, the patch of one rule starts an operation on the instance which fails the patch of the other
+rule with 409 operationInProgress until it is done. When the fetcher publishes the violations of both rules together
+(COALESCED_RULES of the fetcher), every violation carries its rule_short_name and the violations of a message are
+grouped by instance: the changes of the rules reported for an instance are applied with a single instances().patch,
+and a single operation is waited on for all of them. A rule is only applied to the instances it was reported for, so
+the muted and excepted findings of Netskope are left untouched.
+"""
+import threading
+from concurrent.futures import Future
+
+from common import envelope
+from common.remediations import get_rule_id
+
+PUBLIC_NETWORK = "0.0.0.0/0"
+
+
+def require_ssl(ip_configuration):
+    """
+    Return the change of CIS-1-0-0-6-1: incoming connections must use SSL
+    :param ip_configuration: settings.ipConfiguration of the instance
+    """
+    return {} if ip_configuration.get("requireSsl") else {"requireSsl": True}
+
+
+def remove_public_networks(ip_configuration):
+    """
+    Return the change of CIS-1-0-0-6-2: no authorized network open to the world
+    :param ip_configuration: settings.ipConfiguration of the instance
+    """
+    authorized_networks = ip_configuration.get("authorizedNetworks", [])
+    updated_authorized_networks = [network for network in authorized_networks
+                                   if network.get("value") != PUBLIC_NETWORK]
+    if len(updated_authorized_networks) < len(authorized_networks):
+        return {"authorizedNetworks": updated_authorized_networks}
+    return {}
+
+
+# Change of every rule to the ipConfiguration of an instance, by rule ID
+RULE_CHANGES = {
+    "CIS-1-0-0-6-1": require_ssl,
+    "CIS-1-0-0-6-2": remove_public_networks,
+}
+
+
+def get_violation_rule(violation, rule_id):
+    """
+    Return the rule ID of a violation, given by its rule_short_name when the violations of several rules share the
+    message, otherwise the rule of the message
+    :param violation: Violation of the message
+    :param rule_id: Rule ID of the message
+    """
+    rule_short_name = violation.get(envelope.RULE_SHORT_NAME_ATTRIBUTE)
+    return get_rule_id(rule_short_name) if rule_short_name else rule_id
+
+
+def get_pending_changes(instance_metadata, rules):
+    """
+    Return the changes of the rules to the ipConfiguration of the instance merged as one patch of the ipConfiguration,
+    empty when the instance complies with every rule
+    :param instance_metadata: Metadata of the Cloud SQL instance
+    :param rules: Rule IDs of the violations of the instance
+    """
+    ip_configuration = instance_metadata['settings']['ipConfiguration']
+    changes = {}
+    for rule_id in rules:
+        if rule_id not in RULE_CHANGES:
+            raise Exception(f"No ipConfiguration change for the rule {rule_id}")
+        changes.update(RULE_CHANGES[rule_id](ip_configuration))
+    return changes
+
+
+class InstancePatches:
+    """
+    Patches of the Cloud SQL instances of a message, every instance being patched once for all its violations with
+    the changes of the rules they report
+    """
+
+    def __init__(self, violations, rule_id, get_violation_instance):
+        """
+        :param violations: Violations of the message
+        :param rule_id: Rule ID of the message
+        :param get_violation_instance: Function returning the (project_id, instance) of a violation
+        """
+        self.lock = threading.Lock()
+        # {(project_id, instance): Future of the patch}
+        self.patches = {}
+        # {(project_id, instance): rule IDs of its violations}, the rule of the message first
+        self.rules = {}
+        for violation in violations:
+            try:
+                instance_key = get_violation_instance(violation)
+            except (KeyError, IndexError):
+                # Reported by the remediation of the violation
+                continue
+            rules = self.rules.setdefault(instance_key, [])
+            violation_rule = get_violation_rule(violation, rule_id)
+            if violation_rule not in rules:
+                rules.append(violation_rule)
+
+    def get_rules(self, instance_key):
+        return self.rules.get(instance_key, [])
+
+    def patch(self, instance_key, patch):
+        """
+        Return the result of patch(rules) for the instance, called by the first violation of the instance and shared
+        by the others. A failed patch is called again by the retry of a violation.
+        :param instance_key: (project_id, instance)
+        :param patch: Function patching the instance with the changes of the rule IDs it is given
+        """
+        with self.lock:
+            future = self.patches.get(instance_key)
+            started = future is None
+            if started:
+                future = self.patches[instance_key] = Future()
+        if started:
+            try:
+                future.set_result(patch(self.get_rules(instance_key)))
+            except Exception as error:
+                with self.lock:
+                    del self.patches[instance_key]
+                future.set_exception(error)
+        return future.result()
@@ -0,0 +1,11 @@
+"""
+Tests of the shared common package and of the fetcher modules, run from the repository root with:
+python -m pytest GoogleFunctions/tests
+"""
+import os
+import sys
+
+FUNCTIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+# The functions import the common package and the modules of their directory from the root of their zip
+sys.path[:0] = [FUNCTIONS_DIR, os.path.join(FUNCTIONS_DIR, "GetNetskopeSecurityPostureAssesmentFunction")]
@@ -0,0 +1,72 @@
+import pytest
+
+from common import deadline, executor
+
+TOPIC = "projects/project/topics/remediation"
+EVENT = {"data": "", "attributes": {"rule_short_name": "CIS-1-0-0-3-6"}}
+
+
+@pytest.fixture
+def published(monkeypatch):
+    messages = []
+    monkeypatch.setattr(deadline, "publish_violations",
+                        lambda topic, event, violations, **attributes: messages.append((topic, violations, attributes)))
+    monkeypatch.setattr(executor, "DEFERRED_RETRY_TOPIC", "retry")
+    monkeypatch.setenv("GCP_PROJECT", "project")
+    return messages
+
+
+def summary_of(outcomes=(), leftover=(), deferred=()):
+    summary = executor.RemediationSummary()
+    for outcome in outcomes:
+        summary.add(outcome)
+    summary.leftover.extend(leftover)
+    summary.deferred.extend(deferred)
+    return summary
+
+
+def violation(index):
+    return {"account_id": "project", "resource_id": f"firewall-{index}"}
+
+
+def test_publish_leftover_publishes_continuation_and_deferred(published):
+    summary = summary_of(outcomes=[executor.RemediationOutcome(violation(0), "project")],
+                         leftover=[violation(1)], deferred=[violation(2)])
+
+    deadline.publish_leftover(deadline.TimeBudget(TOPIC), EVENT, summary)
+
+    assert published[0] == (TOPIC, [violation(1)], {deadline.CONTINUATION_ATTRIBUTE: "1"})
+    assert published[1] == ("projects/project/topics/retry", [violation(2)], {deadline.RETRY_ATTEMPT_ATTRIBUTE: "1"})
+
+
+def test_publish_leftover_publishes_despite_failed_violations(published):
+    summary = summary_of(outcomes=[executor.RemediationOutcome(violation(0), "project", error=Exception("failed"))],
+                         leftover=[violation(1)], deferred=[violation(2)])
+
+    deadline.publish_leftover(deadline.TimeBudget(TOPIC), EVENT, summary)
+
+    assert [violations for _, violations, _ in published] == [[violation(1)], [violation(2)]]
+    # The failed violation is reported on its own, after the others were published
+    with pytest.raises(Exception):
+        summary.raise_for_failures()
+
+
+def test_publish_leftover_counts_the_retry_attempts(published):
+    event = dict(EVENT, attributes=dict(EVENT["attributes"], **{deadline.RETRY_ATTEMPT_ATTRIBUTE: "2"}))
+
+    deadline.publish_leftover(None, event, summary_of(deferred=[violation(0)]))
+
+    assert published == [("projects/project/topics/retry", [violation(0)], {deadline.RETRY_ATTEMPT_ATTRIBUTE: "3"})]
+
+
+def test_publish_leftover_fails_the_violations_deferred_too_many_times(published, monkeypatch):
+    monkeypatch.setattr(executor, "DEFERRED_RETRIES", 2)
+    event = dict(EVENT, attributes=dict(EVENT["attributes"], **{deadline.RETRY_ATTEMPT_ATTRIBUTE: "2"}))
+    summary = summary_of(leftover=[violation(1)], deferred=[violation(0)])
+
+    deadline.publish_leftover(deadline.TimeBudget(TOPIC), event, summary)
+
+    assert published == [(TOPIC, [violation(1)], {deadline.CONTINUATION_ATTRIBUTE: "1"})]
+    assert summary.deferred == []
+    assert [outcome.violation for outcome in summary.failures] == [violation(0)]
+    assert isinstance(summary.failures[0].error, executor.RetryLater)
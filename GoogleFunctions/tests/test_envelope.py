@@ -0,0 +1,86 @@
+import base64
+import json
+
+import pytest
+
+from common import envelope
+
+VIOLATIONS = [
+    {"account_id": "project-1", "resource_id": "projects/project-1/global/firewalls/rule-1", "region_name": "global"},
+    {"account_id": "project-2", "resource_id": "projects/project-2/instances/sql-1", "region_name": "us-east1",
+     "rule_short_name": "CIS-1-0-0-6-2", "retry_count": 1, "not_before": 1700000000.5},
+    {"account_id": "project-2", "resource_id": "résumé ✓", "region_name": ""},
+]
+
+
+def event_of(data, attributes):
+    return {"data": base64.b64encode(data).decode("ascii"), "attributes": attributes}
+
+
+@pytest.mark.parametrize("version", [1, 2])
+@pytest.mark.parametrize("compression", ["none", "gzip"])
+def test_round_trip(version, compression):
+    data, attributes = envelope.encode_violations(VIOLATIONS, version, compression)
+
+    assert attributes[envelope.ENVELOPE_VERSION_ATTRIBUTE] == str(version)
+    assert attributes.get(envelope.CONTENT_ENCODING_ATTRIBUTE, "none") == compression
+    assert envelope.decode_message(data, attributes) == VIOLATIONS
+    assert envelope.decode_violations(event_of(data, attributes)) == VIOLATIONS
+
+
+def test_round_trip_zstd():
+    pytest.importorskip("zstandard")
+    data, attributes = envelope.encode_violations(VIOLATIONS, 2, "zstd")
+
+    assert envelope.decode_violations(event_of(data, attributes)) == VIOLATIONS
+
+
+@pytest.mark.parametrize("version", [1, 2])
+def test_round_trip_no_violations(version):
+    data, attributes = envelope.encode_violations([], version, "gzip")
+
+    assert envelope.decode_violations(event_of(data, attributes)) == []
+
+
+def test_version_2_stores_the_fields_once():
+    data, _ = envelope.encode_violations(VIOLATIONS, 2)
+    body = json.loads(data)
+
+    assert body["count"] == len(VIOLATIONS)
+    assert list(body["columns"]) == ["account_id", "resource_id", "region_name", "rule_short_name", "retry_count",
+                                     "not_before"]
+    # The fields absent from a violation are null in its column and absent again once decoded
+    assert body["columns"]["retry_count"] == [None, 1, None]
+    assert "retry_count" not in envelope.decode_message(data, {})[0]
+
+
+@pytest.mark.parametrize("attributes", [{}, None, {"rule_short_name": "CIS-1-0-0-3-6"}])
+def test_plain_json_message(attributes):
+    # Messages published by the fetcher before the envelope, without version nor encoding attributes
+    data = json.dumps({"violations": VIOLATIONS}).encode("utf-8")
+    event = {"data": base64.b64encode(data).decode("ascii")}
+    if attributes is not None:
+        event["attributes"] = attributes
+
+    assert envelope.decode_violations(event) == VIOLATIONS
+
+
+def test_plain_json_message_without_violations():
+    assert envelope.decode_violations(event_of(b'{"violations": []}', {})) == []
+    assert envelope.decode_violations(event_of(b'{}', {})) == []
+
+
+def test_rule_short_name():
+    event = event_of(b"{}", {"rule_short_name": "CIS-1-0-0-3-6-us-east1"})
+
+    assert envelope.get_rule_short_name(event) == "CIS-1-0-0-3-6-us-east1"
+    assert envelope.get_rule_short_name({"data": ""}) is None
+
+
+def test_unsupported_version_and_compression():
+    with pytest.raises(Exception, match="Unsupported envelope version"):
+        envelope.encode_violations(VIOLATIONS, 3)
+    with pytest.raises(Exception, match="Unsupported compression"):
+        envelope.encode_violations(VIOLATIONS, 1, "brotli")
+    with pytest.raises(Exception, match="Unsupported content encoding"):
+        envelope.decode_message(b"{}", {envelope.CONTENT_ENCODING_ATTRIBUTE: "brotli"})
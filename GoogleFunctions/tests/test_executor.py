@@ -0,0 +1,150 @@
+import threading
+import time
+
+import pytest
+
+from common import deadline, executor
+
+
+@pytest.fixture(autouse=True)
+def short_backoff(monkeypatch):
+    monkeypatch.setattr(executor, "DEFERRED_RETRY_DELAY", 0.01)
+    monkeypatch.setattr(executor, "DEFERRED_RETRY_MAX_DELAY", 0.02)
+    monkeypatch.setattr(executor, "DEFERRED_RETRY_TOPIC", "")
+    monkeypatch.setattr(executor, "PROJECT_CONCURRENCY", None)
+
+
+def violations(count, projects=1):
+    return [{"account_id": f"project-{index % projects}", "resource_id": f"resource-{index}"}
+            for index in range(count)]
+
+
+def test_every_violation_remediated_once():
+    remediated = []
+
+    summary = executor.remediate_violations(violations(20, projects=3), lambda violation: remediated.append(
+        violation["resource_id"]) or violation["resource_id"])
+
+    assert sorted(remediated) == sorted(f"resource-{index}" for index in range(20))
+    assert sorted(outcome.result for outcome in summary.outcomes) == sorted(remediated)
+    assert not summary.failures and not summary.leftover and not summary.deferred
+
+
+def test_per_project_concurrency_cap():
+    lock = threading.Lock()
+    running = {}
+    peaks = {}
+
+    def remediate(violation):
+        project_id = violation["account_id"]
+        with lock:
+            running[project_id] = running.get(project_id, 0) + 1
+            peaks[project_id] = max(peaks.get(project_id, 0), running[project_id])
+        time.sleep(0.02)
+        with lock:
+            running[project_id] -= 1
+
+    summary = executor.remediate_violations(violations(24, projects=2), remediate, max_workers=8,
+                                            project_concurrency=2)
+
+    assert len(summary.outcomes) == 24
+    assert peaks == {"project-0": 2, "project-1": 2}
+
+
+def test_project_concurrency_environment_overrides_the_default(monkeypatch):
+    monkeypatch.setattr(executor, "PROJECT_CONCURRENCY", "1")
+
+    assert executor.get_project_concurrency(4) == 1
+
+
+def test_failure_does_not_stop_the_other_violations():
+    def remediate(violation):
+        if violation["resource_id"] == "resource-1":
+            raise Exception("failed")
+
+    summary = executor.remediate_violations(violations(4), remediate)
+
+    assert [outcome.violation["resource_id"] for outcome in summary.failures] == ["resource-1"]
+    assert len(summary.outcomes) == 4
+    with pytest.raises(Exception):
+        summary.raise_for_failures()
+
+
+def test_retry_later_requeues_the_violation():
+    attempts = {}
+
+    def remediate(violation):
+        attempts[violation["resource_id"]] = attempts.get(violation["resource_id"], 0) + 1
+        if violation["resource_id"] == "resource-0" and attempts["resource-0"] < 3:
+            raise executor.RetryLater("busy")
+        return "done"
+
+    summary = executor.remediate_violations(violations(3), remediate)
+
+    assert attempts == {"resource-0": 3, "resource-1": 1, "resource-2": 1}
+    assert not summary.failures and len(summary.outcomes) == 3
+    retried = next(outcome.violation for outcome in summary.outcomes
+                   if outcome.violation["resource_id"] == "resource-0")
+    assert retried[executor.RETRY_COUNT_FIELD] == 2
+
+
+def test_retry_later_fails_after_the_last_retry(monkeypatch):
+    monkeypatch.setattr(executor, "DEFERRED_RETRIES", 2)
+
+    def remediate(violation):
+        raise executor.RetryLater("busy")
+
+    summary = executor.remediate_violations(violations(1), remediate)
+
+    assert len(summary.failures) == 1
+    assert isinstance(summary.failures[0].error, executor.RetryLater)
+    assert summary.failures[0].violation[executor.RETRY_COUNT_FIELD] == 2
+
+
+def test_retry_later_deferred_to_the_retry_topic(monkeypatch):
+    monkeypatch.setattr(executor, "DEFERRED_RETRY_TOPIC", "retry")
+
+    def remediate(violation):
+        if violation["resource_id"] == "resource-1":
+            raise executor.RetryLater("busy")
+
+    before = time.time()
+    summary = executor.remediate_violations(violations(3), remediate)
+
+    assert len(summary.outcomes) == 2 and not summary.failures
+    assert [violation["resource_id"] for violation in summary.deferred] == ["resource-1"]
+    assert summary.deferred[0][executor.RETRY_COUNT_FIELD] == 1
+    assert summary.deferred[0][executor.NOT_BEFORE_FIELD] > before
+
+
+def test_budget_cut_off_leaves_the_violations_not_started():
+    budget = deadline.TimeBudget("projects/project/topics/topic", timeout=0, margin=0)
+
+    summary = executor.remediate_violations(violations(5), lambda violation: None, max_workers=1, budget=budget)
+
+    # The first violation is always started, so that every invocation makes progress
+    assert [outcome.violation["resource_id"] for outcome in summary.outcomes] == ["resource-0"]
+    assert [violation["resource_id"] for violation in summary.leftover] == [f"resource-{index}"
+                                                                           for index in range(1, 5)]
+
+
+def test_budget_cut_off_leaves_the_violations_deferred_past_the_deadline():
+    budget = deadline.TimeBudget("projects/project/topics/topic", timeout=60, margin=0)
+    deferred = dict(violations(1)[0], **{executor.RETRY_COUNT_FIELD: 1, executor.NOT_BEFORE_FIELD: time.time() + 3600})
+    remediated = []
+
+    summary = executor.remediate_violations([deferred] + violations(3)[1:], lambda violation: remediated.append(
+        violation["resource_id"]), budget=budget)
+
+    assert sorted(remediated) == ["resource-1", "resource-2"]
+    assert summary.leftover == [deferred]
+
+
+def test_deferred_violation_not_started_before_its_backoff():
+    not_before = time.time() + 0.2
+    deferred = dict(violations(1)[0], **{executor.RETRY_COUNT_FIELD: 1, executor.NOT_BEFORE_FIELD: not_before})
+    started = []
+
+    executor.remediate_violations([deferred], lambda violation: started.append(time.time()))
+
+    assert started[0] >= not_before - 0.01
@@ -0,0 +1,26 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from google.cloud import pubsub_v1
+
+import google_function_handler
+
+
+def test_publisher_client_created_once_by_concurrent_rule_groups(monkeypatch):
+    created = []
+
+    class PublisherClient:
+        def __init__(self, **kwargs):
+            # Widen the window between the check of the global and its assignment
+            time.sleep(0.05)
+            created.append(threading.get_ident())
+
+    monkeypatch.setattr(pubsub_v1, "PublisherClient", PublisherClient)
+    monkeypatch.setattr(google_function_handler, "_publisher_client", None)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        clients = list(pool.map(lambda _: google_function_handler.get_publisher_client(), range(8)))
+
+    assert len(created) == 1
+    assert all(client is clients[0] for client in clients)
@@ -0,0 +1,41 @@
+import pytest
+
+import google_function_handler
+
+
+@pytest.fixture(autouse=True)
+def coalesced_rules(monkeypatch):
+    monkeypatch.setattr(google_function_handler, "COALESCED_RULES", ["CIS-1-0-0-6-1", "CIS-1-0-0-6-2"])
+
+
+SSL = ("Cloud SQL SSL", "CIS-1-0-0-6-1")
+PUBLIC = ("Cloud SQL public", "CIS-1-0-0-6-2")
+SSH = ("SSH", "CIS-1-0-0-3-6")
+
+
+def test_coalesced_rules_form_one_group_in_the_order_of_the_setting():
+    assert google_function_handler.group_coalesced_rules([PUBLIC, SSH, SSL]) == [[SSL, PUBLIC], [SSH]]
+
+
+def test_region_suffixed_rule_short_names_are_coalesced():
+    rules = [("Cloud SQL public", "CIS-1-0-0-6-2-us-east1"), ("SSH", "CIS-1-0-0-3-6-us-east1"),
+             ("Cloud SQL SSL", "CIS-1-0-0-6-1-us-east1")]
+
+    assert google_function_handler.group_coalesced_rules(rules) == [[rules[2], rules[0]], [rules[1]]]
+
+
+def test_region_suffixed_setting(monkeypatch):
+    monkeypatch.setattr(google_function_handler, "COALESCED_RULES",
+                        ["CIS-1-0-0-6-1-us-east1", "CIS-1-0-0-6-2-us-east1"])
+
+    assert google_function_handler.group_coalesced_rules([PUBLIC, SSL]) == [[SSL, PUBLIC]]
+
+
+def test_single_coalesced_rule_is_not_grouped():
+    assert google_function_handler.group_coalesced_rules([SSL, SSH]) == [[SSL], [SSH]]
+
+
+def test_rules_without_remediation_are_not_coalesced():
+    unknown = ("Custom", "CUSTOM-RULE")
+
+    assert google_function_handler.group_coalesced_rules([unknown, SSL]) == [[unknown], [SSL]]
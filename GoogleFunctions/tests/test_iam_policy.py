@@ -0,0 +1,85 @@
+import copy
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from common import iam_policy
+
+
+class Projects:
+    """
+    projects() of cloudresourcemanager, failing the first setIamPolicy calls with the given statuses
+    """
+
+    def __init__(self, write_statuses):
+        self.write_statuses = list(write_statuses)
+        self.policy = {"etag": "etag-0", "bindings": [{"role": "roles/owner", "members": ["user:a", "user:b"]}]}
+        self.reads = 0
+        self.writes = []
+
+    def projects(self):
+        return self
+
+    def getIamPolicy(self, resource, body):
+        return Call(self.read)
+
+    def setIamPolicy(self, resource, body):
+        return Call(lambda: self.write(body))
+
+    def read(self):
+        self.reads += 1
+        return copy.deepcopy(self.policy)
+
+    def write(self, body):
+        if self.write_statuses:
+            status = self.write_statuses.pop(0)
+            raise HttpError(httplib2.Response({"status": status}), b"")
+        self.writes.append(body["policy"])
+        return body["policy"]
+
+
+class Call:
+    def __init__(self, call):
+        self.call = call
+
+    def execute(self, num_retries=0):
+        return self.call()
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(iam_policy.time, "sleep", lambda seconds: None)
+
+
+def commit(service):
+    transaction = iam_policy.IamPolicyTransaction(service, "projects/project", "bindings")
+    edit = transaction.add(lambda policy: policy.remove_members("roles/owner", lambda member: member == "user:b"))
+    return transaction, edit, transaction.commit()
+
+
+@pytest.mark.parametrize("status", [409, 412, 429, 500, 503])
+def test_commit_retries_conflicts_and_transient_errors(status):
+    service = Projects([status, status])
+
+    transaction, edit, written = commit(service)
+
+    assert written and edit.changed
+    assert transaction.attempts == 3 and service.reads == 3
+    assert service.writes[0]["bindings"] == [{"role": "roles/owner", "members": ["user:a"]}]
+
+
+def test_commit_fails_on_other_errors():
+    service = Projects([403])
+
+    with pytest.raises(HttpError):
+        commit(service)
+    assert service.reads == 1
+
+
+def test_commit_gives_up_after_the_last_attempt():
+    service = Projects([503] * iam_policy.MAX_COMMIT_ATTEMPTS)
+
+    with pytest.raises(HttpError):
+        commit(service)
+    assert service.reads == iam_policy.MAX_COMMIT_ATTEMPTS
@@ -0,0 +1,43 @@
+import threading
+
+import pytest
+
+from common import operations
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    monkeypatch.setattr(operations, "OPERATION_POLL_INITIAL_DELAY", 0.01)
+    return operations.OperationTracker(poll_concurrency=1, long_poll_concurrency=1)
+
+
+def test_get_polls_are_not_delayed_by_long_polls(tracker):
+    released = threading.Event()
+
+    def long_poll():
+        # A Compute Engine wait call held by the server
+        released.wait(10)
+        return {"status": "DONE"}
+
+    long_polled = tracker.track(long_poll, "long-poll", long_poll=True)
+    polled = tracker.track(lambda: {"status": "DONE"}, "get")
+
+    assert polled.result(timeout=2) == {"status": "DONE"}
+    assert not long_polled.done()
+    released.set()
+    assert operations.wait(long_polled) == "DONE"
+
+
+def test_operation_polled_again_until_done(tracker):
+    statuses = iter(["PENDING", "RUNNING", "DONE"])
+
+    future = tracker.track(lambda: {"status": next(statuses)}, "get")
+
+    assert future.result(timeout=2) == {"status": "DONE"}
+
+
+def test_operation_error(tracker):
+    future = tracker.track(lambda: {"status": "DONE", "error": {"errors": [{"code": "QUOTA"}]}}, "get")
+
+    with pytest.raises(operations.OperationError):
+        operations.wait(future)
@@ -0,0 +1,90 @@
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from common import clients, executor
+from common.remediations import restrict_ssh_access
+
+
+class FirewallList:
+    """
+    firewalls().list of the compute service, returning the given rules on a single page
+    """
+
+    def __init__(self, firewall_rules):
+        self.firewall_rules = firewall_rules
+        self.filters = []
+
+    def firewalls(self):
+        return self
+
+    def list(self, project, filter):
+        self.filters.append(filter)
+        return self
+
+    def execute(self):
+        return {"items": self.firewall_rules}
+
+    def list_next(self, request, response):
+        return None
+
+
+def firewall_rule(name, source_ranges, direction="INGRESS", disabled=False):
+    return {"name": name, "direction": direction, "disabled": disabled, "sourceRanges": source_ranges,
+            "allowed": [{"IPProtocol": "tcp", "ports": ["22"]}]}
+
+
+def http_error(status):
+    return HttpError(httplib2.Response({"status": status, "content-type": "application/json"}),
+                     b'{"error": {"errors": [{"reason": "backendError", "message": "error"}]}}')
+
+
+def test_sweep_filter_is_not_on_source_ranges():
+    assert "sourceRanges" not in restrict_ssh_access.SWEEP_FILTER
+
+
+def test_list_public_ingress_rules_with_multiple_source_ranges():
+    service = FirewallList([
+        firewall_rule("public-last", ["10.0.0.0/8", "192.168.0.0/16", "0.0.0.0/0"]),
+        firewall_rule("public-first", ["0.0.0.0/0", "10.0.0.0/8"]),
+        firewall_rule("public-only", ["0.0.0.0/0"]),
+        firewall_rule("private", ["10.0.0.0/8", "172.16.0.0/12"]),
+        firewall_rule("disabled", ["10.0.0.0/8", "0.0.0.0/0"], disabled=True),
+        firewall_rule("egress", ["10.0.0.0/8", "0.0.0.0/0"], direction="EGRESS"),
+    ])
+
+    firewall_rules = restrict_ssh_access.list_public_ingress_rules(service, "project")
+
+    assert [rule["name"] for rule in firewall_rules] == ["public-last", "public-first", "public-only"]
+    assert service.filters == [restrict_ssh_access.SWEEP_FILTER]
+
+
+class FailingSweeps:
+    def __init__(self, error):
+        self.error = error
+
+    def sweep(self, service, project_id):
+        raise self.error
+
+
+@pytest.fixture(autouse=True)
+def no_client(monkeypatch):
+    # The sweeps of the tests make no API call
+    monkeypatch.setattr(clients, "get_client", lambda api, version: None)
+
+
+VIOLATION = {"account_id": "project", "resource_id": "projects/project/global/firewalls/rule",
+             "region_name": "global"}
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_sweep_violation_retries_later_on_retryable_errors(status):
+    with pytest.raises(executor.RetryLater):
+        restrict_ssh_access.sweep_violation(VIOLATION, FailingSweeps(http_error(status)))
+
+
+def test_sweep_violation_fails_on_other_errors():
+    with pytest.raises(Exception) as error_info:
+        restrict_ssh_access.sweep_violation(VIOLATION, FailingSweeps(http_error(403)))
+    assert not isinstance(error_info.value, executor.RetryLater)
+    assert isinstance(error_info.value.__cause__, HttpError)
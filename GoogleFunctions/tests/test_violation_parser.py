@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from violation_parser import StreamingArrayParser, ViolationRecord, parse_violations
+
+VIOLATIONS = [
+    {"account_id": "project-1", "account_name": "Project \"one\"", "resource_id": "projects/project-1/rule\\0",
+     "resource_name": "résumé ✓", "rule_name": "rule, with [brackets] and {braces}",
+     "region_name": "us-east1", "status": "failed", "score": 12.5e3, "tags": [{"key": "]}"}, None, True]},
+    {"account_id": "project-2", "account_name": "", "resource_id": "a\nb\tc\u0000", "resource_name": "😀",
+     "rule_name": "rule", "region_name": "global", "count": 1234567890},
+]
+BODY = json.dumps({"status": "success", "meta": {"data": ["not", "this"]}, "data": VIOLATIONS, "after": 1},
+                  ensure_ascii=False, indent=1).encode("utf-8")
+
+
+def chunked(data, size):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 16, 64, len(BODY)])
+def test_items_split_at_every_chunk_boundary(size):
+    assert list(StreamingArrayParser(chunked(BODY, size))) == VIOLATIONS
+
+
+def test_items_split_at_every_offset():
+    # Splits inside the strings, their escapes, the multi-byte UTF-8 characters and the numbers
+    for offset in range(1, len(BODY)):
+        assert list(StreamingArrayParser([BODY[:offset], BODY[offset:]])) == VIOLATIONS, offset
+
+
+def test_text_chunks():
+    text = BODY.decode("utf-8")
+    assert list(StreamingArrayParser(chunked(text, 3))) == VIOLATIONS
+
+
+@pytest.mark.parametrize("chunks, items", [
+    ([b'{"data": [12', b'34, 5', b'6]}'], [1234, 56]),
+    ([b'{"n":true,"data":[1.', b'25, 3]}'], [1.25, 3]),
+    ([b'{"data": [1', b'.', b'5, -', b'2]}'], [1.5, -2]),
+    ([b'{"data": [1e', b'3, 2.5E', b'-2]}'], [1e3, 2.5e-2]),
+    ([b'{"data": [1e+', b'2, 4]}'], [1e2, 4]),
+    ([b'{"ok":1.', b'5,"data":[{"a":1},{"b":[1,2]}]}'], [{"a": 1}, {"b": [1, 2]}]),
+])
+def test_number_at_the_end_of_a_chunk(chunks, items):
+    assert list(StreamingArrayParser(chunks)) == items
+
+
+def test_numbers_split_at_every_offset():
+    body = b'{"ok":1.5,"n":true,"data":[1.25, 3, -0.5e-3, 12E+2, {"x": 6.02e23}]}'
+    for offset in range(1, len(body)):
+        assert list(StreamingArrayParser([body[:offset], body[offset:]])) == [1.25, 3, -0.5e-3, 12e2,
+                                                                             {"x": 6.02e23}], offset
+
+
+@pytest.mark.parametrize("body", [b'{"data": []}', b'{ "data" : [ \n ] }', b'{"status": "success", "data": []}'])
+def test_empty_array(body):
+    assert list(StreamingArrayParser(chunked(body, 1))) == []
+    assert parse_violations([body]) == []
+
+
+def test_missing_array():
+    with pytest.raises(KeyError):
+        list(StreamingArrayParser([b'{"status": "error", "errors": ["Too many requests"]}']))
+
+
+@pytest.mark.parametrize("body", [b'[]', b'{"data": [{"account_id": "a"}', b'{"data": [1 2]}', b'{"data": [1,]}',
+                                  b'{"status": "success" "data": []}'])
+def test_invalid_json(body):
+    with pytest.raises(ValueError):
+        list(StreamingArrayParser(chunked(body, 4)))
+
+
+def test_parse_violations_projects_the_used_fields():
+    violations = parse_violations(chunked(BODY, 10))
+
+    assert all(isinstance(violation, ViolationRecord) for violation in violations)
+    assert violations[0]["account_name"] == 'Project "one"'
+    assert violations[0].resource_id == "projects/project-1/rule\\0"
+    assert violations[1]["resource_name"] == "\U0001F600"
+    assert not hasattr(violations[0], "status")
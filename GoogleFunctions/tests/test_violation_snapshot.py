@@ -0,0 +1,49 @@
+import sqlite3
+
+import pytest
+
+import violation_snapshot
+
+
+@pytest.fixture
+def store(tmp_path):
+    return violation_snapshot.SQLiteSnapshotStore(str(tmp_path / "snapshots.db"))
+
+
+def test_sqlite_store_round_trip_by_key(store):
+    store.save("tenant/us-east1|rule", {("project", "resource-1"): 1.5, ("project", "resource-2"): 2.5})
+    store.save("tenant/europe-west1|rule", {("project", "resource-3"): 3.5})
+
+    assert store.load("tenant/us-east1|rule") == {("project", "resource-1"): 1.5, ("project", "resource-2"): 2.5}
+    assert store.load("tenant/europe-west1|rule") == {("project", "resource-3"): 3.5}
+    assert store.load("tenant/asia-east1|rule") == {}
+
+
+def test_sqlite_store_save_replaces_the_snapshot(store):
+    store.save("key", {("project", "resource-1"): 1.0})
+    store.save("key", {("project", "resource-2"): 2.0})
+
+    assert store.load("key") == {("project", "resource-2"): 2.0}
+
+
+def test_sqlite_store_closes_its_connections(store, monkeypatch):
+    connections = []
+    connect = store.connect
+    monkeypatch.setattr(store, "connect", lambda: connections.append(connect()) or connections[-1])
+
+    store.save("key", {("project", "resource"): 1.0})
+    store.load("key")
+
+    assert len(connections) == 2
+    for connection in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            connection.execute("SELECT 1")
+
+
+def test_snapshot_scoped_by_tenant_and_region(store):
+    snapshot = violation_snapshot.ViolationSnapshot(store, "rule", "tenant/us-east1")
+    assert snapshot.is_due("project", "resource")
+    snapshot.save()
+
+    assert violation_snapshot.ViolationSnapshot(store, "rule", "tenant/europe-west1").is_due("project", "resource")
+    assert not violation_snapshot.ViolationSnapshot(store, "rule", "tenant/us-east1").is_due("project", "resource")
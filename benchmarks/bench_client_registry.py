@@ -0,0 +1,66 @@
+"""
+Micro-benchmark of the per-violation Google API client overhead of the remediation functions:
+a discovery.build per violation against the client registry of GoogleFunctions/common/clients.py.
+
+The clients are built from the discovery documents bundled with google-api-python-client, so no network access
+or Google credentials are needed.
+
+Usage: python benchmarks/bench_client_registry.py [--violations 200] [--api compute] [--version v1]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "GoogleFunctions"))
+
+from google.auth.credentials import AnonymousCredentials  # noqa: E402
+from googleapiclient import discovery  # noqa: E402
+from common import clients  # noqa: E402
+
+
+def build_per_violation(api, version, credentials):
+    return discovery.build(api, version, credentials=credentials, cache_discovery=False)
+
+
+def build_from_registry(api, version, credentials):
+    return clients.get_client(api, version, credentials=credentials)
+
+
+def measure(get_service, api, version, violations):
+    """
+    Return the total and the mean time to get the client of every violation of a message
+    """
+    credentials = AnonymousCredentials()
+    start = time.perf_counter()
+    for _ in range(violations):
+        get_service(api, version, credentials)
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed / violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--violations", type=int, default=200, help="Violations per message")
+    parser.add_argument("--api", default="compute", help="Google API of the client")
+    parser.add_argument("--version", default="v1", help="Version of the Google API")
+    parser.add_argument("--json", dest="json_output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = {"violations": args.violations, "api": args.api, "version": args.version}
+    print(f"{args.violations} violations, {args.api} {args.version} client")
+    print(f"{'client':<12}{'total ms':>10}{'ms/violation':>14}")
+    for name, get_service in (("build", build_per_violation), ("registry", build_from_registry)):
+        clients.clear_clients()
+        elapsed, per_violation = measure(get_service, args.api, args.version, args.violations)
+        results[name] = {"seconds": elapsed, "seconds_per_violation": per_violation}
+        print(f"{name:<12}{elapsed * 1000:>10.1f}{per_violation * 1000:>14.3f}")
+
+    if args.json_output:
+        with open(args.json_output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
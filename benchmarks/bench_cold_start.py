@@ -0,0 +1,98 @@
+"""
+Cold-start benchmark of the Google Cloud Functions: for every handler, in a fresh interpreter, the time to import
+the handler as main.py and the time to build its first Google API clients, once from the discovery documents bundled
+in GoogleFunctions/common/discovery_documents and once from the full documents of google-api-python-client.
+
+The clients are built with anonymous credentials, so no network access or Google credentials are needed.
+
+Usage: python benchmarks/bench_cold_start.py [--repeat 5] [--function DefaultVPCNetworkRemediationFunction]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+FUNCTIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "GoogleFunctions")
+
+# Google APIs called by every function
+FUNCTION_APIS = {
+    "CloudAuditLoggingRemediationFunction": [("cloudresourcemanager", "v3")],
+    "CloudSQLInstancePublicNetworkRemediationFunction": [("sqladmin", "v1")],
+    "CloudSQLInstanceSSLConnectionRemediationFunction": [("sqladmin", "v1")],
+    "DefaultVPCNetworkRemediationFunction": [("compute", "v1")],
+    "GetNetskopeSecurityPostureAssesmentFunction": [("secretmanager", "v1")],
+    "KubernetesStackDriverLoggingRemediationFunction": [("container", "v1")],
+    "RemediationDispatcherFunction": [("compute", "v1")],
+    "RestrictSSHAccessRemediationFunction": [("compute", "v1")],
+    "ServiceAccountAdminPrivilegesRemediationFunction": [("cloudresourcemanager", "v3")],
+    "ServiceAccountRoleRemediationFunction": [("cloudresourcemanager", "v3")],
+    "StorageBucketPublicAccessRemediationFunction": [("storage", "v1")],
+    "UserManagedKeyRotationRemediationFunction": [("iam", "v1")],
+    "VMInstanceBlockProjectWideSSHKeysRemediationFunction": [("compute", "v1")],
+    "VPCFlowlogEnableRemediationFunction": [("compute", "v1")],
+}
+
+# Run in a fresh interpreter per measurement: import the handler the way the Cloud Functions runtime imports main.py,
+# then build the clients of the function
+COLD_START = """
+import importlib.util, json, os, sys, time
+function_dir, discovery, apis = sys.argv[1], sys.argv[2], json.loads(sys.argv[3])
+sys.path[:0] = [function_dir, os.path.dirname(function_dir)]
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("main", os.path.join(function_dir, "google_function_handler.py"))
+main = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(main)
+imported = time.perf_counter()
+from common import clients
+if discovery == "library":
+    clients.DISCOVERY_DOCUMENTS_DIR = os.path.join(function_dir, "no-discovery-documents")
+from google.auth.credentials import AnonymousCredentials
+credentials = AnonymousCredentials()
+for api, version in apis:
+    clients.get_client(api, version, credentials=credentials)
+built = time.perf_counter()
+print(json.dumps({"import": imported - start, "first_client": built - imported}))
+"""
+
+
+def measure(function_name, discovery, repeat):
+    """
+    Return the median import and first client times of the function over repeat fresh interpreters
+    """
+    function_dir = os.path.abspath(os.path.join(FUNCTIONS_DIR, function_name))
+    samples = []
+    for _ in range(repeat):
+        process = subprocess.run([sys.executable, "-c", COLD_START, function_dir, discovery,
+                                  json.dumps(FUNCTION_APIS[function_name])], capture_output=True, text=True)
+        if process.returncode:
+            raise SystemExit(f"Cold start of {function_name} failed:\n{process.stderr}")
+        samples.append(json.loads(process.stdout.strip().splitlines()[-1]))
+    return {key: statistics.median(sample[key] for sample in samples) for key in ("import", "first_client")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--function", action="append", choices=sorted(FUNCTION_APIS),
+                        help="Function to measure, all of them by default")
+    parser.add_argument("--json", dest="json_output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'function':<52}{'import ms':>11}{'client ms':>11}{'library ms':>12}")
+    for function_name in args.function or sorted(FUNCTION_APIS):
+        bundled = measure(function_name, "bundled", args.repeat)
+        library = measure(function_name, "library", args.repeat)
+        results[function_name] = {"bundled": bundled, "library": library}
+        print(f"{function_name:<52}{bundled['import'] * 1000:>11.1f}{bundled['first_client'] * 1000:>11.1f}"
+              f"{library['first_client'] * 1000:>12.1f}")
+
+    if args.json_output:
+        with open(args.json_output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
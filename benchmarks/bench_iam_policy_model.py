@@ -0,0 +1,135 @@
+"""
+Micro-benchmark of the IAM policy edits of the ServiceAccountRole and ServiceAccountAdminPrivileges remediation
+functions on a synthetic policy: the former scan of the bindings list per violation (role_name in str(bindings) and
+a linear rescan of the members) against the indexed IamPolicy of GoogleFunctions/common/iam_policy.py.
+
+Usage: python benchmarks/bench_iam_policy_model.py [--members 10000] [--roles 200] [--violations 100]
+"""
+import argparse
+import copy
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "GoogleFunctions"))
+
+from common.iam_policy import IamPolicy  # noqa: E402
+
+SERVICE_ACCOUNT_MEMBER = r"^serviceAccount:.*iam\.gserviceaccount\.com$"
+
+
+def generate_policy(members, roles):
+    """
+    Return a policy of members spread over roles, a quarter of them users and a quarter service accounts
+    """
+    bindings = [{"role": f"roles/custom.role{index}Admin", "members": []} for index in range(roles)]
+    for index in range(members):
+        kind = index % 4
+        if kind == 0:
+            member = f"user:user{index}@example.com"
+        elif kind == 1:
+            member = f"serviceAccount:sa{index}@project.iam.gserviceaccount.com"
+        elif kind == 2:
+            member = f"group:group{index}@example.com"
+        else:
+            member = f"domain:domain{index}.example.com"
+        bindings[index % roles]["members"].append(member)
+    return {"version": 3, "etag": "BwXhqDLyQGk=", "bindings": bindings}
+
+
+def remove_users_scan(bindings, role_name):
+    """
+    Former ServiceAccountRole edit: string scan of the bindings, then linear search of the role
+    """
+    if role_name in str(bindings):
+        for role_binding in bindings:
+            if role_name == role_binding.get("role"):
+                members = [member for member in role_binding.get("members", []) if not member.startswith('user:')]
+                if len(members) == len(role_binding.get("members", [])):
+                    return False
+                if members:
+                    role_binding["members"] = members
+                else:
+                    bindings.remove(role_binding)
+                return True
+    return False
+
+
+def remove_service_accounts_scan(bindings, role_name):
+    """
+    Former ServiceAccountAdminPrivileges edit: linear scan of every binding and member removal from a list
+    """
+    update_policy = False
+    for role_binding in bindings:
+        if role_binding.get("role") == role_name:
+            for member in role_binding["members"].copy():
+                if re.fullmatch(SERVICE_ACCOUNT_MEMBER, member):
+                    role_binding["members"].remove(member)
+                    update_policy = True
+    return update_policy
+
+
+def run_scan(policy, role_names):
+    bindings = policy["bindings"]
+    for role_name in role_names:
+        remove_users_scan(bindings, role_name)
+        remove_service_accounts_scan(bindings, role_name)
+    return policy
+
+
+def run_indexed(policy, role_names):
+    model = IamPolicy(policy)
+    service_account_member = re.compile(SERVICE_ACCOUNT_MEMBER)
+    for role_name in role_names:
+        if model.has_role(role_name):
+            model.remove_members_with_prefix(role_name, "user:")
+            model.remove_members(role_name, service_account_member.fullmatch)
+    return model.to_policy()
+
+
+def measure(run, policy, role_names, repeat):
+    elapsed = 0.0
+    for _ in range(repeat):
+        working_copy = copy.deepcopy(policy)
+        start = time.perf_counter()
+        result = run(working_copy, role_names)
+        elapsed += time.perf_counter() - start
+    return elapsed / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=10000, help="Members of the policy")
+    parser.add_argument("--roles", type=int, default=200, help="Role bindings of the policy")
+    parser.add_argument("--violations", type=int, default=100, help="Violations of the message on the policy")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement")
+    parser.add_argument("--json", dest="json_output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    policy = generate_policy(args.members, args.roles)
+    role_names = [f"roles/custom.role{index % args.roles}Admin" for index in range(args.violations)]
+    results = {"members": args.members, "roles": args.roles, "violations": args.violations}
+    print(f"Policy of {args.members} members in {args.roles} bindings, {args.violations} violations")
+    print(f"{'model':<10}{'total ms':>10}{'ms/violation':>14}")
+    outputs = {}
+    for name, run in (("scan", run_scan), ("indexed", run_indexed)):
+        elapsed, outputs[name] = measure(run, policy, role_names, args.repeat)
+        results[name] = {"seconds": elapsed, "seconds_per_violation": elapsed / args.violations}
+        print(f"{name:<10}{elapsed * 1000:>10.2f}{elapsed * 1000 / args.violations:>14.3f}")
+
+    # Both models remove the same members, the scan keeps the bindings emptied of service accounts
+    scan_bindings = {binding["role"]: binding["members"] for binding in outputs["scan"]["bindings"]
+                     if binding["members"]}
+    indexed_bindings = {binding["role"]: binding["members"] for binding in outputs["indexed"]["bindings"]}
+    if scan_bindings != indexed_bindings:
+        raise SystemExit("The indexed model and the scan produced different policies")
+
+    if args.json_output:
+        with open(args.json_output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Load benchmark of the functions against the local fake APIs of benchmarks/fake_apis.py: for every rule, N synthetic
+violations over M projects and R regions are served by the fake Netskope API, fetched and published by the
+GetNetskopeSecurityPostureAssesmentFunction in router mode, then the published messages are remediated by the
+remediation function of the rule against the fake Google APIs.
+
+Every function runs in a fresh interpreter, which gives its own peak RSS. The Pub/Sub publisher of the fetcher is
+replaced by an in-memory one whose messages are handed to the remediation function. Reported per function:
+violations per second, Google and Netskope API calls per violation (the requests of a batch counted one by one),
+HTTP requests per violation, p50 and p99 of the remediation time of a violation, and peak RSS.
+
+The environment variables of the functions (STREAM_PUBLISH, PUBLISH_SHARDING, REMEDIATION_CONCURRENCY, ...) are
+passed on to them, so that configurations can be compared. Save the results with --json to compare commits.
+
+Usage: python benchmarks/bench_violation_load.py [--violations 1000] [--projects 20] [--regions 3]
+       [--rule CIS-1-0-0-3-6] [--latency 0.02] [--throttle-rate 0.01] [--json results.json]
+"""
+import argparse
+import base64
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+FUNCTIONS_DIR = os.path.join(BENCHMARKS_DIR, os.pardir, "GoogleFunctions")
+FETCHER_DIR = os.path.join(FUNCTIONS_DIR, "GetNetskopeSecurityPostureAssesmentFunction")
+
+sys.path[:0] = [BENCHMARKS_DIR, FUNCTIONS_DIR]
+
+from common.remediations import RULE_MODULES  # noqa: E402
+from fake_apis import FakeApiServer, generate_violations  # noqa: E402
+
+# Regions of the violations, with a location reported by Netskope which routes to this region only
+REGION_NAMES = {
+    "us-east1": "Moncks Corner, South Carolina, USA",
+    "europe-west1": "St. Ghislain, Belgium",
+    "asia-east1": "Changhua County, Taiwan",
+    "us-central1": "Council Bluffs, Iowa, USA",
+    "europe-west2": "London, England, UK",
+    "asia-south1": "Mumbai, India",
+    "us-west1": "The Dalles, Oregon, USA",
+    "southamerica-east1": "Sao Paulo, Brazil",
+}
+
+
+class MemoryPublisher:
+    """
+    Pub/Sub publisher client of the fetcher keeping the published messages in memory
+    """
+
+    def __init__(self):
+        self.messages = []
+
+    @staticmethod
+    def topic_path(project, topic):
+        return f"projects/{project}/topics/{topic}"
+
+    def publish(self, topic_path, data, ordering_key="", **attributes):
+        self.messages.append({"topic": topic_path, "data": base64.b64encode(data).decode(),
+                              "attributes": attributes})
+        future = Future()
+        future.set_result(str(len(self.messages)))
+        return future
+
+
+def percentile(values, fraction):
+    """
+    Return the nearest-rank percentile of the sorted values, None if there are none
+    """
+    if not values:
+        return None
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+def get_peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_fetch(rule_id):
+    """
+    Fetch and publish the violations of the rule in this interpreter, return the stage results and the messages
+    """
+    sys.path.insert(0, FETCHER_DIR)
+    import google_function_handler as fetcher
+    from common import envelope
+
+    publisher = MemoryPublisher()
+    fetcher._publisher_client = publisher
+    start = time.perf_counter()
+    fetcher.google_cloud_function_handler({"attributes": {"rule_name": rule_id, "rule_short_name": rule_id}}, None)
+    seconds = time.perf_counter() - start
+
+    violations = sum(len(envelope.decode_violations(message)) for message in publisher.messages)
+    return {"seconds": seconds, "violations": violations, "failed": 0, "messages": len(publisher.messages),
+            "peak_rss_mb": get_peak_rss_mb()}, publisher.messages
+
+
+def run_remediation(rule_id, messages):
+    """
+    Remediate the messages with the remediation of the rule in this interpreter, return the stage results
+    """
+    from common import executor
+    from common.remediations import get_rule_module
+
+    # Keep the summaries of the messages for the per-violation remediation times
+    summaries = []
+
+    class RecordingSummary(executor.RemediationSummary):
+        def __init__(self):
+            super().__init__()
+            summaries.append(self)
+
+    executor.RemediationSummary = RecordingSummary
+    module = get_rule_module(rule_id)
+    failed_messages = 0
+    start = time.perf_counter()
+    for message in messages:
+        try:
+            module.google_cloud_function_handler({"data": message["data"], "attributes": message["attributes"]},
+                                                 None)
+        except Exception as error:
+            failed_messages += 1
+            print(f"Message of {message['topic']} failed: {error}", file=sys.stderr)
+    seconds = time.perf_counter() - start
+
+    latencies = sorted(outcome.seconds for summary in summaries for outcome in summary.outcomes)
+    return {"seconds": seconds, "violations": len(latencies),
+            "failed": sum(len(summary.failures) for summary in summaries), "failed_messages": failed_messages,
+            "messages": len(messages), "p50_seconds": percentile(latencies, 0.5),
+            "p99_seconds": percentile(latencies, 0.99), "peak_rss_mb": get_peak_rss_mb()}
+
+
+def run_stage_process(stage, rule_id, env, server, messages=None):
+    """
+    Run a stage in a fresh interpreter and return its results with the API calls it made to the server
+    """
+    requests_before = Counter(server.state.requests)
+    process = subprocess.run([sys.executable, os.path.abspath(__file__), "--stage", stage, "--rule", rule_id],
+                             input=json.dumps(messages or []), capture_output=True, text=True, env=env)
+    if process.returncode:
+        raise SystemExit(f"The {stage} of {rule_id} failed:\n{process.stderr}")
+    output = json.loads(process.stdout.strip().splitlines()[-1])
+
+    requests = Counter(server.state.requests)
+    requests.subtract(requests_before)
+    results = output["results"]
+    violations = max(results["violations"], 1)
+    api_calls = sum(requests.values()) - requests["batch"] - requests["batch.calls"]
+    results["api_calls_per_violation"] = api_calls / violations
+    results["http_requests_per_violation"] = (api_calls - requests["batch.calls"] + requests["batch"]) / violations
+    results["violations_per_second"] = results["violations"] / results["seconds"] if results["seconds"] else None
+    results["api_calls"] = {name: count for name, count in requests.items() if count}
+    return results, output.get("messages")
+
+
+def run_stage(stage, rule_id):
+    """
+    Entry point of the fresh interpreter running a stage, messages are read from stdin and results written to stdout
+    """
+    if stage == "fetch":
+        results, messages = run_fetch(rule_id)
+    else:
+        results, messages = run_remediation(rule_id, json.load(sys.stdin)), None
+    print(json.dumps({"results": results, "messages": messages}))
+
+
+def get_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BENCHMARKS_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--violations", type=int, default=1000, help="Violations per rule")
+    parser.add_argument("--projects", type=int, default=20, help="Projects of the violations")
+    parser.add_argument("--regions", type=int, default=3, choices=range(1, len(REGION_NAMES) + 1),
+                        help="Regions of the violations")
+    parser.add_argument("--rule", action="append", choices=sorted(RULE_MODULES),
+                        help="Rule to run, all of them by default")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every fake API response")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Rate of 429 responses of the fake APIs")
+    parser.add_argument("--operation-seconds", type=float, default=0.0, help="Duration of the fake operations")
+    parser.add_argument("--json", dest="json_output", help="Write the results to this JSON file")
+    parser.add_argument("--stage", choices=("fetch", "remediation"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage:
+        return run_stage(args.stage, args.rule[0])
+
+    rule_ids = args.rule or sorted(RULE_MODULES)
+    regions = dict(list(REGION_NAMES.items())[:args.regions])
+    violations = {rule_id: generate_violations(rule_id, rule_id, args.violations, args.projects, regions)
+                  for rule_id in rule_ids}
+    server = FakeApiServer(latency=args.latency, throttle_rate=args.throttle_rate,
+                           operation_seconds=args.operation_seconds, violations=violations)
+    env = dict(os.environ, **server.environ())
+    env.update({"GCP_PROJECT": "benchmark", "FUNCTION_REGION": next(iter(regions)), "ROUTER_MODE": "true",
+                "ROUTER_REGIONS": ",".join(regions), "OPERATION_POLL_INITIAL_DELAY": "0.1"})
+    env.setdefault("LOGLEVEL", "WARNING")
+
+    results = {"commit": get_commit(), "violations": args.violations, "projects": args.projects,
+               "regions": list(regions), "latency": args.latency, "throttle_rate": args.throttle_rate,
+               "operation_seconds": args.operation_seconds, "rules": {}}
+    print(f"{args.violations} violations per rule over {args.projects} projects and {len(regions)} regions")
+    print(f"{'function':<48}{'viol/s':>10}{'calls/viol':>12}{'http/viol':>11}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'RSS MB':>8}")
+    with server:
+        for rule_id in rule_ids:
+            fetch, messages = run_stage_process("fetch", rule_id, env, server)
+            remediation, _ = run_stage_process("remediation", rule_id, env, server, messages)
+            results["rules"][rule_id] = {"fetch": fetch, "remediation": remediation}
+            for name, stage in ((f"fetcher {rule_id}", fetch), (RULE_MODULES[rule_id], remediation)):
+                print(f"{name:<48}{stage['violations_per_second'] or 0:>10.1f}"
+                      f"{stage['api_calls_per_violation']:>12.2f}{stage['http_requests_per_violation']:>11.2f}"
+                      f"{format_ms(stage.get('p50_seconds')):>9}{format_ms(stage.get('p99_seconds')):>9}"
+                      f"{stage['peak_rss_mb']:>8.1f}")
+            if remediation["failed"]:
+                print(f"  {remediation['failed']} of {remediation['violations']} violations failed")
+
+    if args.json_output:
+        with open(args.json_output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Micro-benchmark of the Netskope violation page parsing of the GetNetskopeSecurityPostureAssesmentFunction:
+the current response.json()["data"] path against the streaming parser with field projection (STREAM_PARSE).
+
+Usage: python benchmarks/bench_violation_parsing.py [--page-size 1000] [--repeat 20]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "GoogleFunctions",
+                                "GetNetskopeSecurityPostureAssesmentFunction"))
+
+from violation_parser import parse_violations  # noqa: E402
+
+CHUNK_SIZE = 64 * 1024
+
+
+def generate_page(page_size):
+    """
+    Return the body of a Netskope security_assessment response with page_size violations
+    """
+    violations = []
+    for index in range(page_size):
+        project_id = f"project-{index % 50}"
+        violations.append({
+            "account_id": project_id,
+            "account_name": f"Project {index % 50}",
+            "cloud_provider": "googlecloud",
+            "compliance_standard": "CIS-GCPFND-1.0.0",
+            "last_detected": "2022-03-04 10:20:00",
+            "muted": "No",
+            "policy": "CIS GCP Foundations",
+            "profile_name": "Default Profile",
+            "region_name": "US",
+            "resource_category": "SqlInstance",
+            "resource_id": f"//cloudsql.googleapis.com/projects/{project_id}/instances/sqlInstances/db-{index}",
+            "resource_name": f"db-{index}",
+            "rule_name": "Ensure that Cloud SQL database instance requires all incoming connections to use SSL",
+            "status": "Failed",
+            "violation_details": {"requireSsl": False, "settings": {"ipConfiguration": {"ipv4Enabled": True}}},
+        })
+    return json.dumps({"status": "success", "msg": "", "data": violations}).encode("utf-8")
+
+
+def parse_full(body):
+    return json.loads(body.decode("utf-8"))["data"]
+
+
+def parse_streaming(body):
+    return parse_violations(body[offset:offset + CHUNK_SIZE] for offset in range(0, len(body), CHUNK_SIZE))
+
+
+def measure(parse, body, repeat):
+    """
+    Return the mean parse time and the peak memory allocated while parsing and holding one page
+    """
+    parse(body)
+    gc.collect()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse(body)
+    elapsed = (time.perf_counter() - start) / repeat
+
+    gc.collect()
+    tracemalloc.start()
+    page = parse(body)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del page
+    return elapsed, peak, retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=1000, help="Violations per page")
+    parser.add_argument("--repeat", type=int, default=20, help="Parses per measurement")
+    parser.add_argument("--json", dest="json_output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    body = generate_page(args.page_size)
+    results = {"page_size": args.page_size, "page_bytes": len(body)}
+    print(f"Page of {args.page_size} violations, {len(body) / 1024:.0f} KiB")
+    print(f"{'parser':<12}{'ms/page':>10}{'peak KiB':>12}{'held KiB':>12}")
+    for name, parse in (("json", parse_full), ("streaming", parse_streaming)):
+        elapsed, peak, retained = measure(parse, body, args.repeat)
+        results[name] = {"seconds_per_page": elapsed, "peak_bytes": peak, "retained_bytes": retained}
+        print(f"{name:<12}{elapsed * 1000:>10.2f}{peak / 1024:>12.0f}{retained / 1024:>12.0f}")
+
+    if args.json_output:
+        with open(args.json_output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
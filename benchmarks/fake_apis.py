@@ -0,0 +1,712 @@
+"""
+Local stand-in of the Netskope security assessment API and of the Google APIs called by the functions, to measure
+the fetcher and the remediation functions without a Netskope tenant or Google Cloud projects.
+
+The server runs in a background thread of the benchmark, or on its own with the command below. It serves:
+- /netskope/api/v1/security_assessment, paging the violations given for each rule name
+- /<api>/... for compute, sqladmin, storage, iam, container, cloudresourcemanager, secretmanager and the pubsub
+  publish method, including their HTTP batch endpoints and long-running operations
+
+Resources are created on first read in the non-compliant state of their rule, and the remediations change them like
+the Google APIs do, so that a second run finds them compliant. Every request can be delayed by a latency and fail with
+a configurable rate of 429 rateLimitExceeded, 409 operationInProgress (Cloud SQL updates) and 400 resourceNotReady
+(compute updates). Operations are DONE operation_seconds after they were started.
+
+The functions are pointed at the server with the GOOGLE_API_ROOT_URL and NETSKOPE_API_BASE_URL environment variables
+returned by FakeApiServer.environ, which must be set before the function modules are imported.
+
+Usage: python benchmarks/fake_apis.py [--port 8089] [--latency 0.05] [--throttle-rate 0.01] [--operation-seconds 2]
+"""
+import argparse
+import base64
+import email
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+# Resource IDs of the violations of every rule as reported by Netskope, by rule ID
+RESOURCE_TEMPLATES = {
+    "CIS-1-0-0-1-4": "projects/{project}/{admin_role}",
+    "CIS-1-0-0-1-6": "projects/{project}/serviceAccounts/sa-{index}@{project}.iam.gserviceaccount.com",
+    "CIS-1-0-0-2-1": "projects/{project}",
+    "CIS-1-0-0-3-1": "projects/{project}/global/networks/default",
+    "CIS-1-0-0-3-6": "projects/{project}/global/firewalls/allow-ssh-{index}",
+    "CIS-1-0-0-3-9": "projects/{project}/global/networks/vpc-{index}",
+    "CIS-1-0-0-4-2": "projects/{project}/zones/{zone}/instances/vm-{index}",
+    "CIS-1-0-0-5-1": "buckets/bucket-{index}",
+    "CIS-1-0-0-6-1": "projects/{project}/sqlInstances/sql-{index}",
+    "CIS-1-0-0-6-2": "projects/{project}/sqlInstances/sql-{index}",
+    "CIS-1-0-0-7-1": "projects/{project}/locations/{region}/clusters/gke-{index}",
+    "CIS-1-2-0-1-6": "projects/{project}/{user_role}",
+}
+
+ADMIN_ROLES = ("roles/editor", "roles/owner", "roles/compute.instanceAdmin")
+USER_ROLES = ("roles/iam.serviceAccountUser", "roles/iam.serviceAccountTokenCreator")
+
+
+def generate_violations(rule_id, rule_name, count, projects=10, regions=None):
+    """
+    Return count violations of the rule spread over projects and regions, in the format of the Netskope API
+    :param rule_id: Rule ID, see RESOURCE_TEMPLATES
+    :param rule_name: Rule name of the violations
+    :param count: Number of violations
+    :param projects: Number of projects of the violations
+    :param regions: Regions of the violations as {GCP region: region name reported by Netskope}, us-east1 reported
+     as global by default
+    """
+    regions = list((regions or {"us-east1": "global"}).items())
+    violations = []
+    for index in range(count):
+        project = f"project-{index % projects}"
+        region, region_name = regions[index // projects % len(regions)]
+        resource_id = RESOURCE_TEMPLATES[rule_id].format(
+            project=project, index=index, region=region, zone=f"{region}-b",
+            admin_role=ADMIN_ROLES[index // projects % len(ADMIN_ROLES)],
+            user_role=USER_ROLES[index // projects % len(USER_ROLES)])
+        violations.append({"account_id": project, "account_name": project, "resource_id": resource_id,
+                           "resource_name": resource_id.split("/")[-1], "rule_name": rule_name,
+                           "region_name": region_name})
+    return violations
+
+
+class FakeApiError(Exception):
+    """
+    Error response of the fake APIs, in the format of the Google APIs
+    """
+
+    def __init__(self, code, reason, message, status=None):
+        super().__init__(message)
+        self.code = code
+        self.body = {"error": {"code": code, "message": message, "status": status or reason.upper(),
+                               "errors": [{"reason": reason, "message": message, "domain": "global"}]}}
+
+
+def not_found(path):
+    return FakeApiError(404, "notFound", f"The resource '{path}' was not found", "NOT_FOUND")
+
+
+class FakeApiState:
+    """
+    Resources and operations of the fake Google APIs, with the latency and the error injection
+    """
+
+    def __init__(self, latency=0.0, latency_jitter=0.0, throttle_rate=0.0, in_progress_rate=0.0, not_ready_rate=0.0,
+                 operation_seconds=0.0, subnets_per_network=2,
+                 subnet_regions=("us-east1", "europe-west1", "asia-east1"), unreported_firewalls=2, violations=None,
+                 secrets=None, seed=0):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.throttle_rate = throttle_rate
+        self.in_progress_rate = in_progress_rate
+        self.not_ready_rate = not_ready_rate
+        self.operation_seconds = operation_seconds
+        self.subnets_per_network = subnets_per_network
+        # Regions of the subnets of a network listed by subnetworks.aggregatedList
+        self.subnet_regions = subnet_regions
+        # Firewall rules of every project open to SSH from the internet which are not reported by Netskope, only
+        # found by firewalls.list
+        self.unreported_firewalls = unreported_firewalls
+        # {rule_name: [violation]} served by the Netskope API
+        self.violations = violations or {}
+        self.secrets = secrets or {"NetskopeTenantFQDN": "fake.goskope.com", "NetskopeAPIToken": "fake-token"}
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+        self.resources = {}
+        self.objects = {}
+        # {topic: [message]} published on the Pub/Sub REST API
+        self.published = {}
+        # {operation name: (api, done time, error)}
+        self.operations = {}
+        self.operation_ids = itertools.count(1)
+        self.requests = Counter()
+        self.errors = Counter()
+
+    def delay(self):
+        if self.latency or self.latency_jitter:
+            with self.lock:
+                jitter = self.random.uniform(0, self.latency_jitter)
+            time.sleep(self.latency + jitter)
+
+    def draw(self, rate):
+        if not rate:
+            return False
+        with self.lock:
+            return self.random.random() < rate
+
+    def inject_errors(self, route, mutation):
+        """
+        Raise the injected error of the request, if any
+        :param route: Name of the route of the request
+        :param mutation: True for the requests changing a resource
+        """
+        if self.draw(self.throttle_rate):
+            self.errors["rateLimitExceeded"] += 1
+            raise FakeApiError(429, "rateLimitExceeded", "Rate Limit Exceeded", "RESOURCE_EXHAUSTED")
+        if mutation and route.startswith("sqladmin.") and self.draw(self.in_progress_rate):
+            self.errors["operationInProgress"] += 1
+            raise FakeApiError(409, "operationInProgress", "Operation failed because another operation was already "
+                                                           "in progress.", "CONFLICT")
+        if mutation and route.startswith("compute.") and self.draw(self.not_ready_rate):
+            self.errors["resourceNotReady"] += 1
+            raise FakeApiError(400, "resourceNotReady", "The resource is not ready", "FAILED_PRECONDITION")
+
+    def get_resource(self, key, create):
+        """
+        Return the resource stored under key, created with create() on first use
+        """
+        with self.lock:
+            resource = self.resources.get(key)
+            if resource is None:
+                resource = self.resources[key] = create()
+            return resource
+
+    def start_operation(self, api, target, error=None):
+        """
+        Start an operation on target and return its name
+        """
+        with self.lock:
+            name = f"operation-{next(self.operation_ids)}"
+            self.operations[name] = (api, time.monotonic() + self.operation_seconds, target, error)
+            return name
+
+    def get_operation(self, name, wait=False):
+        """
+        Return the status and target of the operation, waiting for it to be done up to 2 minutes if wait is True
+        """
+        with self.lock:
+            if name not in self.operations:
+                raise not_found(f"operations/{name}")
+            api, done_at, target, error = self.operations[name]
+        if wait:
+            time.sleep(min(max(done_at - time.monotonic(), 0), 120))
+        return api, time.monotonic() >= done_at, target, error
+
+
+class FakeApis:
+    """
+    Routes of the fake Google APIs, every route returning (status, body)
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self.routes = [
+            ("compute.instances.get", "GET", r"compute/compute/v1/projects/([^/]+)/zones/([^/]+)/instances/([^/]+)"),
+            ("compute.instances.setMetadata", "POST",
+             r"compute/compute/v1/projects/([^/]+)/zones/([^/]+)/instances/([^/]+)/setMetadata"),
+            ("compute.firewalls.list", "GET", r"compute/compute/v1/projects/([^/]+)/global/firewalls"),
+            ("compute.firewalls.get", "GET", r"compute/compute/v1/projects/([^/]+)/global/firewalls/([^/]+)"),
+            ("compute.firewalls.patch", "PATCH", r"compute/compute/v1/projects/([^/]+)/global/firewalls/([^/]+)"),
+            ("compute.firewalls.delete", "DELETE", r"compute/compute/v1/projects/([^/]+)/global/firewalls/([^/]+)"),
+            ("compute.networks.get", "GET", r"compute/compute/v1/projects/([^/]+)/global/networks/([^/]+)"),
+            ("compute.networks.delete", "DELETE", r"compute/compute/v1/projects/([^/]+)/global/networks/([^/]+)"),
+            ("compute.subnetworks.list", "GET", r"compute/compute/v1/projects/([^/]+)/regions/([^/]+)/subnetworks"),
+            ("compute.subnetworks.aggregatedList", "GET",
+             r"compute/compute/v1/projects/([^/]+)/aggregated/subnetworks"),
+            ("compute.subnetworks.patch", "PATCH",
+             r"compute/compute/v1/projects/([^/]+)/regions/([^/]+)/subnetworks/([^/]+)"),
+            ("compute.operations.wait", "POST",
+             r"compute/compute/v1/projects/([^/]+)/(?:global|regions/[^/]+|zones/[^/]+)/operations/([^/]+)/wait"),
+            ("sqladmin.instances.get", "GET", r"sqladmin/v1/projects/([^/]+)/instances/([^/]+)"),
+            ("sqladmin.instances.patch", "PATCH", r"sqladmin/v1/projects/([^/]+)/instances/([^/]+)"),
+            ("sqladmin.operations.get", "GET", r"sqladmin/v1/projects/([^/]+)/operations/([^/]+)"),
+            ("storage.buckets.getIamPolicy", "GET", r"storage/storage/v1/b/([^/]+)/iam"),
+            ("storage.buckets.setIamPolicy", "PUT", r"storage/storage/v1/b/([^/]+)/iam"),
+            ("storage.objects.get", "GET", r"storage/storage/v1/b/([^/]+)/o/([^/]+)"),
+            ("storage.objects.insert", "POST", r"storage/upload/storage/v1/b/([^/]+)/o"),
+            ("iam.keys.list", "GET", r"iam/v1/(projects/[^/]+/serviceAccounts/[^/]+)/keys"),
+            ("iam.keys.disable", "POST", r"iam/v1/(projects/[^/]+/serviceAccounts/[^/]+/keys/[^/:]+):disable"),
+            ("container.clusters.get", "GET", r"container/v1/(projects/[^/]+/locations/[^/]+/clusters/[^/:]+)"),
+            ("container.clusters.setLogging", "POST",
+             r"container/v1/(projects/[^/]+/locations/[^/]+/clusters/[^/:]+):setLogging"),
+            ("container.operations.get", "GET", r"container/v1/(projects/[^/]+/locations/[^/]+/operations/[^/:]+)"),
+            ("cloudresourcemanager.projects.getIamPolicy", "POST",
+             r"cloudresourcemanager/v3/projects/([^/:]+):getIamPolicy"),
+            ("cloudresourcemanager.projects.setIamPolicy", "POST",
+             r"cloudresourcemanager/v3/projects/([^/:]+):setIamPolicy"),
+            ("secretmanager.versions.access", "GET",
+             r"secretmanager/v1/projects/[^/]+/secrets/([^/]+)/versions/[^/:]+:access"),
+            ("pubsub.topics.publish", "POST", r"pubsub/v1/(projects/[^/]+/topics/[^/:]+):publish"),
+        ]
+        self.routes = [(name, method, re.compile(pattern)) for name, method, pattern in self.routes]
+
+    def handle(self, method, path, query, body):
+        """
+        Return the (status, body) response of a request of the Google APIs
+        :param method: HTTP method
+        :param path: Path of the request without the leading slash
+        :param query: Query parameters as {name: value}
+        :param body: Request body bytes
+        """
+        for name, route_method, pattern in self.routes:
+            match = pattern.fullmatch(path)
+            if match and route_method == method:
+                self.state.requests[name] += 1
+                try:
+                    self.state.inject_errors(name, method != "GET" and not name.endswith(("wait", "getIamPolicy")))
+                    handler = getattr(self, name.split(".", 1)[1].replace(".", "_") + "_" + name.split(".")[0])
+                    return handler(*[unquote(group) for group in match.groups()], query=query, body=body)
+                except FakeApiError as error:
+                    return error.code, error.body
+        self.state.requests["notFound"] += 1
+        return 404, not_found(path).body
+
+    @staticmethod
+    def json_body(body):
+        return json.loads(body or b"{}")
+
+    def compute_operation(self, target, kind="compute#operation"):
+        return {"kind": kind, "name": self.state.start_operation("compute", target), "status": "RUNNING",
+                "targetLink": target}
+
+    # Compute Engine
+
+    def instances_get_compute(self, project, zone, instance, **_):
+        key = f"compute/projects/{project}/zones/{zone}/instances/{instance}"
+        resource = self.state.get_resource(key, lambda: {
+            "kind": "compute#instance", "name": instance, "zone": zone, "status": "RUNNING",
+            "metadata": {"kind": "compute#metadata", "fingerprint": "fp-0",
+                         "items": [{"key": "block-project-ssh-keys", "value": "false"}]}})
+        return 200, resource
+
+    def instances_setMetadata_compute(self, project, zone, instance, body, **_):
+        status, resource = self.instances_get_compute(project, zone, instance)
+        metadata = self.json_body(body)
+        with self.state.lock:
+            if metadata.get("fingerprint") != resource["metadata"]["fingerprint"]:
+                raise FakeApiError(412, "conditionNotMet", "Supplied fingerprint does not match current metadata "
+                                                           "fingerprint.", "FAILED_PRECONDITION")
+            fingerprint = int(resource["metadata"]["fingerprint"].split("-")[1]) + 1
+            resource["metadata"] = dict(metadata, fingerprint=f"fp-{fingerprint}")
+        return 200, self.compute_operation(f"projects/{project}/zones/{zone}/instances/{instance}")
+
+    def get_firewall(self, project, firewall):
+        key = f"compute/projects/{project}/global/firewalls/{firewall}"
+        with self.state.lock:
+            if self.state.resources.get(key, {}).get("deleted"):
+                raise not_found(key)
+        return self.state.get_resource(key, lambda: {
+            "kind": "compute#firewall", "name": firewall, "network": f"projects/{project}/global/networks/default",
+            "direction": "INGRESS", "disabled": False, "sourceRanges": ["0.0.0.0/0", "10.0.0.0/8"],
+            "allowed": [{"IPProtocol": "tcp", "ports": ["22"]}]})
+
+    def firewalls_get_compute(self, project, firewall, **_):
+        return 200, self.get_firewall(project, firewall)
+
+    def firewalls_list_compute(self, project, query, **_):
+        # The firewall rules reported by Netskope and the unreported ones, only the direction and disabled filters of
+        # the remediation are supported
+        names = {match.group(1) for violations in self.state.violations.values() for violation in violations
+                 for match in [re.fullmatch(rf"projects/{re.escape(project)}/global/firewalls/([^/]+)",
+                                            violation.get("resource_id", ""))] if match}
+        names.update(f"open-ssh-{index}" for index in range(self.state.unreported_firewalls))
+        firewalls = []
+        for name in sorted(names):
+            try:
+                firewalls.append(self.get_firewall(project, name))
+            except FakeApiError:
+                continue
+        filter_expression = query.get("filter", "").replace(" ", "")
+        if 'direction="INGRESS"' in filter_expression:
+            firewalls = [firewall for firewall in firewalls if firewall["direction"] == "INGRESS"]
+        if "disabled=false" in filter_expression:
+            firewalls = [firewall for firewall in firewalls if not firewall["disabled"]]
+        return 200, {"kind": "compute#firewallList", "items": firewalls}
+
+    def firewalls_patch_compute(self, project, firewall, body, **_):
+        resource = self.get_firewall(project, firewall)
+        with self.state.lock:
+            resource.update(self.json_body(body))
+        return 200, self.compute_operation(f"projects/{project}/global/firewalls/{firewall}")
+
+    def firewalls_delete_compute(self, project, firewall, **_):
+        resource = self.get_firewall(project, firewall)
+        with self.state.lock:
+            resource["deleted"] = True
+        return 200, self.compute_operation(f"projects/{project}/global/firewalls/{firewall}")
+
+    def get_network(self, project, network):
+        key = f"compute/projects/{project}/global/networks/{network}"
+        with self.state.lock:
+            if self.state.resources.get(key, {}).get("deleted"):
+                raise not_found(key)
+        return self.state.get_resource(key, lambda: {
+            "kind": "compute#network", "name": network, "autoCreateSubnetworks": network == "default",
+            "selfLink": f"https://www.googleapis.com/compute/v1/projects/{project}/global/networks/{network}"})
+
+    def networks_get_compute(self, project, network, **_):
+        return 200, self.get_network(project, network)
+
+    def networks_delete_compute(self, project, network, **_):
+        resource = self.get_network(project, network)
+        with self.state.lock:
+            resource["deleted"] = True
+        return 200, self.compute_operation(f"projects/{project}/global/networks/{network}")
+
+    def get_subnetworks(self, project, region, network):
+        subnetworks = []
+        for index in range(self.state.subnets_per_network):
+            name = f"{network}-subnet-{index}"
+            subnetworks.append(self.state.get_resource(
+                f"compute/projects/{project}/regions/{region}/subnetworks/{name}", lambda: {
+                    "kind": "compute#subnetwork", "name": name, "region": region, "enableFlowLogs": False,
+                    "fingerprint": "fp-0", "ipCidrRange": f"10.{index}.0.0/20",
+                    "network": f"https://www.googleapis.com/compute/v1/projects/{project}/global/networks/{network}"}))
+        return subnetworks
+
+    def filter_subnetworks(self, project, region, query):
+        # Only the network="<url>" and enableFlowLogs filters of the remediation are supported
+        filter_expression = query.get("filter", "")
+        network = re.search(r'networks/([^"\s)]+)', filter_expression)
+        subnetworks = self.get_subnetworks(project, region, network.group(1) if network else "default")
+        if "enableFlowLogs=false" in filter_expression.replace(" ", ""):
+            subnetworks = [subnetwork for subnetwork in subnetworks if not subnetwork.get("enableFlowLogs")]
+        return subnetworks
+
+    def subnetworks_list_compute(self, project, region, query, **_):
+        return 200, {"kind": "compute#subnetworkList", "items": self.filter_subnetworks(project, region, query)}
+
+    def subnetworks_aggregatedList_compute(self, project, query, **_):
+        items = {}
+        for region in self.state.subnet_regions:
+            subnetworks = self.filter_subnetworks(project, region, query)
+            items[f"regions/{region}"] = {"subnetworks": subnetworks} if subnetworks else {
+                "warning": {"code": "NO_RESULTS_ON_PAGE", "message": "There are no results for scope on this page."}}
+        return 200, {"kind": "compute#subnetworkAggregatedList", "items": items}
+
+    def subnetworks_patch_compute(self, project, region, subnetwork, body, **_):
+        key = f"compute/projects/{project}/regions/{region}/subnetworks/{subnetwork}"
+        with self.state.lock:
+            resource = self.state.resources.get(key)
+            if resource is None:
+                raise not_found(key)
+            patch = self.json_body(body)
+            if patch.get("fingerprint") != resource["fingerprint"]:
+                raise FakeApiError(412, "conditionNotMet", "Supplied fingerprint does not match the current "
+                                                           "fingerprint.", "FAILED_PRECONDITION")
+            resource.update(patch, fingerprint=f"fp-{int(resource['fingerprint'].split('-')[1]) + 1}")
+        return 200, self.compute_operation(f"projects/{project}/regions/{region}/subnetworks/{subnetwork}")
+
+    def operations_wait_compute(self, project, operation, **_):
+        api, done, target, error = self.state.get_operation(operation, wait=True)
+        response = {"kind": "compute#operation", "name": operation, "status": "DONE" if done else "RUNNING",
+                    "targetLink": target}
+        if done and error:
+            response["error"] = error
+        return 200, response
+
+    # Cloud SQL
+
+    def get_sql_instance(self, project, instance):
+        return self.state.get_resource(f"sqladmin/projects/{project}/instances/{instance}", lambda: {
+            "kind": "sql#instance", "name": instance, "project": project, "state": "RUNNABLE",
+            "settings": {"settingsVersion": "1", "ipConfiguration": {
+                "ipv4Enabled": True, "requireSsl": False,
+                "authorizedNetworks": [{"kind": "sql#aclEntry", "value": "0.0.0.0/0"},
+                                       {"kind": "sql#aclEntry", "value": "10.0.0.0/8"}]}}})
+
+    def instances_get_sqladmin(self, project, instance, **_):
+        return 200, self.get_sql_instance(project, instance)
+
+    def instances_patch_sqladmin(self, project, instance, body, **_):
+        resource = self.get_sql_instance(project, instance)
+        patch = self.json_body(body)
+        with self.state.lock:
+            ip_configuration = patch.get("settings", {}).get("ipConfiguration", {})
+            resource["settings"]["ipConfiguration"].update(ip_configuration)
+            resource["settings"]["settingsVersion"] = str(int(resource["settings"]["settingsVersion"]) + 1)
+        name = self.state.start_operation("sqladmin", f"projects/{project}/instances/{instance}")
+        return 200, {"kind": "sql#operation", "name": name, "status": "PENDING", "operationType": "UPDATE"}
+
+    def operations_get_sqladmin(self, project, operation, **_):
+        api, done, target, error = self.state.get_operation(operation)
+        response = {"kind": "sql#operation", "name": operation, "status": "DONE" if done else "RUNNING"}
+        if done and error:
+            response["error"] = error
+        return 200, response
+
+    # Cloud Storage
+
+    def get_bucket_policy(self, bucket):
+        return self.state.get_resource(f"storage/buckets/{bucket}/iam", lambda: {
+            "kind": "storage#policy", "resourceId": f"projects/_/buckets/{bucket}", "version": 1, "etag": "CAE=",
+            "bindings": [{"role": "roles/storage.objectViewer", "members": ["allUsers", "projectViewer:project"]},
+                         {"role": "roles/storage.legacyBucketReader", "members": ["allAuthenticatedUsers"]}]})
+
+    def buckets_getIamPolicy_storage(self, bucket, **_):
+        return 200, self.get_bucket_policy(bucket)
+
+    def buckets_setIamPolicy_storage(self, bucket, body, **_):
+        policy = self.get_bucket_policy(bucket)
+        with self.state.lock:
+            policy["bindings"] = self.json_body(body).get("bindings", [])
+        return 200, policy
+
+    def objects_get_storage(self, bucket, name, query, **_):
+        with self.state.lock:
+            data = self.state.objects.get((bucket, name))
+        if data is None:
+            raise not_found(f"b/{bucket}/o/{name}")
+        if query.get("alt") == "media":
+            return 200, data
+        return 200, {"kind": "storage#object", "bucket": bucket, "name": name, "size": str(len(data))}
+
+    def objects_insert_storage(self, bucket, query, body, **_):
+        with self.state.lock:
+            self.state.objects[(bucket, query.get("name"))] = body
+        return 200, {"kind": "storage#object", "bucket": bucket, "name": query.get("name"), "size": str(len(body))}
+
+    # IAM
+
+    def get_keys(self, service_account):
+        def create():
+            keys = []
+            for index, age in enumerate((200, 120, 10)):
+                valid_after = (datetime.utcnow() - timedelta(days=age)).strftime("%Y-%m-%dT%H:%M:%SZ")
+                keys.append({"name": f"{service_account}/keys/key-{index}", "validAfterTime": valid_after,
+                             "keyType": "USER_MANAGED"})
+            return keys
+        return self.state.get_resource(f"iam/{service_account}/keys", create)
+
+    def keys_list_iam(self, service_account, **_):
+        return 200, {"keys": self.get_keys(service_account)}
+
+    def keys_disable_iam(self, key_name, **_):
+        for key in self.get_keys(key_name.rsplit("/keys/", 1)[0]):
+            if key["name"] == key_name:
+                with self.state.lock:
+                    key["disabled"] = True
+                return 200, {}
+        raise not_found(key_name)
+
+    # Kubernetes Engine
+
+    def get_cluster(self, name):
+        return self.state.get_resource(f"container/{name}", lambda: {
+            "name": name.split("/")[-1], "location": name.split("/")[3], "status": "RUNNING",
+            "loggingService": "none"})
+
+    def clusters_get_container(self, name, **_):
+        return 200, self.get_cluster(name)
+
+    def clusters_setLogging_container(self, name, body, **_):
+        cluster = self.get_cluster(name)
+        with self.state.lock:
+            cluster["loggingService"] = self.json_body(body).get("loggingService")
+        operation = self.state.start_operation("container", name)
+        return 200, {"name": operation, "operationType": "SET_LOGGING_SERVICE", "status": "RUNNING",
+                     "targetLink": name}
+
+    def operations_get_container(self, name, **_):
+        api, done, target, error = self.state.get_operation(name.split("/")[-1])
+        response = {"name": name.split("/")[-1], "status": "DONE" if done else "RUNNING", "targetLink": target}
+        if done and error:
+            response["error"] = error
+        return 200, response
+
+    # Resource Manager
+
+    def get_project_policy(self, project):
+        def create():
+            members = [f"user:user-{index}@example.com" for index in range(3)] + \
+                      [f"serviceAccount:sa-{index}@{project}.iam.gserviceaccount.com" for index in range(3)]
+            return {"version": 1, "etag": "BwAAAAAAAAE=",
+                    "bindings": [{"role": role, "members": list(members)} for role in ADMIN_ROLES + USER_ROLES],
+                    "auditConfigs": [{"service": "storage.googleapis.com",
+                                      "auditLogConfigs": [{"logType": "DATA_READ",
+                                                           "exemptedMembers": ["user:user-0@example.com"]}]}]}
+        return self.state.get_resource(f"cloudresourcemanager/projects/{project}/iam", create)
+
+    def projects_getIamPolicy_cloudresourcemanager(self, project, **_):
+        with self.state.lock:
+            return 200, json.loads(json.dumps(self.get_project_policy(project)))
+
+    def projects_setIamPolicy_cloudresourcemanager(self, project, body, **_):
+        request = self.json_body(body)
+        policy = self.get_project_policy(project)
+        with self.state.lock:
+            etag = request.get("policy", {}).get("etag")
+            if etag and etag != policy["etag"]:
+                raise FakeApiError(409, "aborted", "There were concurrent policy changes. Please retry the whole "
+                                                   "read-modify-write with exponential backoff.", "ABORTED")
+            fields = [field.strip() for field in request.get("updateMask", "bindings,etag").split(",")]
+            for field in fields:
+                if field in request.get("policy", {}) and field != "etag":
+                    policy[field] = request["policy"][field]
+            version = int.from_bytes(base64.b64decode(policy["etag"]), "big") + 1
+            policy["etag"] = base64.b64encode(version.to_bytes(8, "big")).decode()
+            return 200, json.loads(json.dumps(policy))
+
+    # Secret Manager
+
+    def versions_access_secretmanager(self, secret, **_):
+        if secret not in self.state.secrets:
+            raise not_found(f"secrets/{secret}")
+        data = base64.b64encode(self.state.secrets[secret].encode()).decode()
+        return 200, {"name": f"secrets/{secret}/versions/1", "payload": {"data": data}}
+
+    # Pub/Sub
+
+    def topics_publish_pubsub(self, topic, body, **_):
+        messages = self.json_body(body).get("messages", [])
+        with self.state.lock:
+            published = self.state.published.setdefault(topic, [])
+            published.extend(messages)
+            first_id = len(published) - len(messages)
+        return 200, {"messageIds": [str(first_id + index) for index in range(len(messages))]}
+
+
+class FakeApiRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_request()
+
+    do_POST = do_PUT = do_PATCH = do_DELETE = do_GET
+
+    def handle_request(self):
+        state = self.server.state
+        url = urlsplit(self.path)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        state.delay()
+
+        path = url.path.lstrip("/")
+        if path == "netskope/api/v1/security_assessment":
+            status, response, headers = self.handle_netskope(query)
+        elif re.fullmatch(r"[a-z]+/batch(/.*)?", path):
+            status, response, headers = self.handle_batch(body)
+        else:
+            status, response = self.server.apis.handle(self.command, path, query, body)
+            headers = {}
+        self.send(status, response, headers)
+
+    def handle_netskope(self, query):
+        state = self.server.state
+        state.requests["netskope.security_assessment"] += 1
+        if state.draw(state.throttle_rate):
+            state.errors["netskope429"] += 1
+            return 429, {"status": "error", "errors": ["Too many requests"]}, {}
+        violations = state.violations.get(query.get("rule_name"), [])
+        skip, limit = int(query.get("skip", 0)), int(query.get("limit", 100))
+        return 200, {"status": "success", "data": violations[skip:skip + limit]}, {}
+
+    def handle_batch(self, body):
+        """
+        Execute the parts of an HTTP batch request and return the multipart response
+        """
+        state = self.server.state
+        # Every call of the batch is counted under its route and under batch.calls, the HTTP request under batch
+        state.requests["batch"] += 1
+        message = email.message_from_bytes(f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body)
+        boundary = "fake-batch-boundary"
+        parts = []
+        for part in message.get_payload():
+            request = part.get_payload()
+            head, _, part_body = re.split(r"(\r?\n\r?\n)", request, maxsplit=1) if re.search(
+                r"\r?\n\r?\n", request) else (request, "", "")
+            method, target = head.splitlines()[0].split(" ")[:2]
+            url = urlsplit(target)
+            query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            state.requests["batch.calls"] += 1
+            status, response = self.server.apis.handle(method, url.path.lstrip("/"), query, part_body.encode())
+            content_id = part["Content-ID"].strip("<>")
+            parts.append(f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>"
+                         f"\r\n\r\nHTTP/1.1 {status} {self.responses.get(status, ('',))[0]}\r\n"
+                         f"Content-Type: application/json; charset=UTF-8\r\n\r\n{json.dumps(response)}\r\n")
+        data = ("".join(parts) + f"--{boundary}--\r\n").encode()
+        return 200, data, {"Content-Type": f"multipart/mixed; boundary={boundary}"}
+
+    def send(self, status, response, headers):
+        if isinstance(response, (bytes, bytearray)):
+            data = bytes(response)
+            headers.setdefault("Content-Type", "application/octet-stream")
+        else:
+            data = json.dumps(response).encode()
+            headers.setdefault("Content-Type", "application/json; charset=UTF-8")
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeApiServer(ThreadingHTTPServer):
+    """
+    Fake Netskope and Google APIs served from a background thread, see FakeApiState for the options
+    """
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, **options):
+        super().__init__((host, port), FakeApiRequestHandler)
+        self.state = FakeApiState(**options)
+        self.apis = FakeApis(self.state)
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def environ(self):
+        """
+        Return the environment variables pointing the functions at the server
+        """
+        return {"GOOGLE_API_ROOT_URL": self.url, "NETSKOPE_API_BASE_URL": f"{self.url}/netskope"}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name="fake-apis", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Maximum random seconds added on top")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Rate of 429 responses")
+    parser.add_argument("--in-progress-rate", type=float, default=0.0,
+                        help="Rate of 409 operationInProgress responses to the Cloud SQL updates")
+    parser.add_argument("--not-ready-rate", type=float, default=0.0,
+                        help="Rate of 400 resourceNotReady responses to the compute updates")
+    parser.add_argument("--operation-seconds", type=float, default=0.0, help="Duration of the operations")
+    parser.add_argument("--rule", nargs=3, action="append", default=[], metavar=("RULE_ID", "RULE_NAME", "COUNT"),
+                        help="Serve COUNT generated violations of the rule on the Netskope API")
+    args = parser.parse_args()
+
+    violations = {rule_name: generate_violations(rule_id, rule_name, int(count))
+                  for rule_id, rule_name, count in args.rule}
+    server = FakeApiServer(port=args.port, latency=args.latency, latency_jitter=args.latency_jitter,
+                           throttle_rate=args.throttle_rate, in_progress_rate=args.in_progress_rate,
+                           not_ready_rate=args.not_ready_rate, operation_seconds=args.operation_seconds,
+                           violations=violations)
+    for name, value in server.environ().items():
+        print(f"export {name}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()